@@ -1,25 +1,169 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, Response, g
+from werkzeug.local import LocalProxy
 from trading import TradingSystem
+from profiler import SamplingProfiler, format_collapsed
+import metrics
+from rate_stream import RateStream
+from paper_trading import PaperTradingEngine
 from datetime import datetime
+import hashlib
+import os
+import threading
+import time
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key'  # 플래시 메시지를 위한 시크릿 키
-trading_system = TradingSystem()
 
-@app.route('/')
-def index():
-    """메인 페이지"""
-    # 실제 거래만 필터링 (매수, 매도만 표시)
-    actual_trades = [t for t in trading_system.get_all_trades() if t.type in ['매수', '매도']]
-    planned_trades = trading_system.get_planned_trades()
-    total_profit = trading_system.calculate_total_profit()
-    
-    # 매도 거래가 있는 매수 거래 ID 목록
-    trades_with_sells = [t.id for t in actual_trades if t.type == '매수' and trading_system.has_related_sells(t.id)]
-    
+class AppServices:
+    """앱 하나가 쓰는 TradingSystem과 부가 서비스
+
+    앱을 만들 때는 아무것도 만들지 않고, 첫 요청에서 필요한 것만 만듭니다.
+    (거래/설정 파일 읽기, 대시보드 푸시, NumPy가 필요한 시나리오 계산)
+    환율 폴러는 start()를 호출해야 시작됩니다.
+    """
+    def __init__(self, trading_system=None, start_poller=False, paper_trading=False, **options):
+        self.options = options  # TradingSystem 생성 인자
+        self.start_poller = start_poller
+        self.paper_trading = paper_trading
+        self.started = False
+        self._trading_system = None
+        self._rate_stream = None
+        self._scenario_valuer = None
+        self._lock = threading.RLock()
+        if trading_system is not None:
+            self._attach(trading_system)
+        # FXTRADER_PROFILER=1이면 /debug/profile로 호출 스택 샘플링 허용
+        self.profiler = SamplingProfiler() if os.environ.get('FXTRADER_PROFILER') == '1' else None
+        # 환율 카드 응답 캐시: (환율 스냅샷 버전, 거래 버전, 형식) -> (본문, ETag)
+        self.rate_card_cache = {}
+        self.rate_card_cache_lock = threading.Lock()
+
+    def _attach(self, trading_system):
+        # FXTRADER_PAPER_TRADING=1이면 환율이 도달한 예정 거래를 모의 체결
+        if self.paper_trading:
+            PaperTradingEngine(trading_system).start()
+        # 거래 수, 환율 스냅샷 나이 등은 /metrics를 읽을 때 계산
+        metrics.register_trading_system(trading_system)
+        self._trading_system = trading_system
+
+    @property
+    def trading_system(self) -> TradingSystem:
+        if self._trading_system is None:
+            with self._lock:
+                if self._trading_system is None:
+                    self._attach(TradingSystem(start_rate_monitoring=False, **self.options))
+        return self._trading_system
+
+    @property
+    def rate_stream(self) -> RateStream:
+        """대시보드 환율 카드 푸시 (카드 계산과 직렬화는 변경 시 한 번만)"""
+        if self._rate_stream is None:
+            with self._lock:
+                if self._rate_stream is None:
+                    self._rate_stream = RateStream(self.trading_system)
+        return self._rate_stream
+
+    @property
+    def scenario_valuer(self):
+        """가상 환율 시나리오 계산 (포지션 배열은 거래 버전이 바뀔 때만 다시 만듦)"""
+        if self._scenario_valuer is None:
+            with self._lock:
+                if self._scenario_valuer is None:
+                    from scenario import ScenarioValuer
+                    self._scenario_valuer = ScenarioValuer(self.trading_system)
+        return self._scenario_valuer
+
+    def start(self):
+        """환율 폴러를 시작합니다. (여러 번 호출해도 한 번만 시작)"""
+        with self._lock:
+            if not self.started:
+                self.trading_system.start_rate_monitoring()
+                self.started = True
+
+
+# 라우트와 요청 훅은 모듈에 모아 두고 create_app()이 앱마다 등록
+_routes = []
+
+def route(rule, **options):
+    def decorator(func):
+        _routes.append((rule, func, options))
+        return func
+    return decorator
+
+def _services() -> AppServices:
+    return current_app.extensions['fxtrader']
+
+# 라우트에서는 현재 앱의 서비스를 가리킴 (처음 접근할 때 만듦)
+trading_system = LocalProxy(lambda: _services().trading_system)
+rate_stream = LocalProxy(lambda: _services().rate_stream)
+scenario_valuer = LocalProxy(lambda: _services().scenario_valuer)
+
+def create_app(trading_system=None, start_poller=False, **options):
+    """Flask 앱을 만듭니다.
+
+    trading_system을 넘기지 않으면 첫 요청에서 TradingSystem을 만들며, options는 그 생성 인자입니다.
+    FXTRADER_SHARED_RATES에 파일 경로를 지정하면 워커 프로세스들이 환율 스냅샷을 공유 (호스트당 1개 조회)
+    FXTRADER_TICK_HISTORY에 디렉터리를 지정하면 환율 틱과 OHLC 봉을 기록
+    start_poller가 True이면 첫 요청에서 환율 폴러를 시작합니다. (False이면 services.start()로 직접 시작)
+    """
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key'  # 플래시 메시지를 위한 시크릿 키
+    if trading_system is None:
+        options.setdefault('shared_rates_path', os.environ.get('FXTRADER_SHARED_RATES'))
+        options.setdefault('tick_history_dir', os.environ.get('FXTRADER_TICK_HISTORY'))
+    app.extensions['fxtrader'] = AppServices(trading_system, start_poller,
+                                             os.environ.get('FXTRADER_PAPER_TRADING') == '1', **options)
+    app.before_request(start_request_timer)
+    app.after_request(record_request_metrics)
+    app.before_request(sync_trades)
+    for rule, view_func, route_options in _routes:
+        app.add_url_rule(rule, view_func=view_func, **route_options)
+    return app
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def record_request_metrics(response):
+    """경로(URL 규칙)별 처리 시간과 응답 코드 기록 (스트리밍 응답은 첫 응답까지의 시간)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_SECONDS.labels(route, request.method).observe(time.perf_counter() - started)
+        metrics.REQUESTS.labels(route, request.method, response.status_code).inc()
+    return response
+
+def sync_trades():
+    """다른 워커 프로세스가 저장한 거래 변경 사항을 반영 (첫 요청이면 폴러도 시작)"""
+    services = _services()
+    if services.start_poller and not services.started:
+        services.start()
+    trading_system.sync()
+
+# 거래 목록 한 페이지의 행 수 (나머지는 스크롤하면 /api/trades로 이어서 받음)
+TRADE_PAGE_SIZE = 50
+MAX_TRADE_PAGE_SIZE = 500
+
+# 페이지로 나눠 보여 주는 거래 목록: 이름 -> (거래 유형, 행 템플릿)
+TRADE_LISTS = {
+    'trades': (['매수', '매도'], 'trade_rows.html'),
+    'planned': (['매도예정', '손절예정'], 'planned_rows.html'),
+    'ladder': (['매도예정', '손절예정'], 'ladder_rows.html'),
+}
+
+def _trade_page(name, currency=None, related_id=None, cursor=None, limit=TRADE_PAGE_SIZE):
+    """거래 목록 한 페이지와 행 템플릿에 넘길 값 (행 수에만 비례하는 비용)"""
+    types, _ = TRADE_LISTS[name]
+    trades, next_cursor = trading_system.get_trades_page(types, currency=currency, related_id=related_id,
+                                                         cursor=cursor, limit=limit)
+    page = {'trades': trades, 'next_cursor': next_cursor}
+    if name == 'trades':
+        # 매도 거래가 있는 매수 거래 ID 목록 (이 페이지의 매수 거래만 확인)
+        page['trades_with_sells'] = [t.id for t in trades if t.type == '매수' and trading_system.has_related_sells(t.id)]
+    return page
+
+def _render_index(actual_page, planned_page, **context):
+    """메인 페이지 (실제/예정 거래는 첫 페이지만, 합계는 누적 집계에서)"""
     # 환율 정보 가져오기
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD')
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY')
+    usd_rate = trading_system.get_current_rate('USD')
+    jpy_rate = trading_system.get_current_rate('JPY')
     
     # 통화별 설정 가져오기
     usd_settings = trading_system.get_currency_settings('USD')
@@ -39,12 +183,17 @@ def index():
     usd_profit = trading_system.calculate_currency_profit('USD')
     jpy_profit = trading_system.calculate_currency_profit('JPY')
     
+    context.setdefault('selected_buy_id', None)
+    context.setdefault('filtered_sells_for', None)
     return render_template('index.html',
-                         trades=actual_trades,
-                         planned_trades=planned_trades,
-                         total_profit=total_profit,
-                         trades_with_sells=trades_with_sells,
-                         selected_buy_id=None,
+                         trades=actual_page['trades'],
+                         trades_next_cursor=actual_page['next_cursor'],
+                         trades_with_sells=actual_page['trades_with_sells'],
+                         planned_trades=planned_page['trades'],
+                         planned_next_cursor=planned_page['next_cursor'],
+                         trade_count=trading_system.count_trades(TRADE_LISTS['trades'][0]),
+                         planned_count=trading_system.count_trades(TRADE_LISTS['planned'][0]),
+                         total_profit=trading_system.calculate_total_profit(),
                          usd_rate=usd_rate,
                          jpy_rate=jpy_rate,
                          usd_settings=usd_settings,
@@ -54,124 +203,86 @@ def index():
                          usd_current_value=usd_current_value,
                          jpy_current_value=jpy_current_value,
                          usd_profit=usd_profit,
-                         jpy_profit=jpy_profit)
+                         jpy_profit=jpy_profit,
+                         **context)
+
+@route('/')
+def index():
+    """메인 페이지"""
+    # 실제 거래(매수, 매도)와 예정 거래(매도예정, 손절예정)의 첫 페이지
+    return _render_index(_trade_page('trades'), _trade_page('planned'))
 
-@app.route('/planned')
+@route('/planned')
 def planned_trades_summary():
     """예정 거래 요약 페이지"""
-    planned_trades = trading_system.get_planned_trades()
-    
     # 환율 정보 가져오기
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD')
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY')
+    usd_rate = trading_system.get_current_rate('USD')
+    jpy_rate = trading_system.get_current_rate('JPY')
     
     # 통화별 설정 가져오기
     usd_settings = trading_system.get_currency_settings('USD')
     jpy_settings = trading_system.get_currency_settings('JPY')
     
-    # USD 매수 예정 거래 생성
-    if usd_settings.planned_buy_rate > 0:
-        usd_planned_buy = {
-            'currency': 'USD',
-            'type': '매수예정',
-            'rate': usd_settings.planned_buy_rate,
-            'krw_amount': usd_settings.default_amount,
-            'foreign_amount': round(usd_settings.default_amount / usd_settings.planned_buy_rate, 2),
-            'profit': 0,
-            'related_id': '',
-            'note': f'설정된 매수 예정 환율'
-        }
-        planned_trades.append(usd_planned_buy)
-    
-    # JPY 매수 예정 거래 생성
-    if jpy_settings.planned_buy_rate > 0:
-        jpy_planned_buy = {
-            'currency': 'JPY',
-            'type': '매수예정',
-            'rate': jpy_settings.planned_buy_rate,
-            'krw_amount': jpy_settings.default_amount,
-            'foreign_amount': round(jpy_settings.default_amount / jpy_settings.planned_buy_rate, 2),
-            'profit': 0,
-            'related_id': '',
-            'note': f'설정된 매수 예정 환율'
-        }
-        planned_trades.append(jpy_planned_buy)
+    pages = {}
+    for currency, currency_settings in (('USD', usd_settings), ('JPY', jpy_settings)):
+        page = _trade_page('ladder', currency=currency)
+        # 설정된 매수 예정 환율은 첫 페이지 맨 위에 표시
+        if currency_settings.planned_buy_rate > 0:
+            page['trades'].insert(0, {
+                'currency': currency,
+                'type': '매수예정',
+                'rate': currency_settings.planned_buy_rate,
+                'krw_amount': currency_settings.default_amount,
+                'foreign_amount': round(currency_settings.default_amount / currency_settings.planned_buy_rate, 2),
+                'profit': 0,
+                'related_id': '',
+                'note': f'설정된 매수 예정 환율'
+            })
+        page['count'] = trading_system.count_trades(TRADE_LISTS['ladder'][0], currency)
+        pages[currency] = page
     
     return render_template('planned_trades.html', 
-                         planned_trades=planned_trades,
+                         usd_page=pages['USD'],
+                         jpy_page=pages['JPY'],
                          usd_rate=usd_rate,
                          jpy_rate=jpy_rate)
 
-@app.route('/filter/<buy_id>')
+@route('/filter/<buy_id>')
 def filter_trades(buy_id):
-    actual_trades = [t for t in trading_system.get_all_trades() if t.type in ['매수', '매도']]
     # 선택된 매수 ID에 해당하는 예정 거래만 필터링
-    planned_trades = [t for t in trading_system.get_planned_trades() if t.related_id == buy_id]
-    total_profit = trading_system.calculate_total_profit()
-    
-    trades_with_sells = [t.id for t in actual_trades if t.type == '매수' and trading_system.has_related_sells(t.id)]
-    
-    # 환율 정보 가져오기
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD')
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY')
-    
-    # 통화별 설정 가져오기
-    usd_settings = trading_system.get_currency_settings('USD')
-    jpy_settings = trading_system.get_currency_settings('JPY')
-    
-    # 통화별 손익 계산
-    usd_profit = trading_system.calculate_currency_profit('USD')
-    jpy_profit = trading_system.calculate_currency_profit('JPY')
-    
-    return render_template('index.html',
-                         trades=actual_trades,
-                         planned_trades=planned_trades,
-                         total_profit=total_profit,
-                         trades_with_sells=trades_with_sells,
-                         selected_buy_id=buy_id,
-                         usd_rate=usd_rate,
-                         jpy_rate=jpy_rate,
-                         usd_settings=usd_settings,
-                         jpy_settings=jpy_settings,
-                         usd_profit=usd_profit,
-                         jpy_profit=jpy_profit)
+    return _render_index(_trade_page('trades'), _trade_page('planned', related_id=buy_id),
+                         selected_buy_id=buy_id)
 
-@app.route('/filter_sells/<buy_id>')
+@route('/filter_sells/<buy_id>')
 def filter_sells(buy_id):
     # 선택된 매수 거래와 연관된 매도 거래만 필터링
-    actual_trades = [t for t in trading_system.get_all_trades() 
-                    if (t.type == '매도' and t.related_id == buy_id) or t.id == buy_id]
-    planned_trades = trading_system.get_planned_trades()
-    total_profit = trading_system.calculate_total_profit()
-    
-    trades_with_sells = [t.id for t in actual_trades if t.type == '매수' and trading_system.has_related_sells(t.id)]
-    
-    # 환율 정보 가져오기
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD')
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY')
-    
-    # 통화별 설정 가져오기
-    usd_settings = trading_system.get_currency_settings('USD')
-    jpy_settings = trading_system.get_currency_settings('JPY')
-    
-    # 통화별 손익 계산
-    usd_profit = trading_system.calculate_currency_profit('USD')
-    jpy_profit = trading_system.calculate_currency_profit('JPY')
-    
-    return render_template('index.html',
-                         trades=actual_trades,
-                         planned_trades=planned_trades,
-                         total_profit=total_profit,
-                         trades_with_sells=trades_with_sells,
-                         filtered_sells_for=buy_id,
-                         usd_rate=usd_rate,
-                         jpy_rate=jpy_rate,
-                         usd_settings=usd_settings,
-                         jpy_settings=jpy_settings,
-                         usd_profit=usd_profit,
-                         jpy_profit=jpy_profit)
+    return _render_index(_trade_page('trades', related_id=buy_id), _trade_page('planned'),
+                         filtered_sells_for=buy_id)
+
+@route('/api/trades')
+def get_trades_page():
+    """거래 목록의 다음 페이지 (무한 스크롤용)
+
+    list=trades|planned|ladder, cursor=이전 응답의 next_cursor, limit=행 수,
+    currency와 related_id로 범위를 좁힐 수 있습니다. 행 HTML과 거래 데이터를 함께 반환합니다.
+    """
+    name = request.args.get('list', 'trades')
+    if name not in TRADE_LISTS:
+        return jsonify({'error': f'지원하지 않는 목록입니다: {name}'}), 400
+    limit = min(max(request.args.get('limit', TRADE_PAGE_SIZE, type=int), 1), MAX_TRADE_PAGE_SIZE)
+    currency = request.args.get('currency') or None
+    try:
+        page = _trade_page(name, currency=currency, related_id=request.args.get('related_id') or None,
+                           cursor=request.args.get('cursor') or None, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    html = render_template(TRADE_LISTS[name][1], trades=page['trades'],
+                           trades_with_sells=page.get('trades_with_sells', []),
+                           current_rate=trading_system.get_current_rate(currency) if currency else None)
+    return jsonify(trades=[trade.to_dict() for trade in page['trades']],
+                   next_cursor=page['next_cursor'], html=html)
 
-@app.route('/buy', methods=['GET', 'POST'])
+@route('/buy', methods=['GET', 'POST'])
 def buy():
     if request.method == 'POST':
         try:
@@ -199,7 +310,7 @@ def buy():
     default_amount = 100000
     return render_template('buy.html', today=today, default_amount=default_amount)
 
-@app.route('/sell', methods=['GET', 'POST'])
+@route('/sell', methods=['GET', 'POST'])
 def sell():
     if request.method == 'POST':
         try:
@@ -221,13 +332,13 @@ def sell():
         except ValueError as e:
             flash(f'오류: {str(e)}', 'error')
     
-    buy_trades = [t for t in trading_system.get_all_trades() if t.type == '매수']
+    buy_trades = trading_system.get_trades_by_type(['매수'])
     today = datetime.now().strftime("%Y-%m-%d")  # 오늘 날짜를 기본값으로 설정
     return render_template('sell.html', buy_trades=buy_trades, today=today)
 
-@app.route('/edit/<trade_id>', methods=['GET', 'POST'])
+@route('/edit/<trade_id>', methods=['GET', 'POST'])
 def edit_trade(trade_id):
-    trade = next((t for t in trading_system.get_all_trades() if t.id == trade_id), None)
+    trade = trading_system.get_trade(trade_id)
     if not trade or trade.type not in ['매수', '매도']:
         flash('수정할 수 없는 거래입니다.', 'error')
         return redirect(url_for('index'))
@@ -253,7 +364,7 @@ def edit_trade(trade_id):
     
     return render_template('edit_trade.html', trade=trade)
 
-@app.route('/delete/<trade_id>', methods=['POST'])
+@route('/delete/<trade_id>', methods=['POST'])
 def delete_trade(trade_id):
     try:
         trading_system.delete_trade(trade_id)
@@ -262,15 +373,15 @@ def delete_trade(trade_id):
         flash(f'오류: {str(e)}', 'error')
     return redirect(url_for('index'))
 
-@app.route('/settings')
+@route('/settings')
 def settings():
     """설정 페이지"""
     # 실제 거래 가져오기
-    trades = [t for t in trading_system.get_all_trades() if t.type in ['매수', '매도']]
+    trades = trading_system.get_trades_by_type(['매수', '매도'])
     
     # 환율 정보 가져오기
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD')
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY')
+    usd_rate = trading_system.get_current_rate('USD')
+    jpy_rate = trading_system.get_current_rate('JPY')
     
     # 통화별 설정 가져오기
     usd_settings = trading_system.get_currency_settings('USD')
@@ -283,13 +394,21 @@ def settings():
                          usd_settings=usd_settings,
                          jpy_settings=jpy_settings)
 
-@app.route('/api/rate_cards')
-def get_rate_cards():
-    """환율 정보 카드 HTML을 반환"""
-    is_update = request.args.get('update', 'false').lower() == 'true'
-    
-    usd_rate = trading_system.rate_monitor.get_current_rate('USD', is_update)
-    jpy_rate = trading_system.rate_monitor.get_current_rate('JPY', is_update)
+def _rate_cards_etag(body, fmt):
+    # 버전 번호는 워커 프로세스마다 따로 증가하고 재시작하면 처음부터 다시 세므로, 본문 내용으로 ETag를 만듦
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return f'{fmt}-{hashlib.sha1(body).hexdigest()[:16]}'
+
+def _render_rate_cards(fmt):
+    """환율 카드를 HTML 조각 또는 JSON으로 만듭니다."""
+    if fmt == 'json':
+        cards = {currency: trading_system.get_rate_card(currency) for currency in ('USD', 'JPY')}
+        return jsonify(version=trading_system.get_rate_snapshot().version, cards=cards).get_data()
+
+    # update=true 여부와 관계없이 폴러가 발행한 최신 스냅샷만 읽음
+    usd_rate = trading_system.get_current_rate('USD')
+    jpy_rate = trading_system.get_current_rate('JPY')
     
     # 통화별 설정 가져오기
     usd_settings = trading_system.get_currency_settings('USD')
@@ -305,7 +424,7 @@ def get_rate_cards():
     jpy_current_value = trading_system.calculate_current_value('JPY', 
         jpy_rate.current_rate if jpy_rate else 0, jpy_holding)
     
-    html = render_template('rate_cards.html', 
+    return render_template('rate_cards.html', 
                          usd_rate=usd_rate,
                          jpy_rate=jpy_rate,
                          usd_settings=usd_settings,
@@ -314,10 +433,124 @@ def get_rate_cards():
                          jpy_holding=jpy_holding,
                          usd_current_value=usd_current_value,
                          jpy_current_value=jpy_current_value)
-    
-    return html
 
-@app.route('/settings', methods=['POST'])
+@route('/api/rate_cards')
+def get_rate_cards():
+    """환율 정보 카드를 반환 (기본 HTML 조각, format=json이면 JSON)
+
+    응답 본문의 해시로 ETag를 만들어 워커 프로세스가 달라도 내용이 같으면 304를 반환합니다.
+    같은 버전(환율 스냅샷 버전, 거래 버전)의 응답과 ETag는 한 번만 만들어 재사용합니다.
+    """
+    fmt = 'json' if request.args.get('format') == 'json' else 'html'
+    version = (trading_system.get_rate_snapshot().version, trading_system.version)
+    services = _services()
+    with services.rate_card_cache_lock:
+        cached = services.rate_card_cache.get((version, fmt))
+    if cached is None:
+        body = _render_rate_cards(fmt)
+        cached = (body, _rate_cards_etag(body, fmt))
+        with services.rate_card_cache_lock:
+            # 지난 버전의 응답은 다시 쓰이지 않으므로 버림
+            for key in [key for key in services.rate_card_cache if key[0] != version]:
+                del services.rate_card_cache[key]
+            services.rate_card_cache[(version, fmt)] = cached
+    body, etag = cached
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json' if fmt == 'json' else 'text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@route('/api/rate_stream')
+def stream_rate_cards():
+    """환율 카드 변경분을 Server-Sent Events로 전송"""
+    return Response(rate_stream.subscribe(request.headers.get('Last-Event-ID')),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@route('/api/ohlc/<currency>')
+def get_ohlc(currency):
+    """기록된 환율 봉 데이터 (resolution=1m|1h|1d, start/end는 epoch 초)"""
+    if trading_system.tick_history is None:
+        return jsonify({'error': '환율 기록이 설정되지 않았습니다.'}), 404
+    currency = currency.upper()
+    if currency not in trading_system.settings:
+        return jsonify({'error': f'지원하지 않는 통화입니다: {currency}'}), 404
+    try:
+        bars = trading_system.tick_history.ohlc(
+            currency, request.args.get('resolution', '1m'),
+            request.args.get('start', type=float), request.args.get('end', type=float))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # 열 단위로 보내 차트 라이브러리에 바로 넘길 수 있게 함
+    return jsonify({name: bars[name].tolist() for name in bars.dtype.names})
+
+@route('/api/scenario')
+def get_scenario():
+    """가상 환율 격자별 평가 손익과 예정 거래 예상 손익
+
+    통화별 격자는 ?USD=1300:1500:201 (시작:끝:개수) 또는 ?USD=1380,1400,1420 형식이며 (최대 MAX_GRID_POINTS개),
+    지정하지 않으면 현재 환율 ±5% 구간 101개 지점을 사용합니다. orders=1이면 예정 거래 목록도 포함합니다.
+    """
+    from scenario import MAX_GRID_POINTS, parse_grid  # NumPy는 이 경로에서만 필요
+
+    grids = {}
+    try:
+        for currency in ('USD', 'JPY'):
+            spec = request.args.get(currency)
+            if spec:
+                grids[currency] = parse_grid(spec)
+    except ValueError:
+        return jsonify({'error': '환율 격자 형식이 올바르지 않습니다. (시작:끝:개수 또는 쉼표 목록, '
+                                 f'최대 {MAX_GRID_POINTS}개 지점)'}), 400
+    if not grids:
+        for currency in ('USD', 'JPY'):
+            rate = trading_system.get_current_rate(currency)
+            if rate:
+                grids[currency] = parse_grid(f'{rate.current_rate * 0.95}:{rate.current_rate * 1.05}:101')
+
+    results = scenario_valuer.evaluate(grids)
+    response = {}
+    for currency, result in results.items():
+        response[currency] = {name: values.round(2).tolist() for name, values in result.items()}
+        if request.args.get('orders') == '1':
+            position = scenario_valuer.position(currency)
+            response[currency]['orders'] = [
+                {'id': order_id, 'type': order_type, 'rate': rate, 'profit': profit}
+                for order_id, order_type, rate, profit in zip(position.order_ids, position.order_types,
+                                                              position.order_rates.tolist(),
+                                                              position.order_profits.tolist())
+            ]
+    return jsonify(response)
+
+@route('/metrics')
+def get_metrics():
+    """Prometheus 텍스트 형식의 계측 값"""
+    return Response(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@route('/debug/profile')
+def get_profile():
+    """seconds초 동안 모든 스레드의 호출 스택을 샘플링해 접힌 스택(flamegraph.pl/speedscope 입력)으로 반환
+
+    FXTRADER_PROFILER=1일 때만 사용할 수 있습니다. interval은 샘플 간격(초)이며,
+    seconds나 interval이 0 이하이면 400을 반환합니다.
+    """
+    profiler = _services().profiler
+    if profiler is None:
+        return jsonify({'error': '프로파일러가 켜져 있지 않습니다. (FXTRADER_PROFILER=1)'}), 404
+    seconds = request.args.get('seconds', 10.0, type=float)
+    interval = request.args.get('interval', type=float)
+    try:
+        stacks = profiler.sample(seconds, interval)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return Response(format_collapsed(stacks), content_type='text/plain; charset=utf-8')
+
+@route('/settings', methods=['POST'])
 def save_settings():
     # USD 설정 저장
     usd_settings = {
@@ -352,5 +585,8 @@ def save_settings():
     flash('설정이 저장되었습니다.', 'success')
     return redirect(url_for('settings'))
 
+# flask run / gunicorn app:app용 앱 (FXTRADER_START_POLLER=0이면 환율 폴러를 시작하지 않음)
+app = create_app(start_poller=os.environ.get('FXTRADER_START_POLLER', '1') == '1')
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
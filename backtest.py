@@ -0,0 +1,299 @@
+"""CurrencySettings의 분할 매도/손절/추가 매수 사다리 전략 백테스트
+
+    python -m backtest --history ticks --currency USD --resolution 1m
+
+주문 생성은 TradingSystem과 같은 build_* 함수를, 체결 규칙은 PaperTradingEngine을
+그대로 사용하므로 앱이 같은 환율을 받았을 때와 같은 거래가 만들어집니다.
+"""
+import argparse
+import heapq
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from paper_trading import PaperTradingEngine
+from trading import (CurrencyAggregate, CurrencySettings, Trade, TriggerEvent, TriggerIndex,
+                     build_buy_trade, build_planned_trades, build_sell_trade, build_stop_loss_trade)
+
+
+class CrossingFinder:
+    """환율 배열에서 예정 환율을 처음 지나가는 틱을 찾습니다.
+
+    TriggerIndex.crossed와 같은 조건(올라가며 닿음: 직전 < 환율 <= 현재, 내려가며 닿음:
+    현재 <= 환율 < 직전)을 씁니다. 구간별 최고/최저값을 미리 계산해 두고 조건을 만족할 수 있는
+    첫 구간만 NumPy로 훑으므로 한 번의 검색은 O(n / block_size + block_size)입니다.
+    """
+    def __init__(self, rates: np.ndarray, block_size: int = 1024):
+        self.rates = np.ascontiguousarray(rates, dtype=np.float64)
+        self.block_size = block_size
+        blocks = -(-len(self.rates) // block_size)
+        padded = np.resize(self.rates, blocks * block_size) if len(self.rates) else self.rates
+        padded[len(self.rates):] = self.rates[-1] if len(self.rates) else 0
+        self.block_max = padded.reshape(blocks, block_size).max(axis=1)
+        self.block_min = padded.reshape(blocks, block_size).min(axis=1)
+
+    def _first(self, start: int, level: float, above: bool, inclusive: bool) -> Optional[int]:
+        """start 이후 처음으로 환율이 level 이상/초과(above) 또는 이하/미만인 틱"""
+        rates, size = self.rates, self.block_size
+        if start >= len(rates):
+            return None
+
+        def hits(values):
+            if above:
+                return values >= level if inclusive else values > level
+            return values <= level if inclusive else values < level
+
+        block = start // size
+        end = min((block + 1) * size, len(rates))
+        found = np.flatnonzero(hits(rates[start:end]))
+        if len(found):
+            return start + int(found[0])
+
+        extremes = self.block_max if above else self.block_min
+        candidates = np.flatnonzero(hits(extremes[block + 1:]))
+        if not len(candidates):
+            return None
+        block += 1 + int(candidates[0])
+        found = np.flatnonzero(hits(rates[block * size:(block + 1) * size]))
+        return block * size + int(found[0])
+
+    def first_cross(self, level: float, after: int, direction: str) -> Optional[int]:
+        """after 틱 다음부터 환율이 level에 닿는 첫 틱 (direction: 'up' 또는 'down')"""
+        rates = self.rates
+        if direction == 'up':
+            # 이미 level 이상이면 아래로 내려갔다가 다시 올라와야 함
+            start = after + 1
+            if rates[after] >= level:
+                start = self._first(after + 1, level, above=False, inclusive=False)
+                if start is None:
+                    return None
+            return self._first(start, level, above=True, inclusive=True)
+        start = after + 1
+        if rates[after] <= level:
+            start = self._first(after + 1, level, above=True, inclusive=False)
+            if start is None:
+                return None
+        return self._first(start, level, above=False, inclusive=True)
+
+
+class BacktestLedger:
+    """백테스트용 메모리 거래 장부
+
+    PaperTradingEngine이 호출하는 TradingSystem 메서드만 같은 의미로 구현하며,
+    거래는 같은 build_* 함수로 만들고 누적 집계도 같은 CurrencyAggregate로 계산합니다.
+    """
+    def __init__(self, settings: CurrencySettings, on_planned: Callable[[Trade], None]):
+        self.settings = settings
+        self.on_planned = on_planned  # 새 예정 거래가 생기면 호출 (발동 시점 예약)
+        self.trades: Dict[str, Trade] = {}
+        self.children: Dict[str, Dict[str, Trade]] = {}
+        self.aggregate = CurrencyAggregate()
+        self.counts = {'매수': 0, '매도': 0, '손절': 0}
+        self.filled: List[Trade] = []
+        self.date = ''
+
+    def _next_trade_id(self, trade_type: str) -> str:
+        self.counts[trade_type] += 1
+        return f"{trade_type}{self.counts[trade_type]}"
+
+    def _add(self, trade: Trade):
+        self.trades[trade.id] = trade
+        if trade.related_id:
+            self.children.setdefault(trade.related_id, {})[trade.id] = trade
+        self.aggregate.apply(trade, 1)
+        if trade.type in TriggerIndex.DIRECTIONS:
+            self.on_planned(trade)
+        else:
+            self.filled.append(trade)
+
+    def run_batch(self, func):
+        return func()
+
+    def get_trade(self, trade_id: str) -> Optional[Trade]:
+        return self.trades.get(trade_id)
+
+    def get_related_trades(self, buy_id: str) -> List[Trade]:
+        return list(self.children.get(buy_id, {}).values())
+
+    def create_buy_order(self, krw_amount: float, rate: float, currency: str, date: str = None, note: str = "") -> Trade:
+        buy_trade = build_buy_trade(self._next_trade_id('매수'), date or self.date, currency, rate, krw_amount, note)
+        self._add(buy_trade)
+        for planned in build_planned_trades(buy_trade, krw_amount, self.settings):
+            self._add(planned)
+        return buy_trade
+
+    def create_sell_order(self, buy_id: str, rate: float, ratio: float, date: str = None, note: str = "") -> Trade:
+        sell_trade = build_sell_trade(self._next_trade_id('매도'), self.trades[buy_id], rate, ratio,
+                                      date or self.date, note)
+        self._add(sell_trade)
+        return sell_trade
+
+    def create_stop_loss(self, buy_id: str, rate: float, note: str = "") -> Trade:
+        sold_foreign = sum(t.foreign_amount for t in self.children.get(buy_id, {}).values()
+                           if t.type in ('매도', '손절'))
+        stop_loss_trade = build_stop_loss_trade(self._next_trade_id('손절'), self.trades[buy_id], rate,
+                                                sold_foreign, self.date, note)
+        self._add(stop_loss_trade)
+        return stop_loss_trade
+
+    def delete_trade(self, trade_id: str):
+        trade = self.trades.pop(trade_id)
+        if trade.related_id:
+            self.children.get(trade.related_id, {}).pop(trade_id, None)
+        self.aggregate.apply(trade, -1)
+
+
+@dataclass
+class BacktestResult:
+    realized_profit: float      # 매도/손절 실현 손익 합계
+    unrealized_profit: float    # 마지막 환율 기준 평가 손익
+    total_profit: float
+    max_drawdown: float         # 평가 손익 포함 누적 손익의 최대 낙폭
+    trade_count: int            # 체결된 매수/매도/손절 수
+    buy_count: int
+    sell_count: int
+    stop_loss_count: int
+    holding_amount: float       # 마지막 보유 외화 수량
+    equity: np.ndarray = field(repr=False)  # 틱별 누적 손익 (실현 + 평가)
+    trades: List[Trade] = field(repr=False, default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            'realized_profit': self.realized_profit,
+            'unrealized_profit': self.unrealized_profit,
+            'total_profit': self.total_profit,
+            'max_drawdown': self.max_drawdown,
+            'trade_count': self.trade_count,
+            'buy_count': self.buy_count,
+            'sell_count': self.sell_count,
+            'stop_loss_count': self.stop_loss_count,
+            'holding_amount': self.holding_amount
+        }
+
+
+def run_backtest(rates: np.ndarray, settings: CurrencySettings, timestamps: Optional[np.ndarray] = None,
+                 initial_amount: Optional[float] = None, fill_at: str = 'trigger',
+                 finder: Optional[CrossingFinder] = None) -> BacktestResult:
+    """환율 배열을 사다리 전략으로 재생합니다.
+
+    첫 틱에 initial_amount(기본값: settings.default_amount)만큼 매수한 뒤, 예정 거래가 발동하는
+    틱만 순서대로 처리합니다. 틱을 하나씩 돌지 않고 각 예정 거래의 발동 틱을 CrossingFinder로
+    바로 찾으며, 틱별 손익 곡선은 체결 시점의 보유 상태로 한 번에 계산합니다.
+    같은 환율 배열로 여러 번 실행할 때는 finder를 넘겨 구간 계산을 재사용할 수 있습니다.
+    """
+    finder = finder or CrossingFinder(rates)
+    rates = finder.rates
+    if not len(rates):
+        raise ValueError("환율 데이터가 없습니다.")
+
+    queue = []   # (발동 틱, 같은 틱 안의 처리 순서, 추가 순서, 예정 거래)
+    order = [0]
+    tick = 0
+
+    def schedule(planned: Trade):
+        direction = TriggerIndex.DIRECTIONS[planned.type]
+        at = finder.first_cross(planned.rate, tick, direction)
+        if at is not None:
+            # 올라갈 때는 낮은 환율부터, 내려갈 때는 높은 환율부터 (TriggerIndex.crossed 순서)
+            heapq.heappush(queue, (at, planned.rate if direction == 'up' else -planned.rate, order[0], planned))
+            order[0] += 1
+
+    def date_of(index: int) -> str:
+        if timestamps is None:
+            return str(index)
+        return datetime.fromtimestamp(float(timestamps[index])).strftime("%Y-%m-%d")
+
+    ledger = BacktestLedger(settings, schedule)
+    engine = PaperTradingEngine(ledger, fill_at=fill_at, log_fills=False)
+    # 틱 위치, 실현 손익, 보유 수량, 평균 단가 (체결이 있었던 틱마다)
+    states = [(0, 0.0, 0.0, 0.0)]
+
+    def record_state(index: int):
+        aggregate = ledger.aggregate.rounded()
+        holding = round(aggregate.buy_foreign - aggregate.sold_foreign, 6)
+        states.append((index, aggregate.realized_profit, holding, aggregate.avg_rate))
+
+    ledger.date = date_of(0)
+    amount = settings.default_amount if initial_amount is None else initial_amount
+    if amount:
+        ledger.create_buy_order(amount, float(rates[0]), settings.currency)
+        record_state(0)
+
+    while queue:
+        tick = queue[0][0]
+        events = []
+        while queue and queue[0][0] == tick:
+            planned = heapq.heappop(queue)[3]
+            events.append(TriggerEvent(planned.id, planned.type, planned.currency, planned.rate,
+                                       float(rates[tick]), planned.related_id))
+        ledger.date = date_of(tick)
+        if engine.execute(events):
+            record_state(tick)
+
+    # 틱별 누적 손익: 각 틱에 해당하는 마지막 체결 상태로 평가 (calculate_current_value와 같은 식)
+    state_ticks, realized, holding, avg_rate = (np.array(column) for column in zip(*states))
+    segment = np.searchsorted(state_ticks, np.arange(len(rates)), side='right') - 1
+    equity = realized[segment] + holding[segment] * (rates - avg_rate[segment])
+    drawdown = np.maximum.accumulate(equity) - equity
+
+    counts = {trade_type: 0 for trade_type in ('매수', '매도', '손절')}
+    for trade in ledger.filled:
+        counts[trade.type] += 1
+    final_realized = float(realized[-1])
+    final_unrealized = float(holding[-1] * (rates[-1] - avg_rate[-1])) if holding[-1] else 0.0
+    return BacktestResult(
+        realized_profit=round(final_realized, 2),
+        unrealized_profit=round(final_unrealized, 2),
+        total_profit=round(final_realized + final_unrealized, 2),
+        max_drawdown=round(float(drawdown.max()), 2),
+        trade_count=len(ledger.filled),
+        buy_count=counts['매수'],
+        sell_count=counts['매도'],
+        stop_loss_count=counts['손절'],
+        holding_amount=float(holding[-1]),
+        equity=equity,
+        trades=ledger.filled
+    )
+
+
+def load_settings(path: str, currency: str) -> CurrencySettings:
+    """settings.json에서 통화 설정을 읽습니다. (TradingSystem.load_settings와 같은 파일 형식)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return CurrencySettings.from_dict(json.load(f)[currency])
+
+
+def main():
+    from tick_history import TickHistory
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', required=True, help='TickHistory 디렉터리')
+    parser.add_argument('--currency', default='USD')
+    parser.add_argument('--settings', default='settings.json')
+    parser.add_argument('--resolution', default='ticks', choices=['ticks', '1m', '1h', '1d'],
+                        help="'ticks'이면 모든 틱, 아니면 봉의 종가")
+    parser.add_argument('--start', type=float, help='시작 시각 (epoch 초)')
+    parser.add_argument('--end', type=float, help='끝 시각 (epoch 초)')
+    parser.add_argument('--fill-at', default='trigger', choices=['trigger', 'market'])
+    args = parser.parse_args()
+
+    history = TickHistory(args.history)
+    if args.resolution == 'ticks':
+        series = history.ticks(args.currency, args.start, args.end)
+        rates = series['rate']
+    else:
+        series = history.ohlc(args.currency, args.resolution, args.start, args.end)
+        rates = series['close']
+    settings = load_settings(args.settings, args.currency)
+
+    result = run_backtest(rates, settings, timestamps=series['timestamp'], fill_at=args.fill_at)
+    print(f"{args.currency} {len(rates)}틱, 증가폭 {settings.rate_increments}, 손절 -{settings.stop_loss_gap}, "
+          f"추가 매수 -{settings.buy_drop_threshold}")
+    for key, value in result.to_dict().items():
+        print(f"  {key}: {value:,.2f}" if isinstance(value, float) else f"  {key}: {value:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""환율 페이지 추출 방식별 파싱 시간과 메모리 사용량 벤치마크
+
+    python -m benchmarks.bench_extract [--repeat 50]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from rate_extractor import ScanExtractor, StrainerExtractor, SoupExtractor, create_extractor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+FIXTURES = ['usd-krw.html', 'jpy-krw.html']
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def measure(extractor, content: bytes, repeat: int) -> dict:
+    """한 틱(페이지 1회 파싱)당 평균 시간과 최대 메모리를 측정합니다."""
+    extractor.extract(content)  # 워밍업
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extractor.extract(content)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    extractor.extract(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'ms_per_tick': elapsed * 1000, 'peak_kb': peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help='추출 방식별 반복 횟수')
+    args = parser.parse_args()
+
+    extractors = [ScanExtractor(), StrainerExtractor(), SoupExtractor(), create_extractor('fast')]
+    print(f"{'fixture':<14}{'extractor':<12}{'size(KB)':>10}{'ms/tick':>10}{'peak(KB)':>10}")
+    for fixture in FIXTURES:
+        content = load_fixture(fixture)
+        for extractor in extractors:
+            result = measure(extractor, content, args.repeat)
+            print(f"{fixture:<14}{extractor.name:<12}{len(content) / 1024:>10.0f}"
+                  f"{result['ms_per_tick']:>10.2f}{result['peak_kb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
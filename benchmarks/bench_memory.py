@@ -0,0 +1,197 @@
+"""거래 장부를 메모리에 올리는 방식별 크기와 전체 조회(scan) 시간을 비교하는 벤치마크
+
+    python -m benchmarks.bench_memory --sizes 100000 1000000 --out memory.json
+
+- dataclass: 이전 Trade (인스턴스마다 __dict__, 문자열 intern 없음)
+- slots: 지금의 Trade (__slots__ + 날짜/유형/통화/메모/연관ID intern)
+- columnar: 숫자 열은 array('d'), 유형/통화는 1바이트 코드로 저장하고 행마다 뷰를 만드는 열 단위 배치
+  (인덱스가 Trade 객체를 붙잡고 제자리에서 고치는 구조라 TradingSystem에는 쓰지 않고 비교용으로만 둠)
+
+장부는 bench_trading.build_book으로 만든 합성 장부를 ID만 바꿔 필요한 크기까지 반복하고,
+JSON 문자열에서 읽어 들이는 것까지 포함해 tracemalloc으로 남아 있는 메모리를 잽니다.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from dataclasses import fields, make_dataclass
+from typing import Callable, Dict, List
+
+from benchmarks.bench_trading import OfflineRateMonitor, build_book
+from trading import Trade, TradingSystem
+
+# 이전 Trade와 같은 필드의 일반 dataclass
+LegacyTrade = make_dataclass('LegacyTrade', [(field.name, field.type) for field in fields(Trade)])
+
+NUMERIC_FIELDS = ('rate', 'krw_amount', 'foreign_amount', 'profit')
+
+
+class TradeColumns:
+    """열 단위로 저장한 거래 목록. 행은 TradeRow 뷰로 읽습니다."""
+    def __init__(self, records: List[dict]):
+        self.type_names: List[str] = []
+        self.currency_names: List[str] = []
+        type_codes: Dict[str, int] = {}
+        currency_codes: Dict[str, int] = {}
+        self.ids = [r['id'] for r in records]
+        # 문자열 열은 Trade와 같이 intern
+        self.dates = [sys.intern(r['date']) for r in records]
+        self.notes = [sys.intern(r['note']) for r in records]
+        self.related_ids = [sys.intern(r['related_id']) for r in records]
+        self.types = array('B', (self._code(r['type'], type_codes, self.type_names) for r in records))
+        self.currencies = array('B', (self._code(r['currency'], currency_codes, self.currency_names)
+                                      for r in records))
+        for name in NUMERIC_FIELDS:
+            setattr(self, name, array('d', (r[name] for r in records)))
+
+    @staticmethod
+    def _code(value: str, codes: Dict[str, int], names: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (TradeRow(self, row) for row in range(len(self.ids)))
+
+
+class TradeRow:
+    """TradeColumns의 한 행 (Trade와 같은 속성 이름)"""
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns: TradeColumns, row: int):
+        self._columns = columns
+        self._row = row
+
+    id = property(lambda self: self._columns.ids[self._row])
+    date = property(lambda self: self._columns.dates[self._row])
+    type = property(lambda self: self._columns.type_names[self._columns.types[self._row]])
+    currency = property(lambda self: self._columns.currency_names[self._columns.currencies[self._row]])
+    rate = property(lambda self: self._columns.rate[self._row])
+    krw_amount = property(lambda self: self._columns.krw_amount[self._row])
+    foreign_amount = property(lambda self: self._columns.foreign_amount[self._row])
+    profit = property(lambda self: self._columns.profit[self._row])
+    note = property(lambda self: self._columns.notes[self._row])
+    related_id = property(lambda self: self._columns.related_ids[self._row])
+
+
+LAYOUTS: Dict[str, Callable[[List[dict]], object]] = {
+    'dataclass': lambda records: [LegacyTrade(**record) for record in records],
+    'slots': lambda records: [Trade(**record) for record in records],
+    'columnar': TradeColumns,
+}
+
+
+def _sum_usd_buys(book) -> float:
+    return sum(t.krw_amount for t in book if t.type == '매수' and t.currency == 'USD')
+
+
+def _jpy_planned_ids(book) -> List[str]:
+    return [t.id for t in book if t.currency == 'JPY' and t.type in ('매도예정', '손절예정')]
+
+
+def _sum_usd_buys_columnar(columns: TradeColumns) -> float:
+    # 뷰를 만들지 않고 열을 직접 훑는 경우
+    buy, usd = columns.type_names.index('매수'), columns.currency_names.index('USD')
+    return sum(amount for amount, t, c in zip(columns.krw_amount, columns.types, columns.currencies)
+               if t == buy and c == usd)
+
+
+def make_records(size: int, base_size: int, seed: int) -> List[dict]:
+    """base_size건의 합성 장부를 만들어 ID를 바꿔 가며 size건까지 반복합니다."""
+    workdir = tempfile.mkdtemp(prefix='fxtrader-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        trading_system = TradingSystem(start_rate_monitoring=False, rate_monitor=OfflineRateMonitor())
+        build_book(trading_system, min(size, base_size), seed)
+        base = [trade.to_dict() for trade in trading_system.trades]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    records = []
+    copy = 0
+    while len(records) < size:
+        suffix = f'-{copy}' if copy else ''
+        for record in base[:size - len(records)]:
+            records.append({**record, 'id': record['id'] + suffix,
+                            'related_id': record['related_id'] + suffix if record['related_id'] else ''})
+        copy += 1
+    return records
+
+
+def measure_layout(name: str, text: str, repeat: int) -> dict:
+    build = LAYOUTS[name]
+
+    # JSON에서 읽어 들인 문자열까지 포함해 장부가 붙잡고 있는 메모리
+    gc.collect()
+    tracemalloc.start()
+    book = build(json.loads(text))
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del book
+    gc.collect()
+
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        book = build(json.loads(text))
+        load_times.append((time.perf_counter() - start) * 1000)
+
+    scans = {'sum_usd_buys': _sum_usd_buys, 'jpy_planned_ids': _jpy_planned_ids}
+    if name == 'columnar':
+        scans['sum_usd_buys_columns'] = _sum_usd_buys_columnar
+    scan_times = {}
+    for scan_name, scan in scans.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            scan(book)
+            samples.append((time.perf_counter() - start) * 1000)
+        scan_times[scan_name] = statistics.median(samples)
+    return {'layout': name, 'size': len(book), 'bytes': retained, 'bytes_per_trade': retained / len(book),
+            'load_ms': statistics.median(load_times), 'scan_ms': scan_times}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--base-size', type=int, default=20000, help='반복할 합성 장부 크기')
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS), choices=list(LAYOUTS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=20240101)
+    parser.add_argument('--out', help='결과 JSON 파일')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        text = json.dumps(make_records(size, args.base_size, args.seed), ensure_ascii=False)
+        print(f"\n장부 {size:,}건 (JSON {len(text) / 2**20:,.1f} MiB)")
+        for name in args.layouts:
+            result = measure_layout(name, text, args.repeat)
+            results.append(result)
+            scans = ', '.join(f'{scan} {ms:.1f} ms' for scan, ms in result['scan_ms'].items())
+            print(f"  {name:<10}{result['bytes'] / 2**20:>9,.1f} MiB ({result['bytes_per_trade']:.0f} B/건)  "
+                  f"읽기 {result['load_ms']:,.0f} ms  {scans}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
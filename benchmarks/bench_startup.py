@@ -0,0 +1,83 @@
+"""새 프로세스에서 app.py를 불러오고 첫 요청을 처리하기까지 걸리는 시간(콜드 스타트)을 재는 벤치마크
+
+    python -m benchmarks.bench_startup --repeat 10 --out startup.json
+
+매 측정마다 빈 작업 디렉터리에서 새 파이썬 프로세스를 띄우므로 모듈 캐시가 없는 상태의 값입니다.
+(바이트코드 .pyc 캐시는 사용) 환율 폴러는 시작하지 않으므로 네트워크 없이 실행됩니다.
+
+- interpreter: 아무것도 불러오지 않은 파이썬 시작 시간 (기준값)
+- import_app: import app (Flask 앱 생성 포함)
+- first_request: 첫 GET / (거래/설정 파일 읽기와 TradingSystem 생성 포함)
+- total: 프로세스 시작부터 첫 응답까지
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({{'import_app': imported - start, 'first_request': done - imported,
+                  'modules': sorted(name for name in ('cloudscraper', 'bs4', 'schedule', 'numpy')
+                                    if name in sys.modules)}}))
+'''
+
+
+def run_once(workdir: str) -> dict:
+    env = dict(os.environ, FXTRADER_START_POLLER='0')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True, cwd=workdir, env=env)
+    interpreter = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT)], check=True, cwd=workdir, env=env,
+                            capture_output=True, text=True).stdout
+    total = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result.update(interpreter=interpreter, total=total)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help='결과 JSON 파일')
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.repeat):
+        workdir = tempfile.mkdtemp(prefix='fxtrader-startup-')
+        try:
+            samples.append(run_once(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = {}
+    for name in ('interpreter', 'import_app', 'first_request', 'total'):
+        values = [sample[name] * 1000 for sample in samples]
+        summary[name] = {'median_ms': statistics.median(values), 'min_ms': min(values)}
+        print(f"  {name:<16}{summary[name]['median_ms']:>10.1f} ms (min {summary[name]['min_ms']:.1f}, {args.repeat}회)")
+    print(f"  첫 요청까지 불러온 무거운 모듈: {', '.join(samples[-1]['modules']) or '없음'}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'samples': samples}, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""합성 거래 장부로 TradingSystem 메서드와 Flask 라우트의 처리 시간을 재는 벤치마크
+
+    python -m benchmarks.bench_trading --sizes 1000 10000 100000 --out bench.json
+    python -m benchmarks.bench_trading --sizes 1000000 --storage journal --out bench-1m.json
+    python -m benchmarks.bench_trading --out new.json --compare old.json
+
+장부는 고정된 시드로 create_buy_order/create_sell_order/create_stop_loss를 호출해 만들므로
+커밋이 달라도 같은 크기면 같은 장부가 만들어집니다. 환율은 오프라인 스텁(OfflineRateMonitor)이
+돌려주므로 네트워크 없이 실행됩니다. 결과는 JSON으로 저장되고, --compare로 이전 결과와 비교하면
+기준보다 느려진 항목을 표시합니다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from rate_monitor import RateData, RateMonitor
+from trading import TradingSystem
+
+# 스텁 환율 (JPY는 100엔 기준)
+BASE_RATES = {'USD': 1400.0, 'JPY': 950.0}
+
+
+class OfflineRateMonitor(RateMonitor):
+    """investing.com 대신 고정 환율을 돌려주는 RateMonitor (네트워크 요청 없음)"""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.rates = dict(rates or BASE_RATES)
+
+    def _fetch_rate(self, currency) -> Optional[RateData]:
+        rate = self.rates.get(currency)
+        if rate is None:
+            return None
+        return RateData(currency=currency, current_rate=rate, change_amount=0.0, change_percent=0.0,
+                        timestamp=time.strftime('%H:%M:%S'))
+
+
+def build_book(trading_system: TradingSystem, size: int, seed: int = 20240101):
+    """거래가 약 size건이 될 때까지 매수(사다리 포함)/분할 매도/손절을 만듭니다.
+
+    통화별 환율은 무작위 행보로 움직이고 날짜는 매수마다 하루씩 지나갑니다.
+    매수 한 건은 예정 거래 5건을 함께 만들므로 장부의 대부분은 예정 거래입니다.
+    """
+    rng = random.Random(seed)
+    rates = dict(BASE_RATES)
+    day = date(2020, 1, 1)
+    open_buys: List[str] = []
+
+    def fill():
+        nonlocal day
+        while len(trading_system.trades) < size:
+            currency = 'USD' if rng.random() < 0.6 else 'JPY'
+            rates[currency] = max(rates[currency] + rng.gauss(0, 3), 100.0)
+            rate = round(rates[currency], 2)
+            action = rng.random()
+            if action < 0.7 or not open_buys:
+                buy = trading_system.create_buy_order(rng.choice([100000, 200000, 500000]), rate, currency,
+                                                      date=day.isoformat())
+                open_buys.append(buy.id)
+                day += timedelta(days=1)
+            elif action < 0.95:
+                buy = trading_system.get_trade(rng.choice(open_buys))
+                trading_system.create_sell_order(buy.id, round(buy.rate + 20, 2), 0.3, date=day.isoformat())
+            else:
+                buy_id = open_buys.pop(rng.randrange(len(open_buys)))
+                buy = trading_system.get_trade(buy_id)
+                trading_system.create_stop_loss(buy_id, round(buy.rate - 20, 2))
+
+    # 변경마다 저장하지 않고 장부 전체를 한 번에 기록
+    trading_system.run_batch(fill)
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> dict:
+    """func를 repeat번 실행한 시간 통계 (ms). setup은 매 실행 전에 호출되며 시간에 포함되지 않습니다."""
+    samples = []
+    for _ in range(repeat):
+        arguments = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*arguments)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'repeat': repeat,
+        'first_ms': samples[0],
+        'min_ms': min(samples),
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.fmean(samples),
+    }
+
+
+def bind_app(trading_system: TradingSystem):
+    """벤치마크용 TradingSystem을 쓰는 Flask 앱 (환율 폴러는 시작하지 않음)"""
+    from app import create_app
+    return create_app(trading_system=trading_system)
+
+
+def _mutation_candidates(trading_system: TradingSystem, count: int) -> List[str]:
+    """매도 거래가 없어 수정/삭제할 수 있는 매수 ID"""
+    buys = trading_system.get_trades_by_type(['매수'])
+    return [t.id for t in reversed(buys) if not trading_system.has_related_sells(t.id)][:count]
+
+
+def bench_size(size: int, storage: str, repeat: int, mutations: int, seed: int) -> List[dict]:
+    workdir = tempfile.mkdtemp(prefix='fxtrader-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        trading_system = TradingSystem(storage=storage, start_rate_monitoring=False,
+                                       rate_monitor=OfflineRateMonitor())
+        trading_system.rate_poller.poll_once()  # 환율 카드용 스냅샷 발행
+
+        start = time.perf_counter()
+        build_book(trading_system, size, seed)
+        build_seconds = time.perf_counter() - start
+        size = len(trading_system.trades)
+        print(f"\n장부 {size:,}건 생성 ({build_seconds:.1f}초, 저장소 {storage})")
+
+        results = []
+
+        def record(name, stats):
+            stats = {'size': size, 'storage': storage, 'name': name, **stats}
+            results.append(stats)
+            print(f"  {name:<32}{stats['median_ms']:>12.3f} ms (min {stats['min_ms']:.3f}, "
+                  f"첫 실행 {stats['first_ms']:.3f}, {stats['repeat']}회)")
+
+        record('load_trades', measure(trading_system.load_trades, repeat))
+        record('save_trades', measure(trading_system.save_trades, repeat))
+
+        usd_holding = trading_system.calculate_holding_amount('USD')
+        calculations = {
+            'calculate_total_profit': lambda: trading_system.calculate_total_profit(),
+            'calculate_currency_profit': lambda: trading_system.calculate_currency_profit('USD'),
+            'calculate_total_buy_amount': lambda: trading_system.calculate_total_buy_amount('USD'),
+            'calculate_holding_amount': lambda: trading_system.calculate_holding_amount('USD'),
+            'calculate_current_value': lambda: trading_system.calculate_current_value('USD', 1400.0, usd_holding),
+        }
+        for name, func in calculations.items():
+            record(name, measure(func, repeat * 100))
+
+        # 수정/삭제는 변경마다 저장소에 기록하므로 저장 비용까지 포함
+        candidates = _mutation_candidates(trading_system, mutations * 2)
+        updates, deletes = candidates[:mutations], candidates[mutations:]
+        if updates:
+            record('update_trade', measure(
+                lambda trade: trading_system.update_trade(trade.id, trade.date, trade.rate + 1, trade.krw_amount,
+                                                          trade.note),
+                len(updates), setup=lambda: trading_system.get_trade(updates.pop())))
+        if deletes:
+            record('delete_trade', measure(trading_system.delete_trade, len(deletes), setup=deletes.pop))
+
+        client = bind_app(trading_system).test_client()
+        routes = {
+            'GET /': '/',
+            'GET /planned': '/planned',
+            'GET /api/rate_cards': '/api/rate_cards?update=true',
+        }
+        for name, url in routes.items():
+            def get(url=url):
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} 응답 코드 {response.status_code}")
+            record(name, measure(get, repeat))
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """같은 (크기, 저장소, 항목)의 중앙값을 비교해 threshold배 넘게 느려진 항목을 반환합니다."""
+    before = {(r['size'], r['storage'], r['name']): r['median_ms'] for r in baseline['results']}
+    regressions = []
+    print(f"\n{baseline['meta'].get('commit')} 대비 {current['meta'].get('commit')}")
+    for r in current['results']:
+        old = before.get((r['size'], r['storage'], r['name']))
+        if old is None:
+            continue
+        ratio = r['median_ms'] / old if old else float('inf')
+        flag = ' <- 느려짐' if ratio > threshold else ''
+        print(f"  {r['size']:>9,} {r['name']:<32}{old:>12.3f} -> {r['median_ms']:>12.3f} ms ({ratio:.2f}x){flag}")
+        if flag:
+            regressions.append(f"{r['size']} {r['name']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='장부 크기 (거래 수, 1000000까지 권장)')
+    parser.add_argument('--storage', default='json', choices=['json', 'journal', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=5, help='항목별 반복 횟수 (계산 메서드는 100배)')
+    parser.add_argument('--mutations', type=int, default=5, help='update_trade/delete_trade 측정 횟수')
+    parser.add_argument('--seed', type=int, default=20240101)
+    parser.add_argument('--out', help='결과 JSON 파일')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON 파일')
+    parser.add_argument('--threshold', type=float, default=1.25, help='느려짐으로 볼 배율')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results += bench_size(size, args.storage, args.repeat, args.mutations, args.seed)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.out}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""대시보드 요청 혼합으로 한 프로세스가 감당하는 처리량과 지연 시간을 재는 부하 테스트
+
+    python -m benchmarks.load_test --concurrency 1 8 32 64 --duration 10
+    python -m benchmarks.load_test --mix rate_cards=90,planned=10 --stub-delay 0.5 --out load.json
+
+앱은 이 프로세스 안의 스레드 WSGI 서버에서 실행되고, 환율은 지연 시간을 조절할 수 있는
+로컬 investing.com 스텁(StubInvestingServer)에서 가져옵니다. 가상 사용자는 서버의 GIL을
+함께 쓰지 않도록 별도 프로세스(--client-processes)의 스레드로 실행되며, 각자 연결을 유지한 채
+--mix 비율대로 요청을 보냅니다. 동시 사용자 수마다 경로별 처리량, p50/p95/p99 지연, 오류율을 출력합니다.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+# 기본 요청 비율: 대부분은 환율 카드 폴링
+DEFAULT_MIX = 'rate_cards=85,planned=5,buy=3,sell=3,edit=2,delete=2'
+ROUTES = ('rate_cards', 'planned', 'buy', 'sell', 'edit', 'delete')
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'rate_cards=85,buy=5' -> {'rate_cards': 85.0, 'buy': 5.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"지원하지 않는 경로입니다: {name} (가능: {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """정렬된 값의 q 분위수 (최근접 순위 방식)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class VirtualUser:
+    """연결 하나를 유지하며 요청 비율대로 요청을 보내는 대시보드 사용자
+
+    수정/삭제/매도 대상은 부하 시작 시 나눠 받은 매수 ID 중에서 고릅니다.
+    매도한 매수는 삭제할 수 없으므로 삭제 후보에서 뺍니다.
+    """
+    def __init__(self, host: str, port: int, mix: Dict[str, float], buy_ids: List[str], seed: int,
+                 think_time: float = 0.0):
+        self.host, self.port = host, port
+        self.names, self.weights = list(mix), list(mix.values())
+        self.rng = random.Random(seed)
+        self.editable = list(buy_ids)
+        self.deletable = list(buy_ids)
+        self.think_time = think_time
+        self.etag: Optional[str] = None
+        self.samples: List[Tuple[str, float, int]] = []  # (경로, 지연 초, 상태 코드; 0은 연결 오류)
+        self._conn = None
+
+    def _request(self, method: str, path: str, form: Optional[dict] = None) -> int:
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if path.startswith('/api/rate_cards') and self.etag:
+            headers['If-None-Match'] = self.etag
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        self._conn.request(method, path, body=body, headers=headers)
+        response = self._conn.getresponse()
+        response.read()
+        if path.startswith('/api/rate_cards') and response.getheader('ETag'):
+            self.etag = response.getheader('ETag')
+        return response.status
+
+    def _next_request(self, route: str) -> Tuple[str, str, Optional[dict]]:
+        rng = self.rng
+        today = time.strftime('%Y-%m-%d')
+        if route == 'rate_cards':
+            return 'GET', '/api/rate_cards?update=true', None
+        if route == 'planned':
+            return 'GET', '/planned', None
+        if route == 'buy' or not self.editable:
+            currency = rng.choice(['USD', 'JPY'])
+            rate = round((1400 if currency == 'USD' else 950) + rng.uniform(-20, 20), 2)
+            return 'POST', '/buy', {'krw_amount': '100000', 'rate': rate, 'date': today, 'note': '부하 테스트',
+                                    'currency': currency}
+        if route == 'sell':
+            buy_id = rng.choice(self.editable)
+            if buy_id in self.deletable:
+                self.deletable.remove(buy_id)
+            return 'POST', '/sell', {'buy_id': buy_id, 'rate': '1500', 'ratio': '0.1', 'date': today,
+                                     'note': '부하 테스트'}
+        if route == 'edit':
+            buy_id = rng.choice(self.editable)
+            return 'POST', f'/edit/{quote(buy_id)}', {'date': today, 'rate': round(1400 + rng.uniform(-20, 20), 2),
+                                                      'krw_amount': '100000', 'note': '부하 테스트 수정'}
+        # delete: 매도 거래가 없는 매수만 삭제
+        if not self.deletable:
+            return 'GET', '/planned', None
+        buy_id = self.deletable.pop(rng.randrange(len(self.deletable)))
+        self.editable.remove(buy_id)
+        return 'POST', f'/delete/{quote(buy_id)}', {}
+
+    def run(self, deadline: float):
+        while time.perf_counter() < deadline:
+            route = self.rng.choices(self.names, self.weights)[0]
+            method, path, form = self._next_request(route)
+            start = time.perf_counter()
+            try:
+                status = self._request(method, path, form)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = None
+            self.samples.append((route, time.perf_counter() - start, status))
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+        if self._conn is not None:
+            self._conn.close()
+
+
+def _run_clients(args) -> List[Tuple[str, float, int]]:
+    """클라이언트 프로세스: 가상 사용자마다 스레드 하나"""
+    host, port, mix, id_slices, seed, duration, think_time = args
+    deadline = time.perf_counter() + duration
+    users = [VirtualUser(host, port, mix, buy_ids, seed + i, think_time) for i, buy_ids in enumerate(id_slices)]
+    threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [sample for user in users for sample in user.samples]
+
+
+def summarize(samples: List[Tuple[str, float, int]], duration: float) -> Dict[str, dict]:
+    """경로별(과 전체) 요청 수, 처리량, 지연 분위수(ms), 오류율"""
+    by_route: Dict[str, List[Tuple[float, int]]] = {}
+    for route, latency, status in samples:
+        by_route.setdefault(route, []).append((latency, status))
+        by_route.setdefault('all', []).append((latency, status))
+    summary = {}
+    for route, values in by_route.items():
+        latencies = sorted(latency * 1000 for latency, _ in values)
+        errors = sum(1 for _, status in values if status == 0 or status >= 400)
+        summary[route] = {
+            'requests': len(values),
+            'rps': len(values) / duration,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'error_rate': errors / len(values),
+        }
+    return summary
+
+
+def _serve(wsgi_app) -> Tuple[object, threading.Thread]:
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main():
+    import logging
+
+    from benchmarks.bench_trading import bind_app, build_book
+    from benchmarks.stub_server import StubInvestingServer
+    from rate_monitor import RateMonitor
+    from trading import TradingSystem
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64], help='동시 사용자 수 단계')
+    parser.add_argument('--duration', type=float, default=10.0, help='단계별 부하 시간 (초)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'경로별 요청 비율 (기본값: {DEFAULT_MIX})')
+    parser.add_argument('--think-time', type=float, default=0.0, help='사용자별 요청 간 평균 대기 (초, 0이면 쉬지 않음)')
+    parser.add_argument('--book-size', type=int, default=10000, help='시작 장부 크기 (거래 수)')
+    parser.add_argument('--storage', default='json', choices=['json', 'journal', 'sqlite'])
+    parser.add_argument('--stub-delay', type=float, default=0.2, help='스텁 investing.com 응답 지연 (초)')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='환율 조회 주기 (초)')
+    parser.add_argument('--client-processes', type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='결과 JSON 파일')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # 요청마다 찍히는 접속 로그 끄기
+    workdir = tempfile.mkdtemp(prefix='fxtrader-load-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    stub = StubInvestingServer(delay=args.stub_delay, error_rate=args.stub_error_rate).start()
+    server = None
+    try:
+        rate_monitor = RateMonitor(urls=stub.urls, cache_ttl=args.poll_interval)
+        trading_system = TradingSystem(storage=args.storage, rate_poll_interval=args.poll_interval,
+                                       rate_monitor=rate_monitor)
+        build_book(trading_system, args.book_size, args.seed)
+        server, _ = _serve(bind_app(trading_system))
+        host, port = server.server_address[:2]
+        print(f"장부 {len(trading_system.trades):,}건, 서버 http://{host}:{port}, 스텁 지연 {args.stub_delay}초, "
+              f"클라이언트 프로세스 {args.client_processes}개")
+
+        levels = []
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(args.client_processes) as pool:
+            for level in args.concurrency:
+                # 사용자마다 서로 겹치지 않는 매수 ID를 나눠 줌 (매도 거래가 없는 매수만)
+                buy_ids = [t.id for t in trading_system.get_trades_by_type(['매수'])
+                           if not trading_system.has_related_sells(t.id)]
+                random.Random(args.seed + level).shuffle(buy_ids)
+                slices = [buy_ids[i::level] for i in range(level)]
+                processes = min(args.client_processes, level)
+                jobs = [(host, port, mix, slices[p::processes], args.seed * 1000 + level * 100 + p * 10,
+                         args.duration, args.think_time) for p in range(processes)]
+                requests_before = stub.request_count
+                samples = [sample for result in pool.map(_run_clients, jobs) for sample in result]
+                summary = summarize(samples, args.duration)
+                levels.append({'concurrency': level, 'stub_requests': stub.request_count - requests_before,
+                               'routes': summary})
+
+                print(f"\n동시 사용자 {level}명 ({args.duration:.0f}초, 스텁 조회 {levels[-1]['stub_requests']}회)")
+                print(f"  {'경로':<12}{'요청':>8}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'오류율':>8}")
+                for route in [name for name in ROUTES if name in summary] + ['all']:
+                    r = summary.get(route)
+                    if r:
+                        print(f"  {route:<12}{r['requests']:>8}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}"
+                              f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['error_rate']:>8.1%}")
+
+        if args.out:
+            with open(os.path.join(cwd, args.out), 'w', encoding='utf-8') as f:
+                json.dump({'args': vars(args), 'book_size': args.book_size, 'levels': levels}, f,
+                          ensure_ascii=False, indent=2)
+            print(f"\n결과 저장: {args.out}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        stub.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
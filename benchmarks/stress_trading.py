@@ -0,0 +1,121 @@
+"""여러 프로세스/스레드가 동시에 주문을 만들고 지우는 TradingSystem 스트레스 테스트
+
+    python -m benchmarks.stress_trading --storage journal --processes 4 --threads 4 --ops 100
+
+모든 작업이 끝나면 새로 불러온 거래 목록이 각 작업자가 보고한 결과와 일치하는지,
+ID가 중복되지 않는지, 누적 집계가 전체 재계산과 같은지 확인합니다.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from trading import TradingSystem
+
+
+def _worker(args):
+    """한 프로세스: 여러 스레드가 같은 TradingSystem에서 매수/매도/삭제를 반복"""
+    workdir, storage, threads, ops, seed = args
+    os.chdir(workdir)
+    trading_system = TradingSystem(storage=storage, start_rate_monitoring=False)
+    created, deleted, errors = [], [], []
+    lock = threading.Lock()
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        mine = []  # 이 스레드가 만든 매수 ID
+        for _ in range(ops):
+            try:
+                action = rng.random()
+                if action < 0.5 or not mine:
+                    trade = trading_system.create_buy_order(100000, rng.choice([1400, 1380]), rng.choice(['USD', 'JPY']))
+                    mine.append(trade.id)
+                    with lock:
+                        created.append(trade.id)
+                elif action < 0.75:
+                    trade = trading_system.create_sell_order(rng.choice(mine), 1420, 0.3)
+                    with lock:
+                        created.append(trade.id)
+                else:
+                    buy_id = mine.pop(rng.randrange(len(mine)))
+                    if trading_system.has_related_sells(buy_id):
+                        continue
+                    trading_system.delete_trade(buy_id)
+                    with lock:
+                        deleted.append(buy_id)
+                # 다른 프로세스의 변경 사항 반영 (요청 처리 전 sync와 같은 역할)
+                trading_system.sync()
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+
+    workers = [threading.Thread(target=run, args=(seed * 1000 + i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    trading_system.storage.close()
+    return created, deleted, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--storage', default='journal', choices=['json', 'journal', 'sqlite'])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=100, help='스레드당 작업 수')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fxtrader-stress-')
+    start = time.perf_counter()
+    with Pool(args.processes) as pool:
+        results = pool.map(_worker, [(workdir, args.storage, args.threads, args.ops, seed)
+                                     for seed in range(args.processes)])
+    elapsed = time.perf_counter() - start
+
+    created = [trade_id for result in results for trade_id in result[0]]
+    deleted = set(trade_id for result in results for trade_id in result[1])
+    errors = [error for result in results for error in result[2]]
+
+    os.chdir(workdir)
+    trading_system = TradingSystem(storage=args.storage, start_rate_monitoring=False)
+    ids = [t.id for t in trading_system.trades]
+    actual = {trade_id for trade_id in ids if not trading_system.get_trade(trade_id).related_id
+              or trading_system.get_trade(trade_id).type in ('매도', '손절')}
+    expected = set(created) - deleted
+
+    problems = []
+    duplicates = [trade_id for trade_id, count in Counter(created).items() if count > 1]
+    if duplicates:
+        problems.append(f"중복 발급된 ID: {duplicates[:5]}")
+    if len(ids) != len(set(ids)):
+        problems.append("저장된 거래에 중복 ID가 있음")
+    if actual != expected:
+        problems.append(f"거래 불일치: 누락 {sorted(expected - actual)[:5]}, 초과 {sorted(actual - expected)[:5]}")
+    orphans = [t.id for t in trading_system.trades if t.related_id and not trading_system.get_trade(t.related_id)]
+    if orphans:
+        problems.append(f"매수 없는 연관 거래: {orphans[:5]}")
+    try:
+        trading_system.verify_aggregates()
+    except RuntimeError as e:
+        problems.append(str(e))
+
+    total_ops = args.processes * args.threads * args.ops
+    print(f"저장소 {args.storage}: {total_ops}건 작업, {elapsed:.2f}초 ({total_ops / elapsed:.0f} ops/s), "
+          f"거래 {len(ids)}건, 오류 {len(errors)}건")
+    for error in errors[:5]:
+        print(f"  오류: {error}")
+    for problem in problems:
+        print(f"  실패: {problem}")
+    if problems or errors:
+        sys.exit(1)
+    print("  통과")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""investing.com 대신 저장된 페이지를 돌려주는 로컬 HTTP 서버
+
+지연, 오류 응답, 봇 차단 페이지를 주입할 수 있어 RateMonitor의 타임아웃,
+재시도, 차단기 동작을 네트워크 없이 확인할 수 있습니다.
+
+    python -m benchmarks.stub_server --port 8901 --delay 0.2 --error-rate 0.1
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_extract import load_fixture
+
+CHALLENGE_PAGE = b'<html><head><title>Just a moment...</title></head><body>Checking your browser</body></html>'
+
+
+class StubInvestingServer:
+    """저장된 환율 페이지를 제공하는 스텁 서버 (설정값은 실행 중에도 변경 가능)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, challenge_rate: float = 0.0):
+        self.delay = delay                  # 응답 지연 (초)
+        self.error_rate = error_rate        # error_status로 응답할 확률
+        self.error_status = error_status
+        self.challenge_rate = challenge_rate  # 200 + 봇 차단 페이지로 응답할 확률
+        self.request_count = 0
+        self.pages = {
+            '/currencies/usd-krw': load_fixture('usd-krw.html'),
+            '/currencies/jpy-krw': load_fixture('jpy-krw.html'),
+        }
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def urls(self) -> dict:
+        """RateMonitor(urls=...)에 그대로 넘길 수 있는 통화별 URL"""
+        return {
+            'USD': f'{self.base_url}/currencies/usd-krw',
+            'JPY': f'{self.base_url}/currencies/jpy-krw',
+        }
+
+    def start(self) -> 'StubInvestingServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.request_count += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                page = stub.pages.get(self.path.split('?')[0])
+                if page is None:
+                    self._respond(404, b'not found')
+                elif random.random() < stub.error_rate:
+                    self._respond(stub.error_status, b'error')
+                elif random.random() < stub.challenge_rate:
+                    self._respond(200, CHALLENGE_PAGE)
+                else:
+                    self._respond(200, page)
+
+            def _respond(self, status, body):
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='investing.com 스텁 서버')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--challenge-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubInvestingServer(port=args.port, delay=args.delay, error_rate=args.error_rate,
+                                 challenge_rate=args.challenge_rate)
+    print(f"스텁 서버 실행 중: {server.base_url}")
+    server._server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""요청/환율 조회/저장 계측과 Prometheus 텍스트 형식 출력
+
+값을 올리는 쪽은 레이블별 값 객체에 잠금 한 번으로 더하기만 하고, 문자열 변환은
+/metrics를 읽을 때만 합니다. 거래 수처럼 이미 다른 곳에 있는 값은 수집 함수로 등록해
+읽을 때 계산합니다.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 요청/조회 지연용 기본 구간 (초)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 수집 함수가 돌려주는 값: [(레이블 dict, 값)]
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """레이블 조합별 값을 가진 지표 (counter, gauge, histogram)"""
+    def __init__(self, kind: str, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """레이블 값 순서대로 값 객체를 반환합니다. (자주 쓰는 조합은 호출하는 쪽에서 보관해도 됨)"""
+        key = tuple(str(value) for value in values)
+        child = self._values.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 레이블 개수가 맞지 않습니다: {key}")
+            with self._lock:
+                child = self._values.get(key)
+                if child is None:
+                    if self.kind == 'histogram':
+                        child = _HistogramValue(self.buckets)
+                    elif self.kind == 'gauge':
+                        child = _GaugeValue()
+                    else:
+                        child = _CounterValue()
+                    self._values[key] = child
+        return child
+
+    # 레이블이 없는 지표용 단축 메서드
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self._values.copy().items()):
+            labels = dict(zip(self.labelnames, key))
+            if self.kind != 'histogram':
+                lines.append(f'{self.name}{_format_labels(labels)} {_format_value(child.value)}')
+                continue
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(bound)})} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """지표와 수집 함수를 모아 Prometheus 텍스트 형식으로 출력합니다."""
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Samples]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # 모듈을 다시 불러와도 같은 지표를 공유
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register(Metric('counter', name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register(Metric('gauge', name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Metric:
+        return self._register(Metric('histogram', name, help, labelnames, buckets))
+
+    def add_collector(self, name: str, kind: str, help: str, collect: Callable[[], Samples]):
+        """/metrics를 읽을 때마다 collect()로 값을 계산하는 지표를 등록합니다."""
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name]
+            self._collectors.append((name, kind, help, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for name, kind, help, collect in list(self._collectors):
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"지표 수집 중 오류 ({name}): {str(e)}")
+                continue
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# HTTP 요청
+REQUEST_SECONDS = REGISTRY.histogram('fxtrader_http_request_duration_seconds', '경로별 요청 처리 시간',
+                                     ['route', 'method'])
+REQUESTS = REGISTRY.counter('fxtrader_http_requests_total', '경로/응답 코드별 요청 수',
+                            ['route', 'method', 'status'])
+
+# 환율 조회 (investing.com)
+RATE_FETCH_SECONDS = REGISTRY.histogram('fxtrader_rate_fetch_duration_seconds',
+                                        '통화별 환율 페이지 요청 시간 (재시도마다 기록)', ['currency'],
+                                        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+RATE_FETCH_FAILURES = REGISTRY.counter('fxtrader_rate_fetch_failures_total', '통화/원인별 환율 조회 실패 수',
+                                       ['currency', 'reason'])
+RATE_PARSE_SECONDS = REGISTRY.histogram('fxtrader_rate_parse_duration_seconds', '통화별 환율 페이지 파싱 시간',
+                                        ['currency'],
+                                        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+# 거래 저장
+STORAGE_WRITE_SECONDS = REGISTRY.histogram('fxtrader_storage_write_duration_seconds',
+                                           '저장소 기록 시간 (commit: 변경 반영, save_all: 전체 다시 쓰기)',
+                                           ['storage', 'operation'])
+
+
+def register_trading_system(trading_system, registry: Optional[Registry] = None):
+    """거래 수와 환율 스냅샷 나이를 읽을 때 계산하는 지표를 등록합니다."""
+    import time
+
+    registry = registry or REGISTRY
+
+    def trade_counts() -> Samples:
+        return [({'currency': currency, 'type': trade_type}, count)
+                for (currency, trade_type), count in sorted(trading_system.count_trade_groups().items())]
+
+    def snapshot_age() -> Samples:
+        snapshot = trading_system.get_rate_snapshot()
+        return [({}, time.time() - snapshot.updated_at if snapshot.updated_at else math.nan)]
+
+    def stale_rates() -> Samples:
+        snapshot = trading_system.get_rate_snapshot()
+        return [({'currency': currency}, 1 if rate.stale else 0) for currency, rate in sorted(snapshot.rates.items())]
+
+    registry.add_collector('fxtrader_trades', 'gauge', '통화/유형별 거래 수', trade_counts)
+    registry.add_collector('fxtrader_storage_written_bytes_total', 'counter',
+                           '저장소 파일에 쓴 바이트 수 (SQLite 저장소는 측정하지 않음)',
+                           lambda: [({'storage': trading_system.storage.name}, trading_system.storage.bytes_written)])
+    registry.add_collector('fxtrader_trades_version', 'gauge', '거래 목록 버전 (변경마다 증가)',
+                           lambda: [({}, trading_system.version)])
+    registry.add_collector('fxtrader_rate_snapshot_age_seconds', 'gauge', '현재 환율 스냅샷이 발행된 뒤 지난 시간',
+                           snapshot_age)
+    registry.add_collector('fxtrader_rate_stale', 'gauge', '통화별 환율이 이전 값으로 대체되었는지 (1이면 stale)',
+                           stale_rates)
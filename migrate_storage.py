@@ -0,0 +1,91 @@
+"""기존 trades.json / settings.json을 SQLite 저장소로 옮깁니다.
+
+    python migrate_storage.py --trades trades.json --settings settings.json --db trades.db
+
+trades.json.journal이 있으면 저널까지 적용한 최종 상태를 옮깁니다.
+
+이전 방식으로 실현 손익을 기록한 매도/손절 거래는 다음 명령으로 한 번 다시 계산합니다.
+
+    python migrate_storage.py --restate-profit --storage json --trades trades.json
+"""
+import argparse
+import json
+import os
+
+from storage import (JournalStorage, SqliteStorage, create_storage, duplicate_trade_ids, read_legacy_trades,
+                     renumber_duplicate_ids)
+
+
+def migrate(trades_path: str, settings_path: str, db_path: str, renumber_duplicates: bool = False) -> int:
+    """거래와 설정을 SQLite로 옮기고 옮긴 거래 수를 반환합니다.
+
+    trades.json에 같은 ID의 거래가 여러 건 있으면 ValueError를 내며, renumber_duplicates가 True이면
+    뒤의 거래에 새 ID를 붙여 모두 옮깁니다. 옮긴 뒤 SQLite에 저장된 거래 수가 읽은 거래 수와
+    다르면 ValueError를 냅니다.
+    """
+    snapshot = read_legacy_trades(trades_path)
+    duplicates = duplicate_trade_ids(snapshot)
+    if duplicates and not renumber_duplicates:
+        raise ValueError(f"{trades_path}에 같은 ID의 거래가 여러 건 있습니다: {', '.join(duplicates)} "
+                         f"(--renumber-duplicates로 번호를 새로 매겨 옮길 수 있습니다)")
+    for old_id, new_id in renumber_duplicate_ids(snapshot):
+        print(f"경고: 중복된 거래 ID를 바꿔 옮깁니다: {old_id} → {new_id}")
+
+    # 저널 저장소는 스냅샷(trades.json 형식)과 저널을 모두 읽으므로 두 경우를 함께 처리
+    records = JournalStorage(trades_path).replay(snapshot)
+
+    target = SqliteStorage(db_path)
+    try:
+        target.save_all(records)
+        stored = len(target.load())
+        if stored != len(records):
+            raise ValueError(f"읽은 거래는 {len(records)}건인데 저장된 거래는 {stored}건입니다.")
+        if os.path.exists(settings_path):
+            with open(settings_path, 'r') as f:
+                target.save_settings(json.load(f))
+    finally:
+        target.close()
+    return len(records)
+
+
+def restate_profit(trades_path: str, settings_path: str, storage: str = 'json', db_path: str = 'trades.db') -> int:
+    """저장된 매도/손절 거래의 실현 손익을 매수 원가 기준으로 다시 계산해 저장하고 바꾼 거래 수를 반환합니다."""
+    from trading import TradingSystem
+
+    target = SqliteStorage(db_path) if storage == 'sqlite' else create_storage(storage, trades_path)
+    try:
+        trading_system = TradingSystem(file_path=trades_path, settings_path=settings_path, storage=target,
+                                       start_rate_monitoring=False)
+        return trading_system.restate_realized_profit()
+    finally:
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 거래 파일을 SQLite 저장소로 옮깁니다.')
+    parser.add_argument('--trades', default='trades.json')
+    parser.add_argument('--settings', default='settings.json')
+    parser.add_argument('--db', default='trades.db')
+    parser.add_argument('--renumber-duplicates', action='store_true',
+                        help='같은 ID의 거래가 여러 건이면 뒤의 거래에 새 ID를 붙여 옮김')
+    parser.add_argument('--restate-profit', action='store_true',
+                        help='옮기지 않고, --storage 저장소의 매도/손절 실현 손익을 매수 원가 기준으로 다시 계산')
+    parser.add_argument('--storage', default='json', choices=['json', 'journal', 'sqlite'],
+                        help='--restate-profit으로 고칠 저장소 (sqlite는 --db 파일)')
+    args = parser.parse_args()
+
+    if args.restate_profit:
+        count = restate_profit(args.trades, args.settings, args.storage, args.db)
+        print(f"매도/손절 거래 {count}건의 실현 손익을 매수 원가 기준으로 다시 계산했습니다.")
+        return
+
+    try:
+        count = migrate(args.trades, args.settings, args.db, args.renumber_duplicates)
+    except ValueError as e:
+        print(f"옮기기를 중단했습니다: {e}")
+        raise SystemExit(1)
+    print(f"{count}건의 거래를 {args.db}로 옮겼습니다.")
+
+
+if __name__ == '__main__':
+    main()
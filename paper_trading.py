@@ -0,0 +1,72 @@
+from typing import List, Optional
+
+from trading import Trade, TradingSystem, TriggerEvent
+
+
+class PaperTradingEngine:
+    """환율 틱에 도달한 예정 거래를 실제 거래로 체결하는 모의 거래 엔진
+
+    - 매도예정: create_sell_order로 매수 금액 대비 같은 비율을 매도하고 예정 거래를 지웁니다.
+    - 손절예정: create_stop_loss로 남은 수량을 손절하고 남은 매도예정/손절예정을 지웁니다.
+    - 매수예정: create_buy_order로 새 매수(와 그 예정 거래들)를 만들고 예정 거래를 지웁니다.
+
+    한 틱의 체결은 run_batch로 묶여 저장소에 한 번만 기록됩니다. 체결 전에 예정 거래가
+    아직 남아 있는지 확인하므로 같은 틱을 다시 처리하거나 여러 워커가 같은 틱을 받아도
+    한 번만 체결됩니다.
+    """
+    def __init__(self, trading_system: TradingSystem, fill_at: str = 'trigger', log_fills: bool = True):
+        if fill_at not in ('trigger', 'market'):
+            raise ValueError(f"지원하지 않는 체결 가격 기준입니다: {fill_at}")
+        self.trading_system = trading_system
+        self.fill_at = fill_at  # 'trigger': 예정 환율로 체결, 'market': 틱의 현재 환율로 체결
+        self.log_fills = log_fills
+        self.fill_count = 0
+        self.skip_count = 0
+        self._started = False
+
+    def start(self):
+        """환율 폴러의 예정 거래 도달 알림을 받아 자동으로 체결합니다."""
+        if not self._started:
+            self.trading_system.add_trigger_listener(self.execute)
+            self._started = True
+
+    def execute(self, events: List[TriggerEvent]) -> List[Trade]:
+        """도달한 예정 거래들을 체결하고 새로 만들어진 거래를 반환합니다."""
+        if not events:
+            return []
+        fills = self.trading_system.run_batch(lambda: [fill for fill in map(self._fill, events) if fill])
+        self.fill_count += len(fills)
+        self.skip_count += len(events) - len(fills)
+        if fills and self.log_fills:
+            print(f"모의 체결 {len(fills)}건: {', '.join(fill.id for fill in fills[:10])}"
+                  f"{' ...' if len(fills) > 10 else ''}")
+        return fills
+
+    def _fill(self, event: TriggerEvent) -> Optional[Trade]:
+        trading_system = self.trading_system
+        planned = trading_system.get_trade(event.trade_id)
+        # 이미 체결됐거나 삭제/재생성된 예정 거래는 건너뜀
+        if planned is None or planned.type != event.trade_type or planned.rate != event.trigger_rate:
+            return None
+        rate = planned.rate if self.fill_at == 'trigger' else event.market_rate
+        note = f"자동체결 ({planned.id})"
+
+        if planned.type == '매수예정':
+            trade = trading_system.create_buy_order(planned.krw_amount, rate, planned.currency, note=note)
+            trading_system.delete_trade(planned.id)
+            return trade
+
+        buy_trade = trading_system.get_trade(planned.related_id)
+        if buy_trade is None:
+            return None
+        if planned.type == '매도예정':
+            ratio = planned.krw_amount / buy_trade.krw_amount
+            trade = trading_system.create_sell_order(buy_trade.id, rate, ratio, note=note)
+            trading_system.delete_trade(planned.id)
+        else:
+            trade = trading_system.create_stop_loss(buy_trade.id, rate, note=note)
+            # 손절로 전량 정리되었으므로 남은 매도/손절 예정은 취소
+            for remaining in trading_system.get_related_trades(buy_trade.id):
+                if remaining.type in ('매도예정', '손절예정'):
+                    trading_system.delete_trade(remaining.id)
+        return trade
@@ -0,0 +1,146 @@
+import re
+from typing import Optional, Dict
+
+# investing.com 페이지에서 읽어야 하는 요소: {필드: (태그, data-test 값)}
+RATE_FIELDS = {
+    'price': ('div', 'instrument-price-last'),
+    'change': ('span', 'instrument-price-change'),
+    'percent': ('span', 'instrument-price-change-percent'),
+    'time': ('time', 'trading-time-label'),
+}
+
+# 시간 정보는 없어도 됨 (없으면 현재 시각 사용)
+REQUIRED_FIELDS = ('price', 'change', 'percent')
+
+
+class RateExtractor:
+    """환율 페이지 HTML에서 필드별 텍스트를 추출하는 기본 클래스"""
+    name = 'base'
+
+    def extract(self, content: bytes) -> Optional[Dict[str, str]]:
+        """필드별 텍스트를 반환합니다. 필수 필드를 찾지 못하면 None을 반환합니다."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _complete(fields: Dict[str, str]) -> Optional[Dict[str, str]]:
+        if all(fields.get(name) for name in REQUIRED_FIELDS):
+            return fields
+        return None
+
+
+class SoupExtractor(RateExtractor):
+    """전체 DOM을 만드는 기존 방식 (가장 느리지만 가장 관대함)"""
+    name = 'full'
+
+    def extract(self, content: bytes) -> Optional[Dict[str, str]]:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content.decode('utf-8', errors='replace'), 'html.parser')
+        return self._complete(self._find_fields(soup))
+
+    @staticmethod
+    def _find_fields(soup) -> Dict[str, str]:
+        fields = {}
+        for name, (tag, data_test) in RATE_FIELDS.items():
+            element = soup.find(tag, {'data-test': data_test})
+            if element:
+                fields[name] = element.text
+        return fields
+
+
+class StrainerExtractor(SoupExtractor):
+    """data-test 요소만 트리에 넣는 SoupStrainer 방식"""
+    name = 'strainer'
+
+    def __init__(self):
+        from bs4 import SoupStrainer
+
+        data_tests = [data_test for _, data_test in RATE_FIELDS.values()]
+        self._strainer = SoupStrainer(attrs={'data-test': data_tests})
+
+    def extract(self, content: bytes) -> Optional[Dict[str, str]]:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content.decode('utf-8', errors='replace'), 'html.parser',
+                             parse_only=self._strainer)
+        return self._complete(self._find_fields(soup))
+
+
+class ScanExtractor(RateExtractor):
+    """원본 바이트를 미리 컴파일한 정규식으로 훑는 방식 (DOM을 만들지 않음)"""
+    name = 'scan'
+
+    _TAG_RE = re.compile(rb'<[^>]*>')
+
+    def __init__(self):
+        self._patterns = {
+            name: re.compile(
+                rb'<' + tag.encode() + rb'\b[^>]*\bdata-test="' + re.escape(data_test.encode())
+                + rb'"[^>]*>(.*?)</' + tag.encode() + rb'>',
+                re.DOTALL
+            )
+            for name, (tag, data_test) in RATE_FIELDS.items()
+        }
+
+    def extract(self, content: bytes) -> Optional[Dict[str, str]]:
+        fields = {}
+        for name, pattern in self._patterns.items():
+            match = pattern.search(content)
+            if match:
+                # 내부 태그와 HTML 주석(<!-- -->)을 제거해 .text와 같은 결과를 만듦
+                text = self._TAG_RE.sub(b'', match.group(1))
+                fields[name] = text.decode('utf-8', errors='replace').strip()
+        return self._complete(fields)
+
+
+class FallbackExtractor(RateExtractor):
+    """빠른 추출기가 실패하면 전체 파싱으로 다시 시도합니다."""
+
+    def __init__(self, primary: RateExtractor, fallback: RateExtractor):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f'{primary.name}+{fallback.name}'
+        self.fallback_count = 0  # 전체 파싱으로 넘어간 횟수
+
+    def extract(self, content: bytes) -> Optional[Dict[str, str]]:
+        fields = self.primary.extract(content)
+        if fields is not None and parse_rate_fields(fields) is not None:
+            return fields
+        self.fallback_count += 1
+        return self.fallback.extract(content)
+
+
+def parse_rate_fields(fields: Dict[str, str]) -> Optional[Dict[str, object]]:
+    """추출한 텍스트를 숫자로 변환합니다. 형식이 맞지 않으면 None을 반환합니다."""
+    try:
+        current_rate = float(fields['price'].replace(',', ''))
+
+        # +/- 기호와 숫자 분리, HTML 주석 제거
+        change_text = fields['change'].replace('<!-- -->', '').replace(',', '')
+        change_amount = float(change_text)
+
+        # 퍼센트 정보에서 괄호, %, HTML 주석 제거
+        percent_text = fields['percent']
+        for char in ['(', ')', '%', '<!-- -->', ',']:
+            percent_text = percent_text.replace(char, '')
+        change_percent = float(percent_text)
+    except (KeyError, ValueError):
+        return None
+
+    return {
+        'current_rate': current_rate,
+        'change_amount': change_amount,
+        'change_percent': change_percent,
+        'timestamp': fields.get('time') or None
+    }
+
+
+def create_extractor(mode: str = 'fast') -> RateExtractor:
+    """추출 방식 이름으로 추출기를 생성합니다. ('fast', 'strainer', 'full')"""
+    if mode == 'fast':
+        return FallbackExtractor(ScanExtractor(), SoupExtractor())
+    if mode == 'strainer':
+        return FallbackExtractor(StrainerExtractor(), SoupExtractor())
+    if mode == 'full':
+        return SoupExtractor()
+    raise ValueError(f"지원하지 않는 추출 방식입니다: {mode}")
@@ -1,12 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-from dataclasses import dataclass
-from typing import Optional
-import cloudscraper
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Optional, Dict, Tuple, Mapping, Callable, List, Iterable
+import metrics
+from rate_extractor import RateExtractor, create_extractor, parse_rate_fields
+import random
+import threading
 import time
 
-@dataclass
+@dataclass(frozen=True)
 class RateData:
     """환율 데이터를 저장하는 클래스"""
     currency: str           # 통화 (USD/JPY)
@@ -14,16 +17,98 @@ class RateData:
     change_amount: float   # 등락금액
     change_percent: float  # 등락률
     timestamp: str        # 실시간 데이터 시간
+    stale: bool = False   # 조회 실패로 마지막 정상 값을 대신 사용하는 경우 True
 
-class RateMonitor:
+class FetchError(Exception):
+    """환율 페이지 요청 또는 파싱 실패"""
+    def __init__(self, message: str, reason: str = 'error'):
+        super().__init__(message)
+        self.reason = reason  # 실패 지표의 원인 레이블 ('http', 'parse' 등)
+
+class CircuitBreaker:
+    """연속 실패가 기준을 넘으면 일정 시간 동안 요청을 차단합니다.
+
+    차단 시간이 지나면 한 번의 시험 요청(half-open)을 허용하고,
+    성공하면 닫히고 실패하면 다시 열립니다.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+@dataclass
+class FetchStats:
+    """통화별 요청 통계"""
+    requests: int = 0        # 실제 HTTP 요청 수 (재시도 포함)
+    failures: int = 0        # 실패한 요청 수
+    timeouts: int = 0        # 그 중 타임아웃
+    short_circuits: int = 0  # 차단기가 열려 요청하지 않은 횟수
+    stale_served: int = 0    # 마지막 정상 값을 대신 반환한 횟수
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.requests if self.requests else 0.0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'short_circuits': self.short_circuits,
+            'stale_served': self.stale_served,
+            'latency_avg': self.latency_avg,
+            'latency_max': self.latency_max
+        }
+
+class _InflightFetch:
+    """진행 중인 환율 요청 (동일 통화 동시 요청이 결과를 공유)"""
     def __init__(self):
-        self.scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'mobile': False
-            }
-        )
+        self.done = threading.Event()
+        self.result: Optional[RateData] = None
+
+class RateMonitor:
+    RATE_URLS = {
+        'USD': 'https://kr.investing.com/currencies/usd-krw',
+        'JPY': 'https://kr.investing.com/currencies/jpy-krw'
+    }
+
+    def __init__(self, cache_ttl: float = 10.0, extractor: str = 'fast',
+                 urls: Optional[Dict[str, str]] = None,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 5.0,
+                 breaker_threshold: int = 3, breaker_reset: float = 60.0):
+        self._scraper = None  # cloudscraper 세션은 첫 요청 때 만듦 (불러오는 데만 0.1초 가까이 걸림)
+        self._scraper_lock = threading.Lock()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -31,124 +116,301 @@ class RateMonitor:
             'Cache-Control': 'no-cache',
             'Pragma': 'no-cache'
         }
+        self.extractor: RateExtractor = create_extractor(extractor)
+        self.urls = dict(urls or self.RATE_URLS)
+        # 요청 시간 제한과 재시도 (지수 백오프 + 지터)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, FetchStats] = {}
+        self._last_good: Dict[str, RateData] = {}
         self.initialized_currencies = set()
         self.buy_drop_thresholds = {
             'USD': 5,  # 기본값 설정
             'JPY': 3   # 기본값 설정
         }
-        
+        # 통화별 최신 환율 캐시: {통화: (RateData, 조회 시각)}
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[RateData, float]] = {}
+        self._inflight: Dict[str, _InflightFetch] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def scraper(self):
+        """investing.com 요청용 cloudscraper 세션 (처음 쓸 때 불러와 만듦)"""
+        if self._scraper is None:
+            with self._scraper_lock:
+                if self._scraper is None:
+                    import cloudscraper
+                    self._scraper = cloudscraper.create_scraper(
+                        browser={
+                            'browser': 'chrome',
+                            'platform': 'windows',
+                            'mobile': False
+                        }
+                    )
+        return self._scraper
+
     def get_current_rate(self, currency, is_update=False) -> Optional[RateData]:
-        """investing.com에서 환율 정보를 스크래핑합니다."""
+        """현재 환율을 반환합니다. TTL 이내의 캐시가 있으면 메모리에서 바로 반환합니다.
+
+        같은 통화를 동시에 요청하면 하나의 스크래핑 결과를 함께 기다립니다.
+        """
+        return self._get_rate(currency, force=False)
+
+    def refresh(self, currency) -> Optional[RateData]:
+        """캐시를 무시하고 환율을 새로 가져와 캐시에 저장합니다."""
+        return self._get_rate(currency, force=True)
+
+    def _get_rate(self, currency, force: bool) -> Optional[RateData]:
+        with self._lock:
+            cached = self._cache.get(currency)
+            if not force and cached and time.monotonic() - cached[1] < self.cache_ttl:
+                return cached[0]
+            inflight = self._inflight.get(currency)
+            is_owner = inflight is None
+            if is_owner:
+                inflight = _InflightFetch()
+                self._inflight[currency] = inflight
+
+        if not is_owner:
+            inflight.done.wait()
+            return inflight.result
+
         try:
-            if currency == 'USD':
-                url = 'https://kr.investing.com/currencies/usd-krw'
-            else:  # JPY
-                url = 'https://kr.investing.com/currencies/jpy-krw'
-            
-            # 첫 로드시에만 전체 페이지를 가져옴
-            if not currency in self.initialized_currencies:
-                response = self.scraper.get(url, headers=self.headers)
+            inflight.result = self._fetch_rate(currency)
+        finally:
+            with self._lock:
+                if inflight.result is not None and not inflight.result.stale:
+                    self._cache[currency] = (inflight.result, time.monotonic())
+                del self._inflight[currency]
+            inflight.done.set()
+
+        return inflight.result
+
+    def get_cached_rate(self, currency) -> Optional[RateData]:
+        """네트워크 요청 없이 캐시된 환율만 반환합니다."""
+        cached = self._cache.get(currency)
+        return cached[0] if cached else None
+
+    def invalidate(self, currency=None):
+        """캐시를 비웁니다. 통화를 지정하지 않으면 전체를 비웁니다."""
+        with self._lock:
+            if currency is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(currency, None)
+
+    def get_breaker(self, currency) -> CircuitBreaker:
+        breaker = self.breakers.get(currency)
+        if breaker is None:
+            breaker = self.breakers.setdefault(
+                currency, CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+        return breaker
+
+    def get_stats(self, currency) -> FetchStats:
+        return self.stats.setdefault(currency, FetchStats())
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """재시도 대기 시간 (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _stale_rate(self, currency) -> Optional[RateData]:
+        """마지막 정상 환율을 지연(stale) 표시하여 반환합니다."""
+        last_good = self._last_good.get(currency)
+        if last_good is None:
+            return None
+        self.get_stats(currency).stale_served += 1
+        return replace(last_good, stale=True)
+
+    def _fetch_rate(self, currency) -> Optional[RateData]:
+        """investing.com에서 환율 정보를 스크래핑합니다.
+
+        실패하면 백오프 후 재시도하고, 끝내 실패하거나 차단기가 열려 있으면
+        마지막 정상 환율을 지연 표시하여 반환합니다.
+        """
+        url = self.urls[currency]
+        breaker = self.get_breaker(currency)
+        stats = self.get_stats(currency)
+
+        if not breaker.allow_request():
+            stats.short_circuits += 1
+            metrics.RATE_FETCH_FAILURES.labels(currency, 'circuit_open').inc()
+            return self._stale_rate(currency)
+
+        for attempt in range(self.max_retries + 1):
+            is_initial = currency not in self.initialized_currencies
+            start = time.perf_counter()
+            try:
+                try:
+                    response = self.scraper.get(url, headers=self.headers, timeout=self.timeout)
+                finally:
+                    latency = time.perf_counter() - start
+                    stats.requests += 1
+                    stats.latency_total += latency
+                    stats.latency_max = max(stats.latency_max, latency)
+                    metrics.RATE_FETCH_SECONDS.labels(currency).observe(latency)
+
                 if response.status_code != 200:
-                    print(f"{currency} 초기 페이지 로드 실패: {response.status_code}")
-                    return None
-                    
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 현재가
-                current_element = soup.find('div', {'data-test': 'instrument-price-last'})
-                if not current_element:
-                    print(f"{currency} 환율 스크래핑 실패")
-                    return None
-                
-                current_rate = float(current_element.text.replace(',', ''))
-                if currency == 'JPY':  # JPY의 경우 1엔당 가격을 100엔당 가격으로 변환
-                    current_rate = current_rate * 100
-                
-                # 등락 정보
-                change_element = soup.find('span', {'data-test': 'instrument-price-change'})
-                percent_element = soup.find('span', {'data-test': 'instrument-price-change-percent'})
-                
-                if not change_element or not percent_element:
-                    print(f"{currency} 등락 정보 스크래핑 실패")
-                    return None
-                
-                # +/- 기호와 숫자 분리, HTML 주석 제거
-                change_text = change_element.text.replace('<!-- -->', '').replace(',', '')
-                change_amount = float(change_text)
-                if currency == 'JPY':  # JPY의 경우 1엔당 변화량을 100엔당 변화량으로 변환
-                    change_amount = change_amount * 100
-                
-                # 퍼센트 정보에서 괄호, %, HTML 주석 제거
-                percent_text = percent_element.text
-                for char in ['(', ')', '%', '<!-- -->', ',']:
-                    percent_text = percent_text.replace(char, '')
-                change_percent = float(percent_text)
-                
-                # 시간 정보
-                time_element = soup.find('time', {'data-test': 'trading-time-label'})
-                current_time = time_element.text if time_element else datetime.now().strftime("%H:%M:%S")
-                
-                print(f"{currency} {current_rate:.2f}원 ({change_amount:+.2f}원, {change_percent:+.2f}%) {current_time} (초기)")
-                
-                self.initialized_currencies.add(currency)
-                
-                return RateData(
-                    currency=currency,
-                    current_rate=current_rate,
-                    change_amount=change_amount,
-                    change_percent=change_percent,
-                    timestamp=current_time
-                )
-            
-            # 이후 업데이트는 현재 표시된 데이터만 가져옴
-            response = self.scraper.get(url, headers=self.headers)
-            if response.status_code != 200:
-                print(f"{currency} 데이터 요청 실패: {response.status_code}")
-                return None
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 현재가만 업데이트
-            current_element = soup.find('div', {'data-test': 'instrument-price-last'})
-            if not current_element:
-                print(f"{currency} 실시간 환율 스크래핑 실패")
-                return None
-            
-            current_rate = float(current_element.text.replace(',', ''))
-            if currency == 'JPY':
-                current_rate = current_rate * 100
-                
-            # 등락 정보
-            change_element = soup.find('span', {'data-test': 'instrument-price-change'})
-            percent_element = soup.find('span', {'data-test': 'instrument-price-change-percent'})
-            
-            if not change_element or not percent_element:
-                print(f"{currency} 실시간 등락 정보 스크래핑 실패")
-                return None
-            
-            change_text = change_element.text.replace('<!-- -->', '').replace(',', '')
-            change_amount = float(change_text)
-            if currency == 'JPY':
-                change_amount = change_amount * 100
-            
-            percent_text = percent_element.text
-            for char in ['(', ')', '%', '<!-- -->', ',']:
-                percent_text = percent_text.replace(char, '')
-            change_percent = float(percent_text)
-            
-            time_element = soup.find('time', {'data-test': 'trading-time-label'})
-            current_time = time_element.text if time_element else datetime.now().strftime("%H:%M:%S")
-            
-            print(f"{currency} {current_rate:.2f}원 ({change_amount:+.2f}원, {change_percent:+.2f}%) {current_time} (실시간)")
-            
-            return RateData(
-                currency=currency,
-                current_rate=current_rate,
-                change_amount=change_amount,
-                change_percent=change_percent,
-                timestamp=current_time
+                    raise FetchError(f"데이터 요청 실패: {response.status_code}", reason='http')
+
+                rate = self.parse_rate(currency, response.content, is_initial)
+                if rate is None:
+                    raise FetchError("환율 정보를 찾을 수 없음", reason='parse')
+
+                breaker.record_success()
+                self._last_good[currency] = rate
+                return rate
+
+            except Exception as e:
+                stats.failures += 1
+                if 'timeout' in type(e).__name__.lower():
+                    stats.timeouts += 1
+                    reason = 'timeout'
+                else:
+                    reason = e.reason if isinstance(e, FetchError) else 'connection'
+                metrics.RATE_FETCH_FAILURES.labels(currency, reason).inc()
+                print(f"{currency} 환율 스크래핑 중 오류 (시도 {attempt + 1}/{self.max_retries + 1}): {str(e)}")
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff_delay(attempt))
+
+        breaker.record_failure()
+        return self._stale_rate(currency)
+
+    def parse_rate(self, currency, content: bytes, is_initial: bool = False) -> Optional[RateData]:
+        """환율 페이지 HTML에서 RateData를 만듭니다."""
+        start = time.perf_counter()
+        fields = self.extractor.extract(content)
+        values = parse_rate_fields(fields) if fields else None
+        metrics.RATE_PARSE_SECONDS.labels(currency).observe(time.perf_counter() - start)
+        if values is None:
+            print(f"{currency} 환율 스크래핑 실패")
+            return None
+
+        current_rate = values['current_rate']
+        change_amount = values['change_amount']
+        if currency == 'JPY':  # JPY의 경우 1엔당 가격/변화량을 100엔당으로 변환
+            current_rate = current_rate * 100
+            change_amount = change_amount * 100
+        change_percent = values['change_percent']
+        current_time = values['timestamp'] or datetime.now().strftime("%H:%M:%S")
+
+        print(f"{currency} {current_rate:.2f}원 ({change_amount:+.2f}원, {change_percent:+.2f}%) {current_time} ({'초기' if is_initial else '실시간'})")
+
+        self.initialized_currencies.add(currency)
+
+        return RateData(
+            currency=currency,
+            current_rate=current_rate,
+            change_amount=change_amount,
+            change_percent=change_percent,
+            timestamp=current_time
+        )
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    """특정 시점의 전체 통화 환율 (변경 불가)"""
+    version: int                    # 환율 순번 (환율 데이터가 바뀐 스냅샷마다 1씩 증가)
+    rates: Mapping[str, RateData] = field(default_factory=lambda: MappingProxyType({}))
+    updated_at: float = 0.0         # 발행 시각 (time.time())
+
+    def get(self, currency) -> Optional[RateData]:
+        return self.rates.get(currency)
+
+
+class RatePoller:
+    """설정된 통화 환율을 주기적으로 동시에 가져와 스냅샷으로 발행합니다.
+
+    요청 처리 코드는 스냅샷만 읽으므로, 접속자 수와 관계없이 외부 요청은
+    주기당 통화 수만큼만 발생합니다.
+    """
+    def __init__(self, rate_monitor: RateMonitor, currencies: Iterable[str] = ('USD', 'JPY'),
+                 interval: float = 10.0):
+        self.rate_monitor = rate_monitor
+        self.currencies = list(currencies)
+        self.interval = interval
+        self._snapshot = RateSnapshot(version=0)
+        self._listeners: List[Callable[[RateSnapshot], None]] = []
+        self._publish_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.currencies), 1),
+                                            thread_name_prefix='rate-poller')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> RateSnapshot:
+        """가장 최근에 발행된 스냅샷"""
+        return self._snapshot
+
+    def add_listener(self, callback: Callable[[RateSnapshot], None]):
+        """새 스냅샷이 발행될 때마다 호출될 함수를 등록합니다."""
+        self._listeners.append(callback)
+
+    def poll_once(self) -> RateSnapshot:
+        """모든 통화를 동시에 조회하고 새 스냅샷을 발행합니다."""
+        futures = {
+            currency: self._executor.submit(self.rate_monitor.refresh, currency)
+            for currency in self.currencies
+        }
+        with self._publish_lock:
+            # 조회에 실패한 통화는 이전 값을 유지
+            rates = dict(self._snapshot.rates)
+            for currency, future in futures.items():
+                try:
+                    rate = future.result()
+                except Exception as e:
+                    print(f"{currency} 환율 조회 중 오류: {str(e)}")
+                    rate = None
+                if rate is not None:
+                    rates[currency] = rate
+            # 환율이 그대로면 버전을 유지해 ETag와 대시보드 푸시가 불필요하게 바뀌지 않게 함 (발행 시각만 갱신)
+            changed = rates != dict(self._snapshot.rates)
+            snapshot = RateSnapshot(
+                version=self._snapshot.version + 1 if changed else self._snapshot.version,
+                rates=MappingProxyType(rates),
+                updated_at=time.time()
             )
-            
-        except Exception as e:
-            print(f"{currency} 환율 스크래핑 중 오류: {str(e)}")
-            return None 
\ No newline at end of file
+            self._snapshot = snapshot
+
+        self._notify(snapshot)
+        return snapshot
+
+    def publish(self, snapshot: RateSnapshot):
+        """조회 없이 주어진 스냅샷을 발행합니다. 다음 조회는 이 스냅샷의 버전과 환율에서 이어집니다."""
+        with self._publish_lock:
+            self._snapshot = snapshot
+        self._notify(snapshot)
+
+    def _notify(self, snapshot: RateSnapshot):
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"환율 스냅샷 처리 중 오류: {str(e)}")
+
+    def start(self):
+        """백그라운드 스레드에서 주기적인 조회를 시작합니다."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='rate-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        import schedule
+
+        scheduler = schedule.Scheduler()
+        scheduler.every(self.interval).seconds.do(self.poll_once)
+        self.poll_once()  # 시작 직후 첫 스냅샷 발행
+
+        while not self._stop.is_set():
+            scheduler.run_pending()
+            self._stop.wait(min(1, self.interval))
@@ -0,0 +1,199 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from types import MappingProxyType
+from typing import Optional, Callable, List
+
+from rate_monitor import RateData, RatePoller, RateSnapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def try_lock_file(path: str):
+    """파일 잠금을 기다리지 않고 시도합니다. 성공하면 열린 파일을, 실패하면 None을 반환합니다.
+
+    반환된 파일을 닫거나 프로세스가 종료되면 잠금이 풀립니다.
+    """
+    f = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class SharedRateSnapshot:
+    """메모리 맵 파일에 저장되는 환율 스냅샷 (한 프로세스가 쓰고 여러 프로세스가 읽음)
+
+    seqlock 방식: 쓰는 쪽은 순번을 홀수로 올린 뒤 기록하고 다시 짝수로 올립니다.
+    읽는 쪽은 잠금 없이 순번-데이터-순번을 읽고, 순번이 홀수이거나 바뀌었으면 다시 읽습니다.
+    순번이 지난번과 같으면 이미 만든 RateSnapshot을 그대로 반환하므로 파싱도 하지 않습니다.
+    작성자가 기록 도중 종료되어 순번이 홀수로 남으면 MAX_READ_ATTEMPTS번 시도한 뒤
+    마지막으로 읽은 스냅샷을 반환합니다. (새 조회 담당 프로세스가 reset_seq()로 되돌림)
+    """
+    MAX_READ_ATTEMPTS = 100
+    MAGIC = b'FXR1'
+    HEADER = struct.Struct('<4sQQdI')        # magic, 순번, 스냅샷 버전, 발행 시각, 통화 수
+    RECORD = struct.Struct('<8sdddB32s')     # 통화, 환율, 등락금액, 등락률, stale, 시간 문자열
+    MAX_CURRENCIES = 16
+    SIZE = HEADER.size + RECORD.size * MAX_CURRENCIES
+
+    def __init__(self, path: str):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.SIZE:
+                os.ftruncate(fd, self.SIZE)
+            self._mm = mmap.mmap(fd, self.SIZE)
+        finally:
+            os.close(fd)
+        self._write_lock = threading.Lock()
+        self._cached_seq = None
+        self._cached = RateSnapshot(version=0)
+
+    def write(self, snapshot: RateSnapshot):
+        rates = list(snapshot.rates.values())[:self.MAX_CURRENCIES]
+        with self._write_lock:
+            seq = self._read_seq()
+            if seq % 2:
+                seq += 1  # 이전 작성자가 기록 도중 종료된 경우
+            self.HEADER.pack_into(self._mm, 0, self.MAGIC, seq + 1, 0, 0.0, 0)
+            for i, rate in enumerate(rates):
+                self.RECORD.pack_into(
+                    self._mm, self.HEADER.size + i * self.RECORD.size,
+                    rate.currency.encode(), rate.current_rate, rate.change_amount, rate.change_percent,
+                    1 if rate.stale else 0, rate.timestamp.encode('utf-8')[:32]
+                )
+            self.HEADER.pack_into(self._mm, 0, self.MAGIC, seq + 2, snapshot.version,
+                                  snapshot.updated_at, len(rates))
+
+    def _read_seq(self) -> int:
+        return struct.unpack_from('<Q', self._mm, 4)[0]
+
+    def reset_seq(self):
+        """기록 도중 종료된 작성자가 남긴 홀수 순번을 짝수로 올립니다. (조회 담당 잠금을 가진 프로세스만 호출)"""
+        with self._write_lock:
+            seq = self._read_seq()
+            if seq % 2:
+                struct.pack_into('<Q', self._mm, 4, seq + 1)
+
+    def read(self) -> RateSnapshot:
+        for _ in range(self.MAX_READ_ATTEMPTS):
+            seq = self._read_seq()
+            if seq == self._cached_seq:
+                return self._cached
+            if seq % 2:
+                time.sleep(0)  # 기록 중 (같은 프로세스의 작성 스레드에 양보)
+                continue
+
+            magic, _, version, updated_at, count = self.HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC:
+                return RateSnapshot(version=0)
+            rates = {}
+            for i in range(min(count, self.MAX_CURRENCIES)):
+                currency, current_rate, change_amount, change_percent, stale, timestamp = \
+                    self.RECORD.unpack_from(self._mm, self.HEADER.size + i * self.RECORD.size)
+                currency = currency.rstrip(b'\0').decode()
+                rates[currency] = RateData(
+                    currency=currency,
+                    current_rate=current_rate,
+                    change_amount=change_amount,
+                    change_percent=change_percent,
+                    timestamp=timestamp.rstrip(b'\0').decode('utf-8', errors='replace'),
+                    stale=bool(stale)
+                )
+
+            if self._read_seq() == seq:
+                snapshot = RateSnapshot(version=version, rates=MappingProxyType(rates), updated_at=updated_at)
+                self._cached_seq, self._cached = seq, snapshot
+                return snapshot
+        return self._cached
+
+    def close(self):
+        self._mm.close()
+
+
+class SharedRatePoller:
+    """호스트당 하나의 프로세스만 환율을 조회하고, 나머지는 공유 스냅샷을 읽습니다.
+
+    잠금 파일을 먼저 잡은 프로세스가 조회 담당(leader)이 되어 RatePoller의 스냅샷을
+    공유 파일에 기록합니다. 다른 프로세스는 공유 파일을 읽기만 하며, 담당 프로세스가
+    종료되어 잠금이 풀리면 그 중 하나가 이어받습니다. RatePoller와 같은 인터페이스를 가집니다.
+    """
+    def __init__(self, poller: RatePoller, path: str, watch_interval: float = 0.5):
+        self.poller = poller
+        self.shared = SharedRateSnapshot(path)
+        self.lock_path = f'{path}.lock'
+        self.watch_interval = watch_interval
+        self.is_leader = False
+        self._lock_file = None
+        self._listeners: List[Callable[[RateSnapshot], None]] = []
+        self._last_version = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.poller.add_listener(self.shared.write)
+
+    @property
+    def interval(self) -> float:
+        return self.poller.interval
+
+    @property
+    def snapshot(self) -> RateSnapshot:
+        return self.shared.read()
+
+    def add_listener(self, callback: Callable[[RateSnapshot], None]):
+        """공유 스냅샷 버전이 바뀔 때마다 (담당 여부와 관계없이) 호출될 함수를 등록합니다."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._try_become_leader()
+        self._thread = threading.Thread(target=self._watch, name='shared-rate-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.poller.stop()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+            self.is_leader = False
+
+    def _try_become_leader(self):
+        if self.is_leader:
+            return
+        self._lock_file = try_lock_file(self.lock_path)
+        if self._lock_file is None:
+            return
+        self.is_leader = True
+        # 이전 담당 프로세스가 기록 도중 종료되었으면 순번부터 되돌린 뒤, 그 버전에서 이어서 발행
+        self.shared.reset_seq()
+        self.poller.publish(self.shared.read())
+        print(f"환율 조회 담당 프로세스: {os.getpid()}")
+        self.poller.start()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self._try_become_leader()
+            snapshot = self.shared.read()
+            if snapshot.version != self._last_version:
+                self._last_version = snapshot.version
+                for listener in list(self._listeners):
+                    try:
+                        listener(snapshot)
+                    except Exception as e:
+                        print(f"환율 스냅샷 처리 중 오류: {str(e)}")
+            self._stop.wait(self.watch_interval)
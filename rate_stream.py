@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+
+def diff_cards(old: Dict[str, dict], new: Dict[str, dict]) -> Dict[str, dict]:
+    """두 카드 상태를 비교해 바뀐 필드만 담은 변경분을 만듭니다.
+
+    {'USD': {'rate': {'current_rate': 1401.5}, 'current_value': {...}}} 형태이며,
+    섹션 값이 None으로 바뀌거나 새로 생기면 섹션 전체가 들어갑니다.
+    """
+    delta = {}
+    for currency, card in new.items():
+        before = old.get(currency, {})
+        changed = {}
+        for section, values in card.items():
+            previous = before.get(section)
+            if not isinstance(values, dict) or not isinstance(previous, dict):
+                if values != previous:
+                    changed[section] = values
+                continue
+            fields = {key: value for key, value in values.items() if previous.get(key) != value}
+            if fields:
+                changed[section] = fields
+        if changed:
+            delta[currency] = changed
+    return delta
+
+
+def encode_event(event: str, event_id: str, data) -> bytes:
+    """Server-Sent Events 형식의 이벤트 하나를 바이트로 만듭니다."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+class RateStream:
+    """환율 카드 변경분을 열려 있는 모든 대시보드에 Server-Sent Events로 보냅니다.
+
+    환율 스냅샷이나 거래 목록이 바뀌면 백그라운드 스레드가 카드 값을 한 번만 다시 계산하고,
+    바뀐 필드만 담은 이벤트를 한 번만 직렬화합니다. 구독자는 같은 바이트를 나눠 쓰므로
+    구독자가 늘어도 요청당 계산이나 렌더링은 없습니다.
+    """
+    KEEPALIVE = b': keepalive\n\n'
+
+    def __init__(self, trading_system, heartbeat: float = 15.0, sync_interval: float = 2.0,
+                 backlog: int = 32, retry_ms: int = 3000):
+        self.trading_system = trading_system
+        self.currencies = list(trading_system.settings.keys())
+        self.heartbeat = heartbeat          # 변경이 없을 때 연결 유지용 주석을 보내는 간격
+        self.sync_interval = sync_interval  # 다른 워커 프로세스의 거래 변경을 확인하는 간격
+        self.retry_ms = retry_ms
+        self.version = 0
+        self._epoch = (None, None)  # (프로세스 ID, 토큰)
+        self._cards: Dict[str, dict] = {}
+        self._key = None
+        self._events = deque(maxlen=backlog)  # (버전, 인코딩된 delta 이벤트)
+        self._snapshot_event: Optional[bytes] = None
+        self._cond = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        trading_system.rate_poller.add_listener(lambda snapshot: self._wakeup.set())
+        trading_system.add_change_listener(lambda version: self._wakeup.set())
+
+    @property
+    def epoch(self) -> str:
+        """이벤트 ID 앞에 붙는 프로세스별 토큰
+
+        버전 번호는 프로세스마다 따로 증가하므로, 재시작한 서버나 다른 워커에 재접속한
+        브라우저의 Last-Event-ID가 우연히 현재 버전과 같아도 이어 보내지 않게 합니다.
+        """
+        pid, token = self._epoch
+        if pid != os.getpid():
+            token = uuid.uuid4().hex[:8]
+            self._epoch = (os.getpid(), token)
+        return token
+
+    def event_id(self, version: int) -> str:
+        return f'{self.epoch}-{version}'
+
+    def parse_event_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Last-Event-ID에서 이 프로세스의 버전을 꺼냅니다. 다른 프로세스의 ID이면 None (전체 상태 전송)"""
+        epoch, _, version = (last_event_id or '').partition('-')
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(version)
+        except ValueError:
+            return None
+
+    @property
+    def cards(self) -> Dict[str, dict]:
+        """마지막으로 발행한 통화별 카드 값"""
+        return self._cards
+
+    def start(self):
+        """처음 구독할 때 호출됩니다. 현재 카드 값을 계산한 뒤 갱신 스레드를 시작합니다."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name='rate-stream', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.sync_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                # 요청이 없어도 다른 워커 프로세스가 저장한 거래 변경을 반영
+                self.trading_system.sync()
+                self.refresh()
+            except Exception as e:
+                print(f"환율 카드 스트림 갱신 중 오류: {str(e)}")
+
+    def refresh(self) -> bool:
+        """환율 스냅샷 버전이나 거래 버전이 바뀌었으면 카드를 다시 계산하고 변경분을 발행합니다."""
+        key = (self.trading_system.get_rate_snapshot().version, self.trading_system.version)
+        if key == self._key:
+            return False
+        cards = {currency: self.trading_system.get_rate_card(currency) for currency in self.currencies}
+        self._key = key
+        delta = diff_cards(self._cards, cards)
+        if not delta:
+            return False
+
+        with self._cond:
+            self.version += 1
+            self._cards = cards
+            self._events.append((self.version, encode_event('delta', self.event_id(self.version), delta)))
+            self._snapshot_event = None
+            self._cond.notify_all()
+        return True
+
+    def _pending(self, seen: Optional[int]) -> List[bytes]:
+        """seen 버전 이후의 이벤트 (_cond 안에서 호출). 놓친 변경분이 너무 오래됐으면 전체 상태 하나"""
+        if seen == self.version:
+            return []
+        if seen is not None and self._events and self._events[0][0] <= seen + 1 and seen < self.version:
+            return [event for version, event in self._events if version > seen]
+        if self._snapshot_event is None:
+            self._snapshot_event = encode_event('snapshot', self.event_id(self.version), self._cards)
+        return [self._snapshot_event]
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Iterator[bytes]:
+        """구독자 한 명의 이벤트 스트림. 처음에는 전체 상태를, 이후에는 변경분만 보냅니다.
+
+        재접속한 브라우저가 Last-Event-ID를 보내면 그 이후의 변경분만 이어서 보냅니다.
+        ID가 다른 프로세스(재시작 전 서버, 다른 워커)의 것이면 전체 상태부터 보냅니다.
+        """
+        self.start()
+        seen = self.parse_event_id(last_event_id)
+
+        yield f'retry: {self.retry_ms}\n\n'.encode()
+        while not self._stop.is_set():
+            with self._cond:
+                if seen == self.version:
+                    self._cond.wait(self.heartbeat)
+                events = self._pending(seen)
+                seen = self.version
+            if events:
+                yield b''.join(events)
+            else:
+                yield self.KEEPALIVE
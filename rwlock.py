@@ -0,0 +1,57 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """읽기는 동시에, 쓰기는 하나씩 처리하는 잠금 (쓰기 우선)
+
+    쓰기 잠금을 가진 스레드는 같은 잠금으로 다시 읽거나 쓸 수 있습니다.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None        # 쓰기 잠금을 가진 스레드 ID
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_locked(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            # 쓰기 중인 스레드의 읽기는 이미 배타적
+            yield
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_locked(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
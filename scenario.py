@@ -0,0 +1,160 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from trading import Trade, TradingSystem
+
+
+@dataclass
+class PositionArrays:
+    """한 통화의 보유 로트와 대기 중인 예정 거래를 열 단위 배열로 모은 것"""
+    lot_ids: List[str]
+    remaining: np.ndarray      # 로트별 남은 외화 수량 (매수 수량 - 매도/손절 수량)
+    cost: np.ndarray           # 로트별 남은 수량의 매수 원가
+    holding_amount: float      # calculate_holding_amount와 같은 보유 수량/평균단가
+    avg_rate: float
+    order_ids: List[str]
+    order_types: List[str]
+    order_rates: np.ndarray
+    order_profits: np.ndarray  # 예정 거래에 기록된 예상 손익
+
+
+def build_position_arrays(trades: Iterable[Trade], holding: dict) -> PositionArrays:
+    """거래 목록(한 통화)에서 로트 배열과 예정 거래 배열을 만듭니다."""
+    buys: Dict[str, int] = {}
+    buy_foreign, buy_krw, sold = [], [], []
+    orders = []
+    for trade in trades:
+        if trade.type == '매수':
+            buys[trade.id] = len(buy_foreign)
+            buy_foreign.append(trade.foreign_amount)
+            buy_krw.append(trade.krw_amount)
+            sold.append(0.0)
+        elif trade.type in ('매도예정', '손절예정'):
+            orders.append(trade)
+    for trade in trades:
+        if trade.type in ('매도', '손절') and trade.related_id in buys:
+            sold[buys[trade.related_id]] += trade.foreign_amount
+
+    buy_foreign, buy_krw = np.array(buy_foreign, dtype=float), np.array(buy_krw, dtype=float)
+    remaining = np.maximum(buy_foreign - np.array(sold, dtype=float), 0)
+    cost = np.divide(buy_krw * remaining, buy_foreign, out=np.zeros_like(remaining), where=buy_foreign != 0)
+    is_open = remaining > 0
+    return PositionArrays(
+        lot_ids=[buy_id for buy_id, i in buys.items() if is_open[i]],
+        remaining=remaining[is_open],
+        cost=cost[is_open],
+        holding_amount=holding['holding_amount'],
+        avg_rate=holding['avg_rate'],
+        order_ids=[t.id for t in orders],
+        order_types=[t.type for t in orders],
+        order_rates=np.array([t.rate for t in orders], dtype=float),
+        order_profits=np.array([t.profit for t in orders], dtype=float)
+    )
+
+
+def _sum_in_band(rates: np.ndarray, profits: np.ndarray, low: np.ndarray, high: np.ndarray,
+                 low_inclusive: bool, high_inclusive: bool) -> np.ndarray:
+    """격자마다 [low, high] 구간에 있는 예정 거래의 예상 손익 합계 (정렬 + 누적합 + 이진 탐색)"""
+    order = np.argsort(rates)
+    sorted_rates = rates[order]
+    cumulative = np.concatenate(([0.0], np.cumsum(profits[order])))
+    lo = np.searchsorted(sorted_rates, low, side='left' if low_inclusive else 'right')
+    hi = np.searchsorted(sorted_rates, high, side='right' if high_inclusive else 'left')
+    return np.where(hi > lo, cumulative[hi] - cumulative[np.minimum(lo, hi)], 0.0)
+
+
+def value_scenarios(position: PositionArrays, grid: np.ndarray, current_rate: Optional[float] = None,
+                    per_lot: bool = False, per_order: bool = False) -> dict:
+    """가상 환율 격자 전체에 대해 보유 로트의 평가 손익과 예정 거래의 예상 결과를 한 번에 계산합니다.
+
+    - unrealized: 로트별 남은 수량과 원가 기준 평가 손익 (격자별 합계)
+    - blended: calculate_current_value와 같은 평균단가 기준 평가 손익
+    - sell_orders / stop_orders: 현재 환율에서 격자 환율로 움직일 때 도달하는
+      매도예정/손절예정의 예상 손익 합계 (TriggerIndex와 같은 도달 조건)
+    per_lot / per_order가 True이면 (로트 또는 예정 거래 × 격자) 행렬도 함께 반환합니다.
+    """
+    grid = np.asarray(grid, dtype=float)
+    result = {
+        'grid': grid,
+        'unrealized': position.remaining.sum() * grid - position.cost.sum(),
+        'blended': (position.holding_amount * (grid - position.avg_rate) if position.holding_amount
+                    else np.zeros_like(grid)),
+    }
+    if per_lot:
+        result['per_lot'] = np.outer(position.remaining, grid) - position.cost[:, None]
+
+    is_sell = np.array(position.order_types) == '매도예정'
+    if current_rate is None:
+        # 현재 환율을 모르면 격자 환율에 닿은 예정 거래는 모두 체결된 것으로 봄
+        current_low, current_high = np.full_like(grid, -np.inf), np.full_like(grid, np.inf)
+    else:
+        current_low = current_high = np.full_like(grid, current_rate)
+    # 매도예정: 현재 < 환율 <= 격자, 손절예정: 격자 <= 환율 < 현재
+    result['sell_orders'] = _sum_in_band(position.order_rates[is_sell], position.order_profits[is_sell],
+                                         current_low, grid, low_inclusive=False, high_inclusive=True)
+    result['stop_orders'] = _sum_in_band(position.order_rates[~is_sell], position.order_profits[~is_sell],
+                                         grid, current_high, low_inclusive=True, high_inclusive=False)
+    if per_order:
+        rates = position.order_rates[:, None]
+        filled = np.where(is_sell[:, None], (current_low < rates) & (rates <= grid),
+                          (grid <= rates) & (rates < current_high))
+        result['per_order'] = np.where(filled, position.order_profits[:, None], 0.0)
+    return result
+
+
+class ScenarioValuer:
+    """TradingSystem의 현재 포지션으로 가상 환율 시나리오를 계산합니다.
+
+    로트/예정 거래 배열은 거래 버전이 바뀔 때만 다시 만듭니다.
+    """
+    def __init__(self, trading_system: TradingSystem):
+        self.trading_system = trading_system
+        self._cache: Dict[str, tuple] = {}  # 통화 -> (거래 버전, PositionArrays)
+
+    def position(self, currency: str) -> PositionArrays:
+        version = self.trading_system.version
+        cached = self._cache.get(currency)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        trades = self.trading_system.get_trades_by_type(['매수', '매도', '손절', '매도예정', '손절예정'], currency)
+        position = build_position_arrays(trades, self.trading_system.calculate_holding_amount(currency))
+        self._cache[currency] = (version, position)
+        return position
+
+    def evaluate(self, grids: Dict[str, np.ndarray], per_lot: bool = False, per_order: bool = False) -> dict:
+        """통화별 환율 격자 -> 통화별 시나리오 결과"""
+        results = {}
+        for currency, grid in grids.items():
+            rate = self.trading_system.get_current_rate(currency)
+            results[currency] = value_scenarios(self.position(currency), grid,
+                                                rate.current_rate if rate else None, per_lot, per_order)
+        return results
+
+
+# 격자 하나의 최대 지점 수 (요청 하나가 큰 배열을 만들지 못하도록)
+MAX_GRID_POINTS = 10000
+
+
+def parse_grid(spec: str) -> np.ndarray:
+    """'1300:1500:201' (시작:끝:개수, 끝 포함) 또는 '1380,1400,1420' 형식의 환율 격자
+
+    지점 수가 1~MAX_GRID_POINTS를 벗어나거나 환율이 유한한 수가 아니면 ValueError를 냅니다.
+    """
+    if ':' in spec:
+        start, stop, count = spec.split(':')
+        start, stop, count = float(start), float(stop), int(count)
+        if not 0 < count <= MAX_GRID_POINTS:
+            raise ValueError(f"격자 지점 수는 1~{MAX_GRID_POINTS}개여야 합니다: {count}")
+        bounds = [start, stop]
+    else:
+        if spec.count(',') >= MAX_GRID_POINTS:
+            raise ValueError(f"격자 지점 수는 1~{MAX_GRID_POINTS}개여야 합니다.")
+        bounds = [float(value) for value in spec.split(',')]
+    if not all(math.isfinite(value) for value in bounds):
+        raise ValueError("격자 환율은 유한한 수여야 합니다.")
+    if ':' in spec:
+        return np.linspace(start, stop, count)
+    return np.array(bounds, dtype=float)
@@ -0,0 +1,575 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional, Callable, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 저장소는 Trade 객체가 아닌 dict 레코드를 다룹니다. (trading.py와의 순환 참조 방지)
+TradeRecord = Dict[str, object]
+# 다른 프로세스의 변경 내역: ('put', 레코드) 또는 ('del', 거래 ID)를 적용 순서대로 나열
+ChangeOp = Tuple[str, object]
+
+
+def migrate_trade_record(record: TradeRecord) -> TradeRecord:
+    """이전 데이터 구조를 새 구조로 변환합니다."""
+    if 'usd_amount' in record:
+        record['foreign_amount'] = record.pop('usd_amount')
+    if 'currency' not in record:
+        record['currency'] = 'USD'  # 기존 데이터는 모두 USD로 처리
+    return record
+
+
+def read_legacy_trades(path: str) -> List[TradeRecord]:
+    """trades.json 형식(거래 dict 목록)의 파일을 읽습니다. 파일이 없으면 빈 목록을 반환합니다."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    return [migrate_trade_record(record) for record in data]
+
+
+def duplicate_trade_ids(records: List[TradeRecord]) -> List[str]:
+    """두 번 이상 나오는 거래 ID (처음 나온 순서)"""
+    seen = set()
+    duplicates = []
+    for record in records:
+        if record['id'] in seen and record['id'] not in duplicates:
+            duplicates.append(record['id'])
+        seen.add(record['id'])
+    return duplicates
+
+
+def renumber_duplicate_ids(records: List[TradeRecord]) -> List[Tuple[str, str]]:
+    """같은 ID가 다시 나오면 뒤의 거래에 '<ID>-중복<n>' 형식의 새 ID를 붙입니다. (이전 ID, 새 ID) 목록을 반환합니다.
+
+    연관 거래(related_id)는 어느 쪽의 짝인지 알 수 없으므로 처음 나온 거래를 계속 가리킵니다.
+    """
+    used = {record['id'] for record in records}
+    seen = set()
+    renamed = []
+    for record in records:
+        trade_id = record['id']
+        if trade_id in seen:
+            n = 1
+            while f'{trade_id}-중복{n}' in used:
+                n += 1
+            record['id'] = f'{trade_id}-중복{n}'
+            used.add(record['id'])
+            renamed.append((trade_id, record['id']))
+        seen.add(trade_id)
+    return renamed
+
+
+def warn_duplicate_ids(path: str, records: List[TradeRecord]):
+    duplicates = duplicate_trade_ids(records)
+    if duplicates:
+        print(f"경고: {path}에 같은 ID의 거래가 여러 건 있습니다: {', '.join(duplicates)} "
+              f"(migrate_storage.py --renumber-duplicates로 번호를 새로 매길 수 있습니다)")
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = 2, fsync: bool = True) -> int:
+    """임시 파일에 쓴 뒤 rename하여, 쓰는 도중 중단되어도 기존 파일이 깨지지 않게 합니다. 쓴 바이트 수를 반환합니다."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+        size = os.fstat(f.fileno()).st_size
+    os.replace(tmp_path, path)
+    return size
+
+
+def file_stat_token(path: str):
+    """파일이 바뀌었는지 비교하기 위한 값 (inode, 수정 시각, 크기)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """프로세스 간 배타(또는 공유) 파일 잠금"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileSequence:
+    """파일에 저장되는 이름별 단조 증가 번호
+
+    번호를 받을 때마다 파일 잠금을 잡고 읽기-증가-쓰기를 하므로, 여러 스레드와
+    프로세스가 동시에 요청해도 같은 번호가 두 번 나가지 않습니다.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def next(self, name: str) -> int:
+        with self._lock, file_lock(self.lock_path):
+            values = self._read()
+            values[name] = values.get(name, 0) + 1
+            write_json_atomic(self.path, values, indent=None, fsync=False)
+            return values[name]
+
+    def ensure_at_least(self, floors: Dict[str, int]):
+        """번호가 floors보다 작으면 올립니다. (기존 데이터의 최대 번호 반영)"""
+        with self._lock, file_lock(self.lock_path):
+            values = self._read()
+            if all(values.get(name, 0) >= floor for name, floor in floors.items()):
+                return
+            for name, floor in floors.items():
+                values[name] = max(values.get(name, 0), floor)
+            write_json_atomic(self.path, values, indent=None)
+
+
+class TradeStorage:
+    """거래 저장소 기본 클래스"""
+    name = 'base'
+    bytes_written = 0         # 이 프로세스가 거래 파일에 쓴 바이트 수 (계측용)
+
+    def load(self) -> List[TradeRecord]:
+        """저장된 전체 거래를 순서대로 반환합니다."""
+        raise NotImplementedError
+
+    def save_all(self, records: List[TradeRecord]):
+        """전체 거래를 다시 씁니다."""
+        raise NotImplementedError
+
+    def commit(self, all_records: Callable[[], List[TradeRecord]],
+               upserts: Iterable[TradeRecord] = (), deletes: Iterable[str] = ()):
+        """변경 사항을 저장합니다. all_records는 변경이 반영된 전체 거래 목록을 만드는 함수입니다.
+
+        기본 구현은 전체를 다시 쓰며, 변경분만 기록할 수 있는 저장소는 이를 재정의합니다.
+        """
+        self.save_all(all_records())
+
+    def write_lock(self):
+        """다른 프로세스와 변경을 직렬화하는 잠금. 잡고 있는 동안 읽기-변경-쓰기가 원자적입니다."""
+        return file_lock(self.lock_path)
+
+    def generation(self):
+        """저장된 내용의 세대 값. 다른 프로세스가 변경하면 값이 달라집니다."""
+        return None
+
+    def changes_since(self, generation) -> Optional[List[ChangeOp]]:
+        """generation 이후의 변경 내역을 반환합니다. 전체를 다시 읽어야 하면 None을 반환합니다."""
+        return None
+
+    def next_sequence(self, name: str) -> int:
+        """이름(거래 유형)별로 한 번도 사용하지 않은 다음 번호를 반환합니다."""
+        return self.sequences.next(name)
+
+    def ensure_sequences(self, floors: Dict[str, int]):
+        """번호가 기존 거래의 최대 번호보다 작지 않게 맞춥니다."""
+        self.sequences.ensure_at_least(floors)
+
+    def load_settings(self) -> Optional[Dict[str, dict]]:
+        """저장소에 보관된 통화별 설정을 반환합니다. 설정을 보관하지 않는 저장소는 None을 반환합니다."""
+        return None
+
+    def save_settings(self, data: Dict[str, dict]) -> bool:
+        """통화별 설정을 저장소에 저장합니다. 설정을 보관하지 않는 저장소는 False를 반환합니다."""
+        return False
+
+    def settings_generation(self):
+        """보관된 설정의 세대 값. 설정을 보관하지 않는 저장소는 None을 반환합니다."""
+        return None
+
+    def close(self):
+        pass
+
+
+class JsonStorage(TradeStorage):
+    """기존 trades.json 파일 저장소 (변경마다 전체를 다시 씀)"""
+    name = 'json'
+
+    def __init__(self, file_path: str = 'trades.json'):
+        self.file_path = file_path
+        self.lock_path = f'{file_path}.lock'
+        self.sequences = FileSequence(f'{file_path}.seq')
+
+    def load(self) -> List[TradeRecord]:
+        records = read_legacy_trades(self.file_path)
+        warn_duplicate_ids(self.file_path, records)
+        return records
+
+    def generation(self):
+        return file_stat_token(self.file_path)
+
+    def save_all(self, records: List[TradeRecord]):
+        self.bytes_written += write_json_atomic(self.file_path, records)
+
+
+class JournalStorage(TradeStorage):
+    """스냅샷 + 추가 전용 저널 저장소
+
+    변경 사항은 저널 파일에 한 줄(커밋 하나)씩 덧붙이고, 저널이 일정 크기를
+    넘으면 스냅샷으로 합친 뒤 rename으로 교체합니다. 스냅샷은 기존 trades.json과
+    같은 형식이므로 기존 파일을 그대로 가져올 수 있습니다.
+
+    fsync 정책:
+        'always'   - 커밋마다 fsync
+        'interval' - 마지막 fsync 후 fsync_interval초가 지난 커밋에서 fsync
+        'never'    - 운영체제에 맡김
+    """
+    name = 'journal'
+    FSYNC_POLICIES = ('always', 'interval', 'never')
+
+    def __init__(self, file_path: str = 'trades.json', journal_path: Optional[str] = None,
+                 fsync: str = 'interval', fsync_interval: float = 1.0, compact_every: int = 1000):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"지원하지 않는 fsync 정책입니다: {fsync}")
+        self.file_path = file_path
+        self.journal_path = journal_path or f'{file_path}.journal'
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.lock_path = f'{file_path}.lock'
+        self.sequences = FileSequence(f'{file_path}.seq')
+        self.journal_entries = 0  # 마지막 합치기 이후 저널 커밋 수
+        self._last_fsync = 0.0
+        self._journal = None
+        self._lock = threading.Lock()
+
+    def load(self) -> List[TradeRecord]:
+        """스냅샷을 읽고 저널을 순서대로 다시 적용합니다. (같은 ID의 거래가 여러 건이면 마지막 거래를 사용)"""
+        records = read_legacy_trades(self.file_path)
+        warn_duplicate_ids(self.file_path, records)
+        return self.replay(records)
+
+    def replay(self, records: List[TradeRecord]) -> List[TradeRecord]:
+        """스냅샷 레코드 위에 저널을 순서대로 다시 적용한 결과를 반환합니다."""
+        trades = {record['id']: record for record in records}
+        self.journal_entries = 0
+
+        try:
+            with open(self.journal_path, 'rb') as f:
+                valid_size = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 기록 도중 중단된 마지막 줄은 버림
+                        print(f"저널의 손상된 마지막 기록을 무시합니다: {self.journal_path}")
+                        break
+                    self._apply(trades, entry)
+                    valid_size += len(line)
+                    self.journal_entries += 1
+            if valid_size != os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_size)
+        except FileNotFoundError:
+            pass
+
+        return list(trades.values())
+
+    @staticmethod
+    def _apply(trades: Dict[str, TradeRecord], entry: dict):
+        for op, value in JournalStorage._entry_ops(entry):
+            if op == 'del':
+                trades.pop(value, None)
+            else:
+                trades[value['id']] = value
+
+    @staticmethod
+    def _entry_ops(entry: dict) -> List[ChangeOp]:
+        ops = [('del', trade_id) for trade_id in entry.get('del', ())]
+        ops += [('put', migrate_trade_record(record)) for record in entry.get('put', ())]
+        return ops
+
+    def generation(self):
+        # 스냅샷이 교체되면(다른 프로세스의 합치기) 전체를, 저널만 늘었으면 늘어난 부분만 다시 읽음
+        journal = file_stat_token(self.journal_path)
+        return (file_stat_token(self.file_path), journal[2] if journal else 0)
+
+    def changes_since(self, generation) -> Optional[List[ChangeOp]]:
+        if generation is None:
+            return None
+        snapshot, journal_size = generation
+        current_snapshot, current_size = self.generation()
+        if snapshot != current_snapshot or current_size < journal_size:
+            return None
+
+        ops: List[ChangeOp] = []
+        with open(self.journal_path, 'rb') as f:
+            f.seek(journal_size)
+            for line in f.read(current_size - journal_size).splitlines():
+                ops.extend(self._entry_ops(json.loads(line)))
+        return ops
+
+    def commit(self, all_records: Callable[[], List[TradeRecord]],
+               upserts: Iterable[TradeRecord] = (), deletes: Iterable[str] = ()):
+        entry = {}
+        deletes = list(deletes)
+        upserts = list(upserts)
+        if deletes:
+            entry['del'] = deletes
+        if upserts:
+            entry['put'] = upserts
+        if not entry:
+            return
+
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            journal = self._open_journal()
+            journal.write(line)
+            self.bytes_written += len(line)
+            journal.flush()
+            now = time.monotonic()
+            if self.fsync == 'always' or (self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+                os.fsync(journal.fileno())
+                self._last_fsync = now
+            self.journal_entries += 1
+
+            if self.journal_entries >= self.compact_every:
+                self._compact(all_records())
+
+    def save_all(self, records: List[TradeRecord]):
+        """스냅샷을 새로 쓰고 저널을 비웁니다."""
+        with self._lock:
+            self._compact(records)
+
+    def _compact(self, records: List[TradeRecord]):
+        # 스냅샷 교체 후 저널을 비우기 전에 중단되더라도, 저널 재적용 결과는 같음
+        self.bytes_written += write_json_atomic(self.file_path, records)
+        journal = self._open_journal()
+        journal.truncate(0)
+        journal.flush()
+        os.fsync(journal.fileno())
+        self.journal_entries = 0
+
+    def _open_journal(self):
+        if self._journal is None or self._journal.closed:
+            self._journal = open(self.journal_path, 'ab')
+        return self._journal
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None and not self._journal.closed:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+
+
+TRADE_COLUMNS = ('id', 'date', 'type', 'currency', 'rate', 'krw_amount', 'foreign_amount',
+                 'profit', 'note', 'related_id')
+
+
+class SqliteStorage(TradeStorage):
+    """SQLite 저장소
+
+    연관 거래, 통화별 집계, 날짜순 조회는 TradingSystem의 메모리 인덱스가 담당하므로
+    id(UNIQUE) 외의 인덱스는 두지 않습니다. 여러 행을 바꾸는 커밋은 하나의 트랜잭션으로 처리됩니다.
+    """
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trades (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            krw_amount REAL NOT NULL,
+            foreign_amount REAL NOT NULL,
+            profit REAL NOT NULL,
+            note TEXT NOT NULL DEFAULT '',
+            related_id TEXT NOT NULL DEFAULT ''
+        );
+        -- 연관 거래/집계/날짜 조회는 메모리 인덱스가 담당하므로, 이전 버전이 만든 보조 인덱스는 지움
+        DROP INDEX IF EXISTS idx_trades_related_id;
+        DROP INDEX IF EXISTS idx_trades_currency_type;
+        DROP INDEX IF EXISTS idx_trades_date;
+        CREATE TABLE IF NOT EXISTS changelog (
+            gen INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            trade_id TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS settings (
+            currency TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str = 'trades.db'):
+        self.db_path = db_path
+        self.lock_path = f'{db_path}.lock'
+        # Flask 요청 스레드와 환율 폴러 스레드가 함께 사용하므로 잠금으로 직렬화
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.RLock()
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _to_record(row) -> TradeRecord:
+        return {column: row[column] for column in TRADE_COLUMNS}
+
+    def load(self) -> List[TradeRecord]:
+        return [self._to_record(row) for row in self._query('SELECT * FROM trades ORDER BY seq')]
+
+    def _write(self, upserts: Iterable[TradeRecord] = (), deletes: Iterable[str] = (), replace_all: bool = False):
+        columns = ', '.join(TRADE_COLUMNS)
+        placeholders = ', '.join(f':{column}' for column in TRADE_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in TRADE_COLUMNS if column != 'id')
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                deletes = [(trade_id,) for trade_id in deletes]
+                upserts = [{column: record.get(column, '') for column in TRADE_COLUMNS} for record in upserts]
+                if replace_all:
+                    self._conn.execute('DELETE FROM trades')
+                    # 다른 프로세스는 reset을 보면 전체를 다시 읽으므로 이전 변경 내역은 필요 없음
+                    self._conn.execute('DELETE FROM changelog')
+                    self._conn.execute("INSERT INTO changelog (op, trade_id) VALUES ('reset', '')")
+                else:
+                    self._conn.executemany("INSERT INTO changelog (op, trade_id) VALUES ('del', ?)", deletes)
+                    self._conn.executemany("INSERT INTO changelog (op, trade_id) VALUES ('put', :id)", upserts)
+                self._conn.executemany('DELETE FROM trades WHERE id = ?', deletes)
+                self._conn.executemany(
+                    f'INSERT INTO trades ({columns}) VALUES ({placeholders}) '
+                    f'ON CONFLICT(id) DO UPDATE SET {updates}',
+                    upserts
+                )
+                if replace_all:
+                    # 같은 ID가 섞여 있으면 upsert가 한 행으로 합쳐 버리므로, 행 수가 다르면 전체를 되돌림
+                    stored = self._conn.execute('SELECT COUNT(*) FROM trades').fetchone()[0]
+                    if stored != len(upserts):
+                        raise ValueError(f"저장된 거래 수({stored})가 입력 거래 수({len(upserts)})와 다릅니다. "
+                                         f"같은 ID의 거래가 있는지 확인하세요.")
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def save_all(self, records: List[TradeRecord]):
+        self._write(upserts=records, replace_all=True)
+
+    def commit(self, all_records: Callable[[], List[TradeRecord]],
+               upserts: Iterable[TradeRecord] = (), deletes: Iterable[str] = ()):
+        self._write(upserts=upserts, deletes=deletes)
+
+    def generation(self):
+        return self._query('SELECT COALESCE(MAX(gen), 0) FROM changelog')[0][0]
+
+    def changes_since(self, generation) -> Optional[List[ChangeOp]]:
+        if generation is None:
+            return None
+        rows = self._query('SELECT op, trade_id FROM changelog WHERE gen > ? ORDER BY gen', (generation,))
+        if any(row['op'] == 'reset' for row in rows):
+            return None
+
+        # put은 그 사이 다시 바뀌었을 수 있으므로 현재 행을 읽어 적용 (이후 del이 있으면 결과는 같음)
+        ops: List[ChangeOp] = []
+        for row in rows:
+            if row['op'] == 'del':
+                ops.append(('del', row['trade_id']))
+            else:
+                record = self.find(row['trade_id'])
+                if record is not None:
+                    ops.append(('put', record))
+        return ops
+
+    # id 인덱스를 사용하는 조회 (다른 프로세스의 변경 반영용)
+    def find(self, trade_id: str) -> Optional[TradeRecord]:
+        rows = self._query('SELECT * FROM trades WHERE id = ?', (trade_id,))
+        return self._to_record(rows[0]) if rows else None
+
+    def next_sequence(self, name: str) -> int:
+        # BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡아 다른 프로세스와도 번호가 겹치지 않음
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('INSERT OR IGNORE INTO sequences (name, value) VALUES (?, 0)', (name,))
+                self._conn.execute('UPDATE sequences SET value = value + 1 WHERE name = ?', (name,))
+                value = self._conn.execute('SELECT value FROM sequences WHERE name = ?', (name,)).fetchone()[0]
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return value
+
+    def ensure_sequences(self, floors: Dict[str, int]):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO sequences (name, value) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)',
+                    list(floors.items())
+                )
+
+    def load_settings(self) -> Optional[Dict[str, dict]]:
+        rows = self._query('SELECT currency, data FROM settings')
+        if not rows:
+            return None
+        return {row['currency']: json.loads(row['data']) for row in rows}
+
+    def save_settings(self, data: Dict[str, dict]) -> bool:
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO settings (currency, data) VALUES (?, ?) '
+                    'ON CONFLICT(currency) DO UPDATE SET data = excluded.data',
+                    [(currency, json.dumps(settings)) for currency, settings in data.items()]
+                )
+        return True
+
+    def settings_generation(self):
+        # 통화 몇 개뿐인 표이므로 내용 자체를 세대 값으로 사용
+        return tuple(tuple(row) for row in self._query('SELECT currency, data FROM settings ORDER BY currency'))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(kind: str = 'json', file_path: str = 'trades.json', **options) -> TradeStorage:
+    """저장소 종류 이름으로 저장소를 생성합니다. ('json', 'journal', 'sqlite')"""
+    if kind == 'json':
+        return JsonStorage(file_path)
+    if kind == 'journal':
+        return JournalStorage(file_path, **options)
+    if kind == 'sqlite':
+        return SqliteStorage(options.get('db_path') or os.path.splitext(file_path)[0] + '.db')
+    raise ValueError(f"지원하지 않는 저장소입니다: {kind}")
@@ -0,0 +1,230 @@
+"""CurrencySettings 파라미터 조합별 백테스트를 모든 코어에서 병렬로 실행합니다.
+
+    python -m sweep --history ticks --currency USD --resolution 1m \\
+        --increment-steps 5:40:1 --stop-loss-gaps 10:40:2 --buy-drops 3:15:1 --out usd_sweep.jsonl
+
+환율 배열은 공유 메모리에 한 번만 올리고 작업 프로세스들은 복사 없이 이를 읽습니다.
+결과는 끝나는 대로 --out 파일에 한 줄씩 기록되며, 같은 파일로 다시 실행하면 이미 끝난
+조합은 건너뜁니다 (중단 후 재개). 파일 첫 줄에는 환율 데이터와 기준 설정의 지문을 남기고,
+지문이 다르면 이어서 실행하지 않습니다 (--restart로 처음부터 다시 실행).
+진행 중에는 주기적으로, 끝나면 최종 순위표를 출력합니다.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool, shared_memory
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import CrossingFinder, load_settings, run_backtest
+from trading import CurrencySettings
+
+# 순위 기준: 이름 -> (결과에서 값을 꺼내는 함수, 클수록 좋은지)
+RANKINGS: Dict[str, Tuple[Callable[[dict], float], bool]] = {
+    'total_profit': (lambda r: r['total_profit'], True),
+    'realized_profit': (lambda r: r['realized_profit'], True),
+    'max_drawdown': (lambda r: r['max_drawdown'], False),
+    'profit_to_drawdown': (lambda r: r['total_profit'] / r['max_drawdown'] if r['max_drawdown'] else 0.0, True),
+}
+
+# 작업 프로세스 전역 상태 (initializer에서 한 번만 준비)
+_worker_state = {}
+
+
+def parameter_grid(increments: Iterable[List[int]], stop_loss_gaps: Iterable[int],
+                   buy_drops: Iterable[int]) -> List[dict]:
+    """rate_increments, stop_loss_gap, buy_drop_threshold의 모든 조합"""
+    return [{'rate_increments': list(rate_increments), 'stop_loss_gap': stop_loss_gap, 'buy_drop_threshold': buy_drop}
+            for rate_increments, stop_loss_gap, buy_drop in itertools.product(increments, stop_loss_gaps, buy_drops)]
+
+
+def params_key(params: dict) -> str:
+    """재개할 때 끝난 조합을 찾기 위한 키"""
+    return json.dumps([params['rate_increments'], params['stop_loss_gap'], params['buy_drop_threshold']])
+
+
+def data_fingerprint(rates: np.ndarray, base_settings: CurrencySettings) -> str:
+    """결과에 영향을 주는 환율 배열과 기준 설정의 지문 (조합마다 바꾸는 값은 키에 있으므로 제외)"""
+    digest = hashlib.sha256(np.ascontiguousarray(rates, dtype=np.float64).tobytes())
+    settings = {name: value for name, value in base_settings.to_dict().items()
+                if name not in ('rate_increments', 'stop_loss_gap', 'buy_drop_threshold')}
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _init_worker(shm_name: str, length: int, base_settings: dict):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rates = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    _worker_state.update(shm=shm, finder=CrossingFinder(rates), base_settings=base_settings)
+
+
+def _run_params(params: dict) -> dict:
+    settings = CurrencySettings.from_dict({**_worker_state['base_settings'], **params})
+    result = run_backtest(_worker_state['finder'].rates, settings, finder=_worker_state['finder'])
+    return {**params, **result.to_dict()}
+
+
+def rank_results(results: List[dict], rank_by: str = 'total_profit') -> List[dict]:
+    key, higher_is_better = RANKINGS[rank_by]
+    return sorted(results, key=key, reverse=higher_is_better)
+
+
+def format_table(results: List[dict], limit: int = 20) -> str:
+    lines = [f"{'순위':>4} {'증가폭':<14} {'손절':>5} {'추가매수':>8} {'총손익':>14} {'실현손익':>14} "
+             f"{'최대낙폭':>12} {'체결':>6}"]
+    for rank, r in enumerate(results[:limit], 1):
+        lines.append(f"{rank:>4} {str(r['rate_increments']):<14} {r['stop_loss_gap']:>5} "
+                     f"{r['buy_drop_threshold']:>8} {r['total_profit']:>14,.0f} {r['realized_profit']:>14,.0f} "
+                     f"{r['max_drawdown']:>12,.0f} {r['trade_count']:>6}")
+    return '\n'.join(lines)
+
+
+def load_results(path: str) -> List[dict]:
+    """이전 실행의 결과 (첫 줄의 지문과 중단되며 잘린 마지막 줄은 무시)"""
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'fingerprint' not in record:
+                results.append(record)
+    return results
+
+
+def read_fingerprint(path: str) -> Optional[str]:
+    """결과 파일 첫 줄에 기록된 지문 (파일이 없거나 지문이 없으면 None)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.loads(f.readline()).get('fingerprint')
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return None
+
+
+def run_sweep(rates: np.ndarray, base_settings: CurrencySettings, grid: List[dict],
+              results_path: Optional[str] = None, processes: Optional[int] = None,
+              rank_by: str = 'total_profit', on_result: Optional[Callable[[dict, List[dict]], None]] = None,
+              restart: bool = False) -> List[dict]:
+    """grid의 조합마다 백테스트를 실행하고 순위대로 정렬한 결과를 반환합니다.
+
+    results_path가 있으면 결과를 한 줄씩 덧붙이고, 이미 기록된 조합은 다시 실행하지 않습니다.
+    기록된 지문이 지금의 환율 데이터/기준 설정과 다르면 ValueError를 내며,
+    restart가 True이면 기존 결과를 지우고 처음부터 실행합니다.
+    on_result(결과, 지금까지의 결과 목록)는 결과가 하나 도착할 때마다 호출됩니다.
+    """
+    fingerprint = data_fingerprint(rates, base_settings)
+    results = []
+    recorded = None
+    if results_path:
+        if restart and os.path.exists(results_path):
+            os.remove(results_path)
+        results = load_results(results_path)
+        recorded = read_fingerprint(results_path)
+        if (results or recorded is not None) and recorded != fingerprint:
+            raise ValueError(f"{results_path}은(는) 다른 환율 데이터나 설정으로 만든 결과입니다. "
+                             f"--restart로 처음부터 다시 실행하거나 다른 결과 파일을 지정하세요.")
+    done = {params_key(r) for r in results}
+    pending = [params for params in grid if params_key(params) not in done]
+    if not pending:
+        return rank_results(results, rank_by)
+
+    rates = np.ascontiguousarray(rates, dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(rates.nbytes, 1))
+    out = open(results_path, 'a', encoding='utf-8') if results_path else None
+    try:
+        if out is not None and recorded is None:
+            out.write(json.dumps({'fingerprint': fingerprint, 'rates': len(rates)}) + '\n')
+        np.ndarray(rates.shape, dtype=np.float64, buffer=shm.buf)[:] = rates
+        processes = processes or os.cpu_count()
+        chunksize = max(1, min(64, len(pending) // (processes * 8)))
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(shm.name, len(rates), base_settings.to_dict())) as pool:
+            for result in pool.imap_unordered(_run_params, pending, chunksize=chunksize):
+                results.append(result)
+                if out is not None:
+                    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    out.flush()
+                if on_result is not None:
+                    on_result(result, results)
+    finally:
+        if out is not None:
+            out.close()
+        shm.close()
+        shm.unlink()
+    return rank_results(results, rank_by)
+
+
+def _int_range(text: str) -> List[int]:
+    """'5:40:5' -> [5, 10, ..., 40] (끝 포함), '10' -> [10]"""
+    parts = [int(part) for part in text.split(':')]
+    if len(parts) == 1:
+        return parts
+    start, stop, step = parts[0], parts[1], parts[2] if len(parts) > 2 else 1
+    return list(range(start, stop + 1, step))
+
+
+def main():
+    from tick_history import TickHistory
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', required=True, help='TickHistory 디렉터리')
+    parser.add_argument('--currency', default='USD')
+    parser.add_argument('--settings', default='settings.json')
+    parser.add_argument('--resolution', default='1m', choices=['ticks', '1m', '1h', '1d'])
+    parser.add_argument('--start', type=float)
+    parser.add_argument('--end', type=float)
+    parser.add_argument('--increments', nargs='*', default=[], help='분할 매도 증가폭 (예: 10,20,30 6,12,18)')
+    parser.add_argument('--increment-steps', help='증가폭을 [s, 2s, 3s]로 만들 s 범위 (예: 5:40:1)')
+    parser.add_argument('--stop-loss-gaps', default='20', help='손절 하락폭 범위 (예: 10:40:2)')
+    parser.add_argument('--buy-drops', default='5', help='추가 매수 하락폭 범위 (예: 3:15:1)')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--rank-by', default='total_profit', choices=sorted(RANKINGS))
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--report-every', type=float, default=10.0, help='중간 순위표 출력 간격 (초)')
+    parser.add_argument('--out', help='결과 기록 파일 (JSON lines, 재개용)')
+    parser.add_argument('--restart', action='store_true', help='--out 파일의 기존 결과를 지우고 처음부터 실행')
+    args = parser.parse_args()
+
+    history = TickHistory(args.history)
+    if args.resolution == 'ticks':
+        rates = history.ticks(args.currency, args.start, args.end)['rate']
+    else:
+        rates = history.ohlc(args.currency, args.resolution, args.start, args.end)['close']
+    base_settings = load_settings(args.settings, args.currency)
+
+    increments = [[int(value) for value in triple.split(',')] for triple in args.increments]
+    if args.increment_steps:
+        increments += [[step, step * 2, step * 3] for step in _int_range(args.increment_steps)]
+    grid = parameter_grid(increments or [base_settings.rate_increments],
+                          _int_range(args.stop_loss_gaps), _int_range(args.buy_drops))
+
+    print(f"{args.currency} {len(rates)}개 환율, {len(grid)}개 조합")
+    started = time.perf_counter()
+    last_report = [started]
+
+    def report(result, results):
+        now = time.perf_counter()
+        if now - last_report[0] >= args.report_every:
+            last_report[0] = now
+            print(f"\n{len(results)}/{len(grid)} 완료 ({now - started:.0f}초)")
+            print(format_table(rank_results(results, args.rank_by), args.top))
+
+    try:
+        ranked = run_sweep(rates, base_settings, grid, results_path=args.out, processes=args.processes,
+                           rank_by=args.rank_by, on_result=report, restart=args.restart)
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
+    print(f"\n완료: {len(ranked)}개 조합, {time.perf_counter() - started:.1f}초")
+    print(format_table(ranked, args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import bisect
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from rate_monitor import RateSnapshot
+from storage import file_lock
+
+# 틱 레코드: 조회 시각(epoch 초), 환율, 등락금액, 등락률 (32바이트 고정 길이)
+TICK_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('rate', '<f8'),
+    ('change', '<f8'),
+    ('change_percent', '<f8'),
+])
+
+# OHLC 봉: 구간 시작 시각, 시가, 고가, 저가, 종가, 틱 수
+OHLC_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('ticks', '<u8'),
+])
+
+# 미리 계산해 두는 봉 단위 (초)
+ROLLUPS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+
+class RecordFile:
+    """헤더(레코드 수) 뒤에 고정 길이 레코드가 이어지는 추가 전용 메모리 맵 파일
+
+    파일은 용량을 두 배씩 늘려 가며 미리 잡아 두고, 레코드를 쓴 뒤 헤더의 레코드 수를 올립니다.
+    다른 프로세스가 늘린 파일은 다음 조회 때 다시 매핑합니다.
+    """
+    MAGIC = b'FXTICK01'
+    HEADER_SIZE = 64
+
+    def __init__(self, path: str, dtype: np.dtype, initial_capacity: int = 4096):
+        self.path = path
+        self.dtype = dtype
+        if not os.path.exists(path) or os.path.getsize(path) < self.HEADER_SIZE:
+            with open(path, 'wb') as f:
+                f.write(self.MAGIC.ljust(self.HEADER_SIZE, b'\0'))
+                f.truncate(self.HEADER_SIZE + dtype.itemsize * initial_capacity)
+        self._map()
+
+    def _map(self):
+        size = os.path.getsize(self.path)
+        capacity = (size - self.HEADER_SIZE) // self.dtype.itemsize
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode='r+',
+                             shape=self.HEADER_SIZE + capacity * self.dtype.itemsize)
+        if bytes(self._mm[:8]) != self.MAGIC:
+            raise ValueError(f"틱 기록 파일 형식이 아닙니다: {self.path}")
+        self._count = self._mm[8:16].view('<u8')
+        self._records = self._mm[self.HEADER_SIZE:].view(self.dtype)
+
+    def __len__(self) -> int:
+        count = int(self._count[0])
+        if count > len(self._records):
+            self._map()
+        return count
+
+    @property
+    def records(self) -> np.ndarray:
+        """저장된 레코드 전체 (복사 없는 메모리 맵 뷰)"""
+        return self._records[:len(self)]
+
+    def append(self, record: tuple):
+        count = len(self)
+        if count == len(self._records):
+            # 다른 프로세스가 이미 늘려 두었으면 다시 매핑만 함
+            if os.path.getsize(self.path) < self.HEADER_SIZE + self.dtype.itemsize * (count + 1):
+                self._mm.flush()
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self.HEADER_SIZE + self.dtype.itemsize * max(count * 2, 1))
+            self._map()
+        self._records[count] = record
+        self._count[0] = count + 1
+
+    def set_last(self, record: tuple):
+        self._records[len(self) - 1] = record
+
+    def replace(self, records: np.ndarray):
+        """전체 레코드를 바꿉니다. (봉 재계산용)"""
+        if len(records) > len(self._records):
+            if os.path.getsize(self.path) < self.HEADER_SIZE + self.dtype.itemsize * len(records):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self.HEADER_SIZE + self.dtype.itemsize * len(records))
+            self._map()
+        self._records[:len(records)] = records
+        self._count[0] = len(records)
+
+    def flush(self):
+        self._mm.flush()
+
+
+def _bucket(timestamp, resolution: int, utc_offset: int):
+    """timestamp가 속한 봉의 시작 시각 (일봉은 utc_offset 기준 자정)"""
+    return np.floor((timestamp + utc_offset) / resolution) * resolution - utc_offset
+
+
+def compute_ohlc(ticks: np.ndarray, resolution: int, utc_offset: int = 0) -> np.ndarray:
+    """틱 배열로 봉 배열을 한 번에 계산합니다. (시각순으로 정렬된 틱 가정)"""
+    if not len(ticks):
+        return np.empty(0, dtype=OHLC_DTYPE)
+    rates = ticks['rate']
+    buckets = _bucket(ticks['timestamp'], resolution, utc_offset)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ticks)]
+
+    bars = np.empty(len(starts), dtype=OHLC_DTYPE)
+    bars['timestamp'] = buckets[starts]
+    bars['open'] = rates[starts]
+    bars['high'] = np.maximum.reduceat(rates, starts)
+    bars['low'] = np.minimum.reduceat(rates, starts)
+    bars['close'] = rates[ends - 1]
+    bars['ticks'] = ends - starts
+    return bars
+
+
+def _time_slice(records: np.ndarray, start: Optional[float], end: Optional[float]) -> np.ndarray:
+    """timestamp가 [start, end]인 구간의 뷰. 열 전체를 복사하지 않도록 이진 탐색은 뷰 위에서 직접 수행"""
+    timestamps = records['timestamp']
+    lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+    hi = len(records) if end is None else bisect.bisect_right(timestamps, end)
+    return records[lo:hi]
+
+
+class TickHistory:
+    """통화별 환율 틱 기록과 1분/1시간/1일 OHLC 봉
+
+    디렉터리에 통화마다 <통화>.ticks와 <통화>.<단위>.ohlc 파일을 둡니다. 틱을 추가할 때
+    마지막 봉만 고치거나 새 봉을 덧붙이므로 봉 계산 비용은 틱당 O(1)입니다.
+    조회 결과는 메모리 맵의 NumPy 뷰이므로 긴 기간도 복사 없이 바로 사용할 수 있습니다.
+    여러 프로세스가 같은 디렉터리에 기록해도 파일 잠금과 시각 순서 검사로 틱이 중복되지 않습니다.
+    """
+    def __init__(self, directory: str, utc_offset: int = 9 * 3600):
+        self.directory = directory
+        self.utc_offset = utc_offset  # 일봉 경계 (기본값: 한국 시간 자정)
+        os.makedirs(directory, exist_ok=True)
+        self._series: Dict[str, Dict[str, RecordFile]] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, currency: str, create: bool = True) -> Optional[Dict[str, RecordFile]]:
+        """통화의 틱/봉 파일을 엽니다. create가 False이고 아직 기록이 없으면 파일을 만들지 않고 None을 반환합니다."""
+        series = self._series.get(currency)
+        if series is not None:
+            return series
+        if not create and not os.path.exists(os.path.join(self.directory, f'{currency}.ticks')):
+            return None
+        with self._lock, file_lock(self._lock_path(currency)):
+            series = self._series.get(currency)
+            if series is None:
+                series = {'ticks': RecordFile(os.path.join(self.directory, f'{currency}.ticks'), TICK_DTYPE)}
+                for name in ROLLUPS:
+                    series[name] = RecordFile(os.path.join(self.directory, f'{currency}.{name}.ohlc'), OHLC_DTYPE)
+                self._repair_rollups(series)
+                self._series[currency] = series
+        return series
+
+    def _lock_path(self, currency: str) -> str:
+        return os.path.join(self.directory, f'{currency}.lock')
+
+    def _repair_rollups(self, series: Dict[str, RecordFile]):
+        """틱 추가 도중 종료되어 봉의 틱 수가 틱 기록과 다르면 봉을 다시 계산합니다."""
+        ticks = series['ticks'].records
+        for name, resolution in ROLLUPS.items():
+            if int(series[name].records['ticks'].sum()) != len(ticks):
+                series[name].replace(compute_ohlc(ticks, resolution, self.utc_offset))
+
+    def append(self, currency: str, timestamp: float, rate: float, change: float = 0.0,
+               change_percent: float = 0.0) -> bool:
+        """틱 하나를 추가합니다. 마지막 틱보다 이르거나 같은 시각이면 무시하고 False를 반환합니다."""
+        series = self._open(currency)
+        with self._lock, file_lock(self._lock_path(currency)):
+            ticks = series['ticks']
+            if len(ticks) and ticks.records[-1]['timestamp'] >= timestamp:
+                return False
+            ticks.append((timestamp, rate, change, change_percent))
+
+            for name, resolution in ROLLUPS.items():
+                bars = series[name]
+                start = float(_bucket(timestamp, resolution, self.utc_offset))
+                last = bars.records[-1] if len(bars) else None
+                if last is not None and last['timestamp'] == start:
+                    bars.set_last((start, last['open'], max(last['high'], rate), min(last['low'], rate),
+                                   rate, last['ticks'] + 1))
+                else:
+                    bars.append((start, rate, rate, rate, rate, 1))
+        return True
+
+    def record(self, snapshot: RateSnapshot):
+        """환율 스냅샷의 통화별 환율을 틱으로 기록합니다. (RatePoller 리스너)
+
+        조회 실패로 이전 값을 다시 쓴 환율(stale)은 기록하지 않습니다.
+        """
+        for currency, rate in snapshot.rates.items():
+            if rate.stale:
+                continue
+            self.append(currency, snapshot.updated_at, rate.current_rate, rate.change_amount, rate.change_percent)
+
+    def ticks(self, currency: str, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """[start, end] 구간의 틱 (TICK_DTYPE 구조 배열 뷰, 복사 없음). 기록이 없으면 빈 배열"""
+        series = self._open(currency, create=False)
+        if series is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return _time_slice(series['ticks'].records, start, end)
+
+    def ohlc(self, currency: str, resolution: str = '1m', start: Optional[float] = None,
+             end: Optional[float] = None) -> np.ndarray:
+        """[start, end] 구간에 시작하는 봉 (OHLC_DTYPE 구조 배열 뷰, 복사 없음). 기록이 없으면 빈 배열"""
+        if resolution not in ROLLUPS:
+            raise ValueError(f"지원하지 않는 봉 단위입니다: {resolution}")
+        series = self._open(currency, create=False)
+        if series is None:
+            return np.empty(0, dtype=OHLC_DTYPE)
+        return _time_slice(series[resolution].records, start, end)
+
+    def flush(self):
+        for series in self._series.values():
+            for record_file in series.values():
+                record_file.flush()
@@ -1,9 +1,20 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, asdict, replace
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union, Iterable, Tuple, Callable
+import base64
+import functools
+import heapq
+import itertools
 import json
-from rate_monitor import RateMonitor
-import threading
+import operator
+import re
+import sys
+from sortedcontainers import SortedKeyList, SortedList
+from rate_monitor import RateMonitor, RatePoller, RateSnapshot, RateData
+from rwlock import ReadWriteLock
+from storage import TradeStorage, create_storage, file_stat_token, write_json_atomic
+import metrics
+import time
 
 @dataclass
 class CurrencySettings:
@@ -52,6 +63,14 @@ class CurrencySettings:
 
 @dataclass
 class Trade:
+    """거래 한 건
+
+    장부는 수십만~수백만 건까지 메모리에 올라가므로 인스턴스 __dict__ 없이 슬롯에 저장하고,
+    여러 거래가 같은 값을 갖는 문자열(날짜, 유형, 통화, 메모, 연관ID)은 intern해 한 객체를 공유합니다.
+    """
+    __slots__ = ('id', 'date', 'type', 'currency', 'rate', 'krw_amount', 'foreign_amount', 'profit', 'note',
+                 'related_id')
+
     id: str
     date: str
     type: str
@@ -63,6 +82,15 @@ class Trade:
     note: str
     related_id: str
 
+    def __post_init__(self):
+        self.date = sys.intern(self.date)
+        self.type = sys.intern(self.type)
+        self.currency = sys.intern(self.currency)
+        if self.note:
+            self.note = sys.intern(self.note)
+        if self.related_id:
+            self.related_id = sys.intern(self.related_id)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -77,70 +105,791 @@ class Trade:
             'related_id': self.related_id
         }
 
+def _foreign_digits(currency: str) -> int:
+    # 외화 수량 반올림 자릿수 (엔화는 단가가 작아 소수 4자리까지)
+    return 4 if currency == "JPY" else 2
+
+
+def build_buy_trade(buy_id: str, date: str, currency: str, rate: float, krw_amount: float, note: str = "") -> Trade:
+    """매수 거래를 만듭니다."""
+    return Trade(
+        id=buy_id,
+        date=date,
+        type="매수",
+        currency=currency,
+        rate=rate,
+        krw_amount=round(krw_amount, 2),
+        foreign_amount=round(krw_amount / rate, _foreign_digits(currency)),
+        profit=0,
+        note=note,
+        related_id=""
+    )
+
+
+def build_planned_trades(buy_trade: Trade, krw_amount: float, settings: CurrencySettings,
+                         include_next_buy: bool = True) -> List[Trade]:
+    """매수 거래의 예정 거래(매도예정 3건, 손절예정, 다음 매수예정)를 만듭니다.
+
+    주문 생성, 매수 수정, 백테스트가 모두 이 함수로 같은 사다리를 만듭니다.
+    """
+    buy_id, date, rate, currency = buy_trade.id, buy_trade.date, buy_trade.rate, buy_trade.currency
+    digits = _foreign_digits(currency)
+    unit = '엔' if currency == 'JPY' else '원'
+
+    # 매도예정 주문 생성 (30%, 30%, 40% 분할)
+    sell_ratios = [0.3, 0.3, 0.4]
+    planned_trades = []
+
+    for i, (ratio, rate_inc) in enumerate(zip(sell_ratios, settings.rate_increments), 1):
+        sell_amount = round(krw_amount * ratio, 2)
+        sell_rate = rate + rate_inc
+        foreign_amount = round(sell_amount / sell_rate, digits)
+        buy_amount = round(foreign_amount * rate, 2)
+        expected_profit = round(sell_amount - buy_amount, 2)
+
+        planned_trades.append(Trade(
+            id=f"매도예정{buy_id[2:]}-{i}",
+            date=date,
+            type="매도예정",
+            currency=currency,
+            rate=sell_rate,
+            krw_amount=sell_amount,
+            foreign_amount=foreign_amount,
+            profit=expected_profit,
+            note=f"자동생성 (분할 {i}/3, +{rate_inc}{unit})",
+            related_id=buy_id
+        ))
+
+    # 손절예정 주문 생성
+    stop_loss_rate = rate - settings.stop_loss_gap
+    stop_loss_amount = krw_amount
+    foreign_amount = round(stop_loss_amount / stop_loss_rate, digits)
+    expected_loss = round((stop_loss_amount * (stop_loss_rate / rate)) - stop_loss_amount, 2)
+
+    planned_trades.append(Trade(
+        id=f"손절예정{buy_id[2:]}",
+        date=date,
+        type="손절예정",
+        currency=currency,
+        rate=stop_loss_rate,
+        krw_amount=stop_loss_amount,
+        foreign_amount=foreign_amount,
+        profit=expected_loss,
+        note=f"자동생성 (-{settings.stop_loss_gap}{unit})",
+        related_id=buy_id
+    ))
+
+    # 다음 매수예정 주문 생성
+    if include_next_buy:
+        next_buy_rate = rate - settings.buy_drop_threshold
+        planned_trades.append(Trade(
+            id=f"매수예정{buy_id[2:]}",
+            date=date,
+            type="매수예정",
+            currency=currency,
+            rate=next_buy_rate,
+            krw_amount=settings.default_amount,
+            foreign_amount=round(settings.default_amount / next_buy_rate, digits),
+            profit=0,
+            note=f"자동생성 (-{settings.buy_drop_threshold}{unit})",
+            related_id=buy_id
+        ))
+    return planned_trades
+
+
+def _unit_cost(buy_trade: Trade) -> float:
+    """매수한 외화 1단위의 원화 원가"""
+    return buy_trade.krw_amount / buy_trade.foreign_amount if buy_trade.foreign_amount else buy_trade.rate
+
+
+def realized_profit(buy_trade: Trade, krw_amount: float, foreign_amount: float) -> float:
+    """매수 거래의 외화 foreign_amount를 krw_amount에 판 실현 손익 (매수 원가 기준)"""
+    return round(krw_amount - foreign_amount * _unit_cost(buy_trade), 2)
+
+
+def build_sell_trade(sell_id: str, buy_trade: Trade, rate: float, ratio: float, date: str, note: str = "") -> Trade:
+    """매수 금액의 ratio만큼을 rate에 매도하는 거래를 만듭니다."""
+    sell_krw = round(buy_trade.krw_amount * ratio, 2)
+    sell_usd = round(sell_krw / rate, 2)
+
+    return Trade(
+        id=sell_id,
+        date=date,
+        type="매도",
+        currency=buy_trade.currency,
+        rate=rate,
+        krw_amount=sell_krw,
+        foreign_amount=sell_usd,
+        profit=realized_profit(buy_trade, sell_krw, sell_usd),
+        note=note,
+        related_id=buy_trade.id
+    )
+
+
+def stop_loss_amounts(buy_trade: Trade, rate: float, sold_foreign: float) -> Tuple[float, float, float]:
+    """아직 팔지 않은 외화(매수 수량 - sold_foreign)를 rate에 손절할 때의 (외화 수량, 원화 금액, 실현 손익)"""
+    remaining = round(max(buy_trade.foreign_amount - sold_foreign, 0), _foreign_digits(buy_trade.currency))
+    proceeds = round(remaining * rate, 2)
+    return remaining, proceeds, realized_profit(buy_trade, proceeds, remaining)
+
+
+def build_stop_loss_trade(stop_loss_id: str, buy_trade: Trade, rate: float, sold_foreign: float,
+                          date: str, note: str = "") -> Trade:
+    """매수 거래 중 아직 팔지 않은 외화를 rate에 손절하는 거래를 만듭니다."""
+    remaining, proceeds, profit = stop_loss_amounts(buy_trade, rate, sold_foreign)
+
+    return Trade(
+        id=stop_loss_id,
+        date=date,
+        type="손절",
+        currency=buy_trade.currency,
+        rate=rate,
+        krw_amount=proceeds,
+        foreign_amount=remaining,
+        profit=profit,
+        note=note,
+        related_id=buy_trade.id
+    )
+
+
+class TradeIndex:
+    """거래 목록의 보조 인덱스
+
+    id, related_id(매수별 하위 거래), (통화, 유형)별로 거래를 찾습니다.
+    id/유형/통화/연관ID는 거래가 만들어진 뒤 바뀌지 않으므로 추가/삭제 시에만 갱신합니다.
+    """
+    def __init__(self, trades: Iterable[Trade] = ()):
+        self.rebuild(trades)
+
+    def rebuild(self, trades: Iterable[Trade]):
+        self.by_id: Dict[str, Trade] = {}
+        self.by_related: Dict[str, Dict[str, Trade]] = {}
+        self.by_currency_type: Dict[Tuple[str, str], Dict[str, Trade]] = {}
+        self._order: Dict[str, int] = {}  # 거래 목록 내 추가 순서
+        self._next_order = 0
+        for trade in trades:
+            self.add(trade)
+
+    def add(self, trade: Trade):
+        self.by_id[trade.id] = trade
+        self._order[trade.id] = self._next_order
+        self._next_order += 1
+        if trade.related_id:
+            self.by_related.setdefault(trade.related_id, {})[trade.id] = trade
+        self.by_currency_type.setdefault((trade.currency, trade.type), {})[trade.id] = trade
+
+    def remove(self, trade: Trade):
+        self.by_id.pop(trade.id, None)
+        self._order.pop(trade.id, None)
+        if trade.related_id:
+            children = self.by_related.get(trade.related_id)
+            if children is not None:
+                children.pop(trade.id, None)
+                if not children:
+                    del self.by_related[trade.related_id]
+        group = self.by_currency_type.get((trade.currency, trade.type))
+        if group is not None:
+            group.pop(trade.id, None)
+
+    def get(self, trade_id: str) -> Optional[Trade]:
+        return self.by_id.get(trade_id)
+
+    def children(self, buy_id: str, trade_type: Optional[str] = None) -> List[Trade]:
+        children = self.by_related.get(buy_id, {}).values()
+        if trade_type is None:
+            return list(children)
+        return [t for t in children if t.type == trade_type]
+
+    def count(self, trade_type: str, currency: Optional[str] = None) -> int:
+        return sum(len(group) for (group_currency, group_type), group in self.by_currency_type.items()
+                   if group_type == trade_type and (currency is None or group_currency == currency))
+
+    def select(self, types: Iterable[str], currency: Optional[str] = None) -> List[Trade]:
+        """지정한 유형(과 통화)의 거래를 거래 목록 순서대로 반환합니다."""
+        types = set(types)
+        groups = [group.values() for (group_currency, group_type), group in self.by_currency_type.items()
+                  if group_type in types and (currency is None or group_currency == currency)]
+        # 각 그룹은 추가 순서대로 들어 있으므로 병합만 하면 됨
+        return list(heapq.merge(*groups, key=lambda t: self._order[t.id]))
+
+
+@dataclass(frozen=True)
+class TriggerEvent:
+    """환율이 예정 거래의 발동 환율을 지나간 사건"""
+    trade_id: str
+    trade_type: str       # '매도예정', '손절예정', '매수예정'
+    currency: str
+    trigger_rate: float   # 예정 거래의 환율
+    market_rate: float    # 발동시킨 현재 환율
+    related_id: str
+
+
+class TriggerIndex:
+    """통화별 예정 거래의 발동 환율 정렬 인덱스
+
+    매도예정은 환율이 올라서, 손절예정/매수예정은 환율이 내려서 예정 환율에 닿으면 발동합니다.
+    직전 환율과 현재 환율 사이 구간만 이진 탐색하므로 예정 거래가 많아도 O(log n + k)입니다.
+    예정 거래의 환율은 바뀔 수 있으므로 넣을 때의 값을 기억해 두고 그 값으로 뺍니다.
+    """
+    DIRECTIONS = {'매도예정': 'up', '손절예정': 'down', '매수예정': 'down'}
+
+    def __init__(self, trades: Iterable[Trade] = ()):
+        self.rebuild(trades)
+
+    def rebuild(self, trades: Iterable[Trade]):
+        # (통화, 방향) -> 환율 순으로 정렬된 (환율, 거래 ID)
+        self._levels: Dict[Tuple[str, str], SortedKeyList] = {}
+        self._entries: Dict[str, Tuple[Tuple[str, str], Tuple[float, str]]] = {}
+        for trade in trades:
+            self.add(trade)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, trade: Trade):
+        direction = self.DIRECTIONS.get(trade.type)
+        if direction is None:
+            return
+        key = (trade.currency, direction)
+        entry = (trade.rate, trade.id)
+        levels = self._levels.get(key)
+        if levels is None:
+            levels = self._levels[key] = SortedKeyList(key=operator.itemgetter(0))
+        levels.add(entry)
+        self._entries[trade.id] = (key, entry)
+
+    def remove(self, trade: Trade):
+        found = self._entries.pop(trade.id, None)
+        if found is not None:
+            key, entry = found
+            self._levels[key].discard(entry)
+
+    def update(self, trade: Trade):
+        """환율이 바뀐 예정 거래의 위치를 다시 잡습니다."""
+        self.remove(trade)
+        self.add(trade)
+
+    def crossed(self, currency: str, previous: float, current: float) -> List[str]:
+        """환율이 previous에서 current로 움직이며 지나간 예정 거래 ID (가까운 환율부터)"""
+        if current > previous:
+            levels = self._levels.get((currency, 'up'))
+            if not levels:
+                return []
+            return [trade_id for _, trade_id in levels.irange_key(previous, current, inclusive=(False, True))]
+        if current < previous:
+            levels = self._levels.get((currency, 'down'))
+            if not levels:
+                return []
+            return [trade_id for _, trade_id in levels.irange_key(current, previous, inclusive=(True, False),
+                                                                  reverse=True)]
+        return []
+
+
+def _natural_id_key(trade_id: str) -> tuple:
+    """ID의 숫자 부분을 숫자로 비교하는 정렬 키 ('매수9' < '매수10')"""
+    return tuple(int(part) if i % 2 else part for i, part in enumerate(re.split(r'(\d+)', trade_id)))
+
+
+def encode_cursor(trade: Trade) -> str:
+    """거래 목록 페이지의 다음 위치를 가리키는 커서 (마지막 거래의 날짜와 ID)"""
+    payload = json.dumps([trade.date, trade.id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, trade_id = json.loads(payload.decode('utf-8'))
+    except (ValueError, TypeError):
+        raise ValueError(f"잘못된 커서입니다: {cursor}")
+    if not isinstance(date, str) or not isinstance(trade_id, str):
+        raise ValueError(f"잘못된 커서입니다: {cursor}")
+    return date, trade_id
+
+
+class TradeTimeline:
+    """(통화, 유형)별로 거래를 (날짜, ID) 순으로 정렬해 두는 인덱스 (커서 기반 페이지 조회용)
+
+    한 페이지는 그룹마다 커서 위치부터 이진 탐색한 뒤 필요한 만큼만 병합하므로
+    전체 거래 수와 관계없이 O(log n + 페이지 크기)입니다.
+    거래 날짜는 수정될 수 있으므로 넣을 때의 키를 기억해 두고 그 키로 뺍니다.
+    """
+    def __init__(self, trades: Iterable[Trade] = ()):
+        self.rebuild(trades)
+
+    @staticmethod
+    def sort_key(date: str, trade_id: str) -> tuple:
+        return (date, _natural_id_key(trade_id), trade_id)
+
+    def rebuild(self, trades: Iterable[Trade]):
+        self._groups: Dict[Tuple[str, str], SortedList] = {}
+        self._entries: Dict[str, Tuple[Tuple[str, str], tuple]] = {}
+        for trade in trades:
+            self.add(trade)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, trade: Trade):
+        group_key = (trade.currency, trade.type)
+        entry = self.sort_key(trade.date, trade.id)
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._groups[group_key] = SortedList()
+        group.add(entry)
+        self._entries[trade.id] = (group_key, entry)
+
+    def remove(self, trade: Trade):
+        found = self._entries.pop(trade.id, None)
+        if found is not None:
+            group_key, entry = found
+            self._groups[group_key].discard(entry)
+
+    def update(self, trade: Trade):
+        """날짜가 바뀐 거래의 위치를 다시 잡습니다."""
+        found = self._entries.get(trade.id)
+        if found is None or found[1][0] != trade.date:
+            self.remove(trade)
+            self.add(trade)
+
+    def page(self, types: Iterable[str], currency: Optional[str] = None,
+             after: Optional[Tuple[str, str]] = None, limit: int = 50) -> List[str]:
+        """최신 날짜부터 거래 ID를 최대 limit개 반환합니다. after가 있으면 그 (날짜, ID) 다음부터"""
+        types = set(types)
+        maximum = self.sort_key(*after) if after else None
+        ranges = [group.irange(maximum=maximum, inclusive=(True, False), reverse=True)
+                  for (group_currency, group_type), group in self._groups.items()
+                  if group_type in types and (currency is None or group_currency == currency)]
+        return [entry[2] for entry in itertools.islice(heapq.merge(*ranges, reverse=True), limit)]
+
+
+@dataclass
+class CurrencyAggregate:
+    """통화별 누적 집계 (거래 추가/수정/삭제 시 O(1)로 갱신)"""
+    realized_profit: float = 0.0  # 실현 손익 (매도/손절)
+    buy_krw: float = 0.0          # 총 매수 원화금액
+    buy_foreign: float = 0.0      # 총 매수 외화금액
+    sold_foreign: float = 0.0     # 총 매도/손절 외화금액
+    buy_count: int = 0
+
+    @property
+    def avg_rate(self) -> float:
+        """매수 평균 단가"""
+        return self.buy_krw / self.buy_foreign if self.buy_count and self.buy_foreign else 0
+
+    def apply(self, trade: Trade, sign: int):
+        """거래의 기여분을 더하거나(sign=1) 뺍니다(sign=-1)."""
+        if trade.type == '매수':
+            self.buy_krw += sign * trade.krw_amount
+            self.buy_foreign += sign * trade.foreign_amount
+            self.buy_count += sign
+        elif trade.type in ['매도', '손절']:
+            self.realized_profit += sign * trade.profit
+            self.sold_foreign += sign * trade.foreign_amount
+
+    def rounded(self) -> 'CurrencyAggregate':
+        # 더하고 빼기를 반복하며 생기는 부동소수점 오차 제거 (금액은 소수 4자리 이하)
+        return CurrencyAggregate(
+            realized_profit=round(self.realized_profit, 6),
+            buy_krw=round(self.buy_krw, 6),
+            buy_foreign=round(self.buy_foreign, 6),
+            sold_foreign=round(self.sold_foreign, 6),
+            buy_count=self.buy_count
+        )
+
+
+def _reads(method):
+    """거래 상태를 읽는 메서드: 읽기 잠금 안에서 실행 (다른 읽기와 동시에 실행 가능)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read_locked():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writes(method):
+    """거래 상태를 바꾸는 메서드: 프로세스 내 쓰기 잠금과 저장소 파일 잠금 안에서 실행
+
+    실행 전에 다른 프로세스가 저장한 변경 사항을 먼저 반영합니다. 버전 증가와 변경 알림은
+    메서드가 정상적으로 끝났을 때만 합니다. (예외로 끝나 저장한 것이 있으면 다음 sync에서 반영)
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write_locked():
+            if self._in_mutation:
+                return method(self, *args, **kwargs)
+            with self.storage.write_lock():
+                self._in_mutation = True
+                try:
+                    self._sync_locked()
+                    result = method(self, *args, **kwargs)
+                finally:
+                    self._in_mutation = False
+                self._generation = self._generation_token()
+                self.version += 1
+                self._notify_changed()
+                return result
+    return wrapper
+
+
 class TradingSystem:
-    def __init__(self, file_path: str = 'trades.json', settings_path: str = 'settings.json'):
+    def __init__(self, file_path: str = 'trades.json', settings_path: str = 'settings.json',
+                 rate_cache_ttl: float = 10.0, rate_poll_interval: float = 10.0,
+                 storage: Union[str, TradeStorage] = 'json', debug_aggregates: bool = False,
+                 start_rate_monitoring: bool = True, shared_rates_path: Optional[str] = None,
+                 tick_history_dir: Optional[str] = None, rate_monitor: Optional[RateMonitor] = None):
         self.file_path = file_path
         self.settings_path = settings_path
+        # 거래 저장소: 'json'(기존 방식), 'journal'(추가 전용 저널) 또는 TradeStorage 인스턴스
+        self.storage = create_storage(storage, file_path) if isinstance(storage, str) else storage
         self.trades: List[Trade] = []
+        self.index = TradeIndex()
+        self.triggers = TriggerIndex()
+        self.timeline = TradeTimeline()
+        self.aggregates: Dict[str, CurrencyAggregate] = {}
+        # True이면 변경마다 누적 집계를 전체 재계산 결과와 비교
+        self.debug_aggregates = debug_aggregates
         self.settings: Dict[str, CurrencySettings] = {}
-        self.rate_monitor = RateMonitor()
+        # 프로세스 내 동시성: 읽기는 병렬, 쓰기는 직렬
+        self._lock = ReadWriteLock()
+        self._in_mutation = False
+        # (저장소 세대 값, 설정 세대 값) (다른 프로세스의 변경 감지용)과 거래 목록 버전 (변경마다 증가)
+        self._generation = None
+        self.version = 0
+        self._change_listeners: List[Callable[[int], None]] = []
+        self._trigger_listeners: List[Callable[[List[TriggerEvent]], None]] = []
+        # run_batch 실행 중 모아 둔 변경 (거래 ID -> 거래, 삭제할 거래 ID)
+        self._batch: Optional[Tuple[Dict[str, Trade], Dict[str, None]]] = None
+        self._last_tick_rates: Dict[str, float] = {}  # 통화별 직전 환율 (발동 구간 계산용)
+        # rate_monitor를 넘기면 그대로 사용 (벤치마크/부하 테스트의 오프라인 스텁 등)
+        self.rate_monitor = rate_monitor or RateMonitor(cache_ttl=rate_cache_ttl)
         self.load_trades()
         self.load_settings()
-        
-        # 환율 모니터링 스레드 시작
-        self.monitor_thread = threading.Thread(target=self._start_rate_monitoring, daemon=True)
-        self.monitor_thread.start()
-    
-    def _start_rate_monitoring(self):
-        """백그라운드에서 환율 모니터링을 시작합니다."""
+        # 기본 설정을 새로 저장했으면 설정 세대 값이 바뀌었으므로 다시 기록 (첫 변경에서 다시 읽지 않도록)
+        self._generation = self._generation_token()
+
+        # 환율 폴러: 설정된 모든 통화의 환율을 유일하게 가져오는 곳
+        self.rate_poller = RatePoller(self.rate_monitor, currencies=self.settings.keys(),
+                                      interval=rate_poll_interval)
+        if shared_rates_path:
+            # 여러 워커 프로세스가 하나의 조회 담당 프로세스가 발행한 스냅샷을 공유
+            from rate_share import SharedRatePoller
+            self.rate_poller = SharedRatePoller(self.rate_poller, shared_rates_path)
+        self.rate_poller.add_listener(self._check_rates)
+        # 조회한 환율을 틱 기록과 OHLC 봉으로 남김 (NumPy 필요)
+        self.tick_history = None
+        if tick_history_dir:
+            from tick_history import TickHistory
+            self.tick_history = TickHistory(tick_history_dir)
+            self.rate_poller.add_listener(self.tick_history.record)
+        if start_rate_monitoring:
+            self.start_rate_monitoring()
+
+    def start_rate_monitoring(self):
+        """백그라운드에서 환율 모니터링을 시작합니다. (이미 실행 중이면 아무것도 하지 않음)"""
         self.rate_monitor.threshold = 0.1  # 환율 변동 감지 기준 설정
-        import schedule
-        import time
-        
-        schedule.every(1).minutes.do(self._check_rates)
-        
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
-    
-    def _check_rates(self):
-        """환율을 체크하고 필요한 작업을 수행합니다."""
-        for currency in ['USD', 'JPY']:
-            current_rate = self.rate_monitor.get_current_rate(currency)
-            if current_rate is not None:
-                # 여기에 환율 변동에 따른 추가 로직 구현 가능
-                # 예: 손절가 도달 시 알림, 목표가 도달 시 알림 등
-                pass
+        self.rate_poller.start()
+
+    def _check_rates(self, snapshot: RateSnapshot):
+        """새 환율 스냅샷을 받아 직전 환율 이후 도달한 예정 거래(목표가, 손절가 등)를 알립니다."""
+        events = []
+        for currency in self.settings:
+            current_rate = snapshot.get(currency)
+            if current_rate is None:
+                continue
+            previous = self._last_tick_rates.get(currency)
+            self._last_tick_rates[currency] = current_rate.current_rate
+            # 첫 환율은 기준값으로만 사용
+            if previous is None or previous == current_rate.current_rate:
+                continue
+            triggered = self.find_triggered(currency, previous, current_rate.current_rate)
+            if triggered:
+                print(f"{currency} 예정 거래 {len(triggered)}건 도달 ({previous:,.2f} → {current_rate.current_rate:,.2f}원)")
+                events.extend(triggered)
+
+        if events:
+            for listener in list(self._trigger_listeners):
+                try:
+                    listener(events)
+                except Exception as e:
+                    print(f"예정 거래 도달 처리 중 오류: {str(e)}")
+
+    def add_trigger_listener(self, callback: Callable[[List[TriggerEvent]], None]):
+        """환율 틱마다 도달한 예정 거래 목록(TriggerEvent)을 받을 함수를 등록합니다."""
+        self._trigger_listeners.append(callback)
+
+    @_reads
+    def find_triggered(self, currency: str, previous: float, current: float) -> List[TriggerEvent]:
+        """환율이 previous에서 current로 움직이는 동안 도달한 예정 거래를 찾습니다."""
+        events = []
+        for trade_id in self.triggers.crossed(currency, previous, current):
+            trade = self.index.get(trade_id)
+            events.append(TriggerEvent(
+                trade_id=trade.id,
+                trade_type=trade.type,
+                currency=trade.currency,
+                trigger_rate=trade.rate,
+                market_rate=current,
+                related_id=trade.related_id
+            ))
+        return events
+
+    def get_rate_snapshot(self) -> RateSnapshot:
+        """가장 최근의 환율 스냅샷을 반환합니다."""
+        return self.rate_poller.snapshot
+
+    def get_current_rate(self, currency: str) -> Optional[RateData]:
+        """최근 스냅샷의 통화 환율을 반환합니다. (외부 요청 없음)"""
+        return self.rate_poller.snapshot.get(currency)
 
     def load_trades(self):
-        try:
-            with open(self.file_path, 'r') as f:
-                data = json.load(f)
-                self.trades = []
-                for trade in data:
-                    # 이전 데이터 구조를 새 구조로 변환
-                    if 'usd_amount' in trade:
-                        trade['foreign_amount'] = trade.pop('usd_amount')
-                    if 'currency' not in trade:
-                        trade['currency'] = 'USD'  # 기존 데이터는 모두 USD로 처리
-                    self.trades.append(Trade(**trade))
-        except FileNotFoundError:
-            self.trades = []
+        with self._lock.write_locked(), self.storage.write_lock():
+            self._load_trades_locked()
+            self._generation = self._generation_token()
+            self.version += 1
+
+    def _load_trades_locked(self):
+        # 이전 데이터 구조(usd_amount, currency 없음)는 저장소에서 새 구조로 변환됨
+        self.trades = [Trade(**record) for record in self.storage.load()]
+        self.index.rebuild(self.trades)
+        self.triggers.rebuild(self.trades)
+        self.timeline.rebuild(self.trades)
+        self.aggregates = self._recompute_aggregates()
+        self._seed_id_sequences()
 
+    @_writes
     def save_trades(self):
-        with open(self.file_path, 'w') as f:
-            json.dump([trade.to_dict() for trade in self.trades], f, indent=2)
+        """전체 거래를 저장소에 다시 씁니다. (저널 저장소에서는 스냅샷으로 합치기)"""
+        start = time.perf_counter()
+        self.storage.save_all([trade.to_dict() for trade in self.trades])
+        metrics.STORAGE_WRITE_SECONDS.labels(self.storage.name, 'save_all').observe(time.perf_counter() - start)
 
-    def load_settings(self):
-        """설정 파일 로드"""
+    @_writes
+    def restate_realized_profit(self) -> int:
+        """매도/손절 거래의 실현 손익을 매수 원가 기준으로 다시 계산해 저장합니다. 바꾼 거래 수를 반환합니다.
+
+        이전 버전은 매도 손익을 매도 금액 - 매수 금액 × 비율(거의 0)로, 손절은 매수 수량 전체의
+        손실을 양수로 기록했습니다. 손절은 그보다 먼저 매도/손절한 수량을 뺀 나머지로 고칩니다.
+        한 번만 실행하면 되는 마이그레이션이며 migrate_storage.py --restate-profit으로 실행합니다.
+        이미 고친 거래는 다시 계산해도 같은 값이므로 여러 번 실행해도 결과는 같습니다.
+        """
+        changed = []
+        for buy_trade in self.index.select(['매수']):
+            sold_foreign = 0.0
+            children = sorted(self.index.children(buy_trade.id), key=lambda t: self.index._order[t.id])
+            for trade in children:
+                if trade.type == '매도':
+                    values = {'profit': realized_profit(buy_trade, trade.krw_amount, trade.foreign_amount)}
+                elif trade.type == '손절':
+                    foreign_amount, krw_amount, profit = stop_loss_amounts(buy_trade, trade.rate, sold_foreign)
+                    values = {'foreign_amount': foreign_amount, 'krw_amount': krw_amount, 'profit': profit}
+                else:
+                    continue
+                if any(getattr(trade, name) != value for name, value in values.items()):
+                    aggregate = self._get_aggregate(trade.currency)
+                    aggregate.apply(trade, -1)
+                    for name, value in values.items():
+                        setattr(trade, name, value)
+                    aggregate.apply(trade, 1)
+                    changed.append(trade)
+                sold_foreign += trade.foreign_amount
+        if changed:
+            self._commit(upserts=changed)
+        return len(changed)
+
+    def _generation_token(self):
+        """(거래 저장소 세대 값, 설정 세대 값). 설정을 보관하지 않는 저장소는 설정 파일 정보를 사용합니다."""
+        settings_generation = self.storage.settings_generation()
+        if settings_generation is None:
+            settings_generation = file_stat_token(self.settings_path)
+        return self.storage.generation(), settings_generation
+
+    def sync(self) -> bool:
+        """다른 프로세스가 저장한 거래/설정 변경 사항이 있으면 반영합니다. 반영했으면 True를 반환합니다."""
+        if self._generation_token() == self._generation:
+            return False
+        with self._lock.write_locked(), self.storage.write_lock():
+            return self._sync_locked()
+
+    def _sync_locked(self) -> bool:
+        generation = self._generation_token()
+        if generation == self._generation:
+            return False
+
+        previous_trades, previous_settings = self._generation or (None, None)
+        if generation[0] != previous_trades:
+            changes = self.storage.changes_since(previous_trades)
+            if changes is None:
+                self._load_trades_locked()
+            else:
+                self._apply_changes(changes)
+        if generation[1] != previous_settings:
+            self.load_settings()
+            for currency, settings in self.settings.items():
+                self.rate_monitor.buy_drop_thresholds[currency] = settings.buy_drop_threshold
+        self._generation = generation
+        self.version += 1
+        self._notify_changed()
+        return True
+
+    def add_change_listener(self, callback: Callable[[int], None]):
+        """거래 목록이 바뀔 때마다 (다른 프로세스의 변경 반영 포함) 새 버전으로 호출될 함수를 등록합니다.
+
+        잠금을 가진 채로 호출되므로 콜백은 이벤트 설정처럼 짧은 작업만 해야 합니다.
+        """
+        self._change_listeners.append(callback)
+
+    def _notify_changed(self):
+        for listener in list(self._change_listeners):
+            try:
+                listener(self.version)
+            except Exception as e:
+                print(f"거래 변경 알림 처리 중 오류: {str(e)}")
+
+    def _apply_changes(self, changes):
+        """다른 프로세스의 변경 내역(저장소 레코드)을 거래 목록, 인덱스, 집계에 반영합니다."""
+        deleted = []
+        for op, value in changes:
+            if op == 'del':
+                trade = self.index.get(value)
+                if trade is not None:
+                    self._untrack(trade)
+                    deleted.append(trade)
+                continue
+
+            new_trade = Trade(**value)
+            trade = self.index.get(new_trade.id)
+            if trade is None:
+                self.trades.append(new_trade)
+                self._track(new_trade)
+            else:
+                # id/유형/통화/연관ID는 바뀌지 않으므로 값만 덮어씀
+                self._get_aggregate(trade.currency).apply(trade, -1)
+                for field in fields(Trade):
+                    setattr(trade, field.name, getattr(new_trade, field.name))
+                self._get_aggregate(trade.currency).apply(trade, 1)
+                self.triggers.update(trade)
+                self.timeline.update(trade)
+
+        if deleted:
+            # 삭제 후 다시 추가된 거래는 목록에 남김
+            removed_ids = {t.id for t in deleted}
+            self.trades = [t for t in self.trades if t.id not in removed_ids or self.index.get(t.id) is t]
+
+    # 순번이 붙는 거래 ID (매수1, 매도3, 손절2 ...). 예정 거래 ID는 매수 번호에서 파생됨
+    SEQUENCED_ID_PATTERN = re.compile(r'^(매수|매도|손절)(\d+)$')
+
+    def _seed_id_sequences(self):
+        """저장된 거래의 최대 번호 이상에서 ID 순번이 시작되도록 맞춥니다."""
+        floors = {'매수': 0, '매도': 0, '손절': 0}
+        for trade in self.trades:
+            match = self.SEQUENCED_ID_PATTERN.match(trade.id)
+            if match:
+                floors[match.group(1)] = max(floors[match.group(1)], int(match.group(2)))
+        self.storage.ensure_sequences(floors)
+
+    def _next_trade_id(self, trade_type: str) -> str:
+        """거래 유형별로 재사용되지 않는 새 ID를 발급합니다."""
+        return f"{trade_type}{self.storage.next_sequence(trade_type)}"
+
+    def _track(self, trade: Trade):
+        """새 거래를 인덱스와 누적 집계에 반영합니다."""
+        self.index.add(trade)
+        self.triggers.add(trade)
+        self.timeline.add(trade)
+        self._get_aggregate(trade.currency).apply(trade, 1)
+
+    def _untrack(self, trade: Trade):
+        self.index.remove(trade)
+        self.triggers.remove(trade)
+        self.timeline.remove(trade)
+        self._get_aggregate(trade.currency).apply(trade, -1)
+
+    def _get_aggregate(self, currency: str) -> CurrencyAggregate:
+        aggregate = self.aggregates.get(currency)
+        if aggregate is None:
+            aggregate = self.aggregates[currency] = CurrencyAggregate()
+        return aggregate
+
+    def _recompute_aggregates(self) -> Dict[str, CurrencyAggregate]:
+        """전체 거래를 훑어 통화별 집계를 새로 계산합니다."""
+        aggregates: Dict[str, CurrencyAggregate] = {}
+        for trade in self.trades:
+            aggregates.setdefault(trade.currency, CurrencyAggregate()).apply(trade, 1)
+        return aggregates
+
+    def verify_aggregates(self):
+        """누적 집계가 전체 재계산 결과와 같은지 확인합니다."""
+        expected = self._recompute_aggregates()
+
+        for currency in set(expected) | set(self.aggregates):
+            actual = self._get_aggregate(currency).rounded()
+            wanted = expected.get(currency, CurrencyAggregate()).rounded()
+            if actual != wanted:
+                raise RuntimeError(f"{currency} 누적 집계 불일치: {actual} != {wanted}")
+
+        planned = sum(1 for t in self.trades if t.type in TriggerIndex.DIRECTIONS)
+        if len(self.triggers) != planned:
+            raise RuntimeError(f"예정 거래 발동 인덱스 불일치: {len(self.triggers)} != {planned}")
+        if len(self.timeline) != len(self.index.by_id):
+            raise RuntimeError(f"날짜 인덱스 불일치: {len(self.timeline)} != {len(self.index.by_id)}")
+
+    def _commit(self, upserts: Iterable[Trade] = (), deletes: Iterable[str] = ()):
+        """변경된 거래만 저장소에 반영합니다. (run_batch 안에서는 모아 두었다가 한 번에 반영)"""
+        if self._batch is not None:
+            pending_upserts, pending_deletes = self._batch
+            for trade in upserts:
+                pending_deletes.pop(trade.id, None)
+                pending_upserts[trade.id] = trade
+            for trade_id in deletes:
+                pending_upserts.pop(trade_id, None)
+                pending_deletes[trade_id] = None
+            return
+
+        start = time.perf_counter()
+        self.storage.commit(lambda: [trade.to_dict() for trade in self.trades],
+                            upserts=[trade.to_dict() for trade in upserts], deletes=list(deletes))
+        metrics.STORAGE_WRITE_SECONDS.labels(self.storage.name, 'commit').observe(time.perf_counter() - start)
+        if self.debug_aggregates:
+            self.verify_aggregates()
+
+    @_writes
+    def run_batch(self, func: Callable[[], object]):
+        """func 안에서 일어난 모든 거래 변경을 저장소에 한 번만 반영합니다.
+
+        func는 쓰기 잠금 안에서 실행되며 create_sell_order 등 일반 메서드를 그대로 호출할 수 있습니다.
+        중간에 예외가 나도 그때까지 메모리에 반영된 변경은 저장합니다.
+        """
+        if self._batch is not None:
+            return func()
+        self._batch = ({}, {})
         try:
-            with open(self.settings_path, 'r') as f:
-                data = json.load(f)
-                self.settings = {
-                    currency: CurrencySettings.from_dict(settings)
-                    for currency, settings in data.items()
-                }
-        except FileNotFoundError:
+            return func()
+        finally:
+            upserts, deletes = self._batch
+            self._batch = None
+            if deletes:
+                # 인덱스에 남아 있는 거래만 남김 (삭제 후 같은 ID로 다시 만든 거래는 유지)
+                self.trades = [t for t in self.trades if self.index.get(t.id) is t]
+            if upserts or deletes:
+                self._commit(upserts=upserts.values(), deletes=deletes)
+
+    def load_settings(self):
+        """설정 로드 (설정을 보관하는 저장소가 비어 있으면 설정 파일에서 읽음)"""
+        data = self.storage.load_settings()
+        if data is None:
+            try:
+                with open(self.settings_path, 'r') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                data = None
+
+        if data is not None:
+            self.settings = {
+                currency: CurrencySettings.from_dict(settings)
+                for currency, settings in data.items()
+            }
+        else:
             # 기본 설정 생성
             self.settings = {
                 'USD': CurrencySettings(
@@ -161,13 +910,16 @@ class TradingSystem:
             self.save_settings()
 
     def save_settings(self):
-        """설정 파일 저장"""
-        with open(self.settings_path, 'w') as f:
-            json.dump({
-                currency: settings.to_dict()
-                for currency, settings in self.settings.items()
-            }, f, indent=2)
+        """설정 저장 (설정을 보관하지 않는 저장소는 설정 파일에 저장)"""
+        data = {
+            currency: settings.to_dict()
+            for currency, settings in self.settings.items()
+        }
+        if not self.storage.save_settings(data):
+            # 다른 프로세스가 쓰는 도중의 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+            write_json_atomic(self.settings_path, data, fsync=False)
 
+    @_writes
     def update_currency_settings(self, currency: str, rate_increments: List[int], stop_loss_gap: int, 
                                 default_amount: int, buy_drop_threshold: int, planned_buy_rate: float):
         """통화별 설정을 업데이트합니다."""
@@ -187,9 +939,10 @@ class TradingSystem:
         """통화별 설정 조회"""
         return self.settings.get(currency)
 
+    @_writes
     def create_buy_order(self, krw_amount: float, rate: float, currency: str, date: str = None, note: str = "") -> Trade:
         # 매수 ID 생성
-        buy_id = f"매수{len([t for t in self.trades if t.type == '매수']) + 1}"
+        buy_id = self._next_trade_id('매수')
         
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
@@ -199,86 +952,19 @@ class TradingSystem:
         if not settings:
             raise ValueError(f"지원하지 않는 통화입니다: {currency}")
         
-        # 매수 주문 생성
-        buy_trade = Trade(
-            id=buy_id,
-            date=date,
-            type="매수",
-            currency=currency,
-            rate=rate,
-            krw_amount=round(krw_amount, 2),
-            foreign_amount=round(krw_amount / rate, 4 if currency == "JPY" else 2),
-            profit=0,
-            note=note,
-            related_id=""
-        )
-        
-        # 매도예정 주문 생성 (30%, 30%, 40% 분할)
-        sell_ratios = [0.3, 0.3, 0.4]
-        sell_planned_trades = []
-        
-        for i, (ratio, rate_inc) in enumerate(zip(sell_ratios, settings.rate_increments), 1):
-            sell_amount = round(krw_amount * ratio, 2)
-            sell_rate = rate + rate_inc
-            foreign_amount = round(sell_amount / sell_rate, 4 if currency == "JPY" else 2)
-            buy_amount = round(foreign_amount * rate, 2)
-            expected_profit = round(sell_amount - buy_amount, 2)
-            
-            sell_planned = Trade(
-                id=f"매도예정{buy_id[2:]}-{i}",
-                date=date,
-                type="매도예정",
-                currency=currency,
-                rate=sell_rate,
-                krw_amount=sell_amount,
-                foreign_amount=foreign_amount,
-                profit=expected_profit,
-                note=f"자동생성 (분할 {i}/3, +{rate_inc}{'원'})",
-                related_id=buy_id
-            )
-            sell_planned_trades.append(sell_planned)
-        
-        # 손절예정 주문 생성
-        stop_loss_rate = rate - settings.stop_loss_gap
-        stop_loss_amount = krw_amount
-        foreign_amount = round(stop_loss_amount / stop_loss_rate, 4 if currency == "JPY" else 2)
-        expected_loss = round((stop_loss_amount * (stop_loss_rate / rate)) - stop_loss_amount, 2)
-        
-        stop_loss = Trade(
-            id=f"손절예정{buy_id[2:]}",
-            date=date,
-            type="손절예정",
-            currency=currency,
-            rate=stop_loss_rate,
-            krw_amount=stop_loss_amount,
-            foreign_amount=foreign_amount,
-            profit=expected_loss,
-            note=f"자동생성 (-{settings.stop_loss_gap}{'엔' if currency == 'JPY' else '원'})",
-            related_id=buy_id
-        )
-        
-        # 다음 매수예정 주문 생성
-        next_buy_rate = rate - settings.buy_drop_threshold
-        next_buy = Trade(
-            id=f"매수예정{buy_id[2:]}",
-            date=date,
-            type="매수예정",
-            currency=currency,
-            rate=next_buy_rate,
-            krw_amount=settings.default_amount,
-            foreign_amount=round(settings.default_amount / next_buy_rate, 4 if currency == "JPY" else 2),
-            profit=0,
-            note=f"자동생성 (-{settings.buy_drop_threshold}{'엔' if currency == 'JPY' else '원'})",
-            related_id=buy_id
-        )
-        
-        self.trades.extend([buy_trade] + sell_planned_trades + [stop_loss, next_buy])
-        self.save_trades()
+        # 매수 주문과 예정 주문(매도예정 30/30/40%, 손절예정, 다음 매수예정) 생성
+        buy_trade = build_buy_trade(buy_id, date, currency, rate, krw_amount, note)
+        new_trades = [buy_trade] + build_planned_trades(buy_trade, krw_amount, settings)
+        self.trades.extend(new_trades)
+        for trade in new_trades:
+            self._track(trade)
+        self._commit(upserts=new_trades)
         return buy_trade
 
+    @_writes
     def create_sell_order(self, buy_id: str, rate: float, ratio: float, date: str = None, note: str = "") -> Trade:
         # 매수 주문 찾기
-        buy_trade = next((t for t in self.trades if t.id == buy_id), None)
+        buy_trade = self.index.get(buy_id)
         if not buy_trade:
             raise ValueError(f"매수 주문을 찾을 수 없습니다: {buy_id}")
         
@@ -286,70 +972,103 @@ class TradingSystem:
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
         
-        # 매도 금액 계산
-        sell_krw = round(buy_trade.krw_amount * ratio, 2)
-        sell_usd = round(sell_krw / rate, 2)
-        profit = round(sell_krw - (buy_trade.krw_amount * ratio), 2)
-        
-        sell_trade = Trade(
-            id=f"매도{len([t for t in self.trades if t.type == '매도']) + 1}",
-            date=date,
-            type="매도",
-            rate=rate,
-            krw_amount=sell_krw,
-            foreign_amount=sell_usd,
-            profit=profit,
-            note=note,
-            related_id=buy_id
-        )
+        sell_trade = build_sell_trade(self._next_trade_id('매도'), buy_trade, rate, ratio, date, note)
         
         self.trades.append(sell_trade)
-        self.save_trades()
+        self._track(sell_trade)
+        self._commit(upserts=[sell_trade])
         return sell_trade
 
+    @_writes
     def create_stop_loss(self, buy_id: str, rate: float, note: str = "") -> Trade:
-        buy_trade = next((t for t in self.trades if t.id == buy_id), None)
+        """매수 거래의 남은 외화 전부를 손절합니다."""
+        buy_trade = self.index.get(buy_id)
         if not buy_trade:
             raise ValueError(f"매수 주문을 찾을 수 없습니다: {buy_id}")
         
-        loss = round(buy_trade.krw_amount - (buy_trade.foreign_amount * rate), 2)
-        
-        stop_loss_trade = Trade(
-            id=f"손절{len([t for t in self.trades if t.type == '손절']) + 1}",
-            date=datetime.now().strftime("%Y-%m-%d"),
-            type="손절",
-            rate=rate,
-            krw_amount=buy_trade.krw_amount,
-            foreign_amount=buy_trade.foreign_amount,
-            profit=loss,
-            note=note,
-            related_id=buy_id
-        )
+        # 이미 매도/손절한 수량은 제외
+        sold_foreign = sum(t.foreign_amount for t in self.index.children(buy_id) if t.type in ('매도', '손절'))
+        stop_loss_trade = build_stop_loss_trade(self._next_trade_id('손절'), buy_trade, rate, sold_foreign,
+                                                datetime.now().strftime("%Y-%m-%d"), note)
         
         self.trades.append(stop_loss_trade)
-        self.save_trades()
+        self._track(stop_loss_trade)
+        self._commit(upserts=[stop_loss_trade])
         return stop_loss_trade 
 
+    @_reads
     def get_all_trades(self) -> List[Trade]:
-        return self.trades
+        return list(self.trades)
+
+    @_reads
+    def get_trade(self, trade_id: str) -> Optional[Trade]:
+        """id로 거래를 찾습니다."""
+        return self.index.get(trade_id)
 
+    @_reads
+    def get_trades_by_type(self, types: Iterable[str], currency: Optional[str] = None) -> List[Trade]:
+        """지정한 유형의 거래를 거래 목록 순서대로 반환합니다."""
+        return self.index.select(types, currency)
+
+    @_reads
     def get_related_trades(self, buy_id: str) -> List[Trade]:
-        return [t for t in self.trades if t.related_id == buy_id or t.id == buy_id]
+        buy_trade = self.index.get(buy_id)
+        return ([buy_trade] if buy_trade else []) + self.index.children(buy_id)
 
+    @_reads
     def get_planned_trades(self) -> List[Trade]:
-        return [t for t in self.trades if t.type in ['매도예정', '손절예정']]
+        return self.index.select(['매도예정', '손절예정'])
+
+    @_reads
+    def get_trades_page(self, types: Iterable[str], currency: Optional[str] = None,
+                        related_id: Optional[str] = None, cursor: Optional[str] = None,
+                        limit: int = 50) -> Tuple[List[Trade], Optional[str]]:
+        """지정한 유형의 거래를 최신 날짜부터 한 페이지씩 반환합니다.
 
+        (거래 목록, 다음 페이지 커서)를 반환하며 마지막 페이지이면 커서는 None입니다.
+        related_id를 주면 그 매수 거래와 연관 거래 중에서만 찾습니다.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        if related_id is None:
+            trade_ids = self.timeline.page(types, currency, after, limit + 1)
+            trades = [self.index.get(trade_id) for trade_id in trade_ids]
+        else:
+            # 한 매수의 연관 거래는 몇 건뿐이므로 모아서 정렬
+            types = set(types)
+            buy_trade = self.index.get(related_id)
+            related = ([buy_trade] if buy_trade else []) + self.index.children(related_id)
+            maximum = TradeTimeline.sort_key(*after) if after else None
+            trades = sorted((t for t in related if t.type in types and (currency is None or t.currency == currency)
+                             and (maximum is None or TradeTimeline.sort_key(t.date, t.id) < maximum)),
+                            key=lambda t: TradeTimeline.sort_key(t.date, t.id), reverse=True)[:limit + 1]
+        if len(trades) > limit:
+            return trades[:limit], encode_cursor(trades[limit - 1])
+        return trades, None
+
+    @_reads
+    def count_trades(self, types: Iterable[str], currency: Optional[str] = None) -> int:
+        """지정한 유형의 거래 수 (인덱스 그룹 크기의 합)"""
+        return sum(self.index.count(trade_type, currency) for trade_type in types)
+
+    @_reads
+    def count_trade_groups(self) -> Dict[Tuple[str, str], int]:
+        """(통화, 유형)별 거래 수"""
+        return {key: len(group) for key, group in self.index.by_currency_type.items() if group}
+
+    @_reads
     def calculate_total_profit(self) -> float:
-        return sum(t.profit for t in self.trades if t.type in ['매도', '손절']) 
+        return round(sum(aggregate.realized_profit for aggregate in self.aggregates.values()), 6)
 
+    @_reads
     def has_related_sells(self, buy_id: str) -> bool:
         """매수 거래와 연관된 매도 거래가 있는지 확인합니다."""
-        return any(t for t in self.trades if t.type == '매도' and t.related_id == buy_id)
+        return any(t.type == '매도' for t in self.index.children(buy_id))
 
+    @_writes
     def delete_trade(self, trade_id: str) -> None:
         """거래를 삭제합니다. 매수 거래인 경우 관련된 매도예정/손절예정 거래도 함께 삭제됩니다."""
         # 거래 찾기
-        trade = next((t for t in self.trades if t.id == trade_id), None)
+        trade = self.index.get(trade_id)
         if not trade:
             raise ValueError(f"거래를 찾을 수 없습니다: {trade_id}")
         
@@ -359,128 +1078,110 @@ class TradingSystem:
         
         # 매수 거래인 경우 관련된 모든 거래 삭제
         if trade.type == "매수":
-            self.trades = [t for t in self.trades if t.related_id != trade_id and t.id != trade_id]
+            deleted = [trade] + self.index.children(trade_id)
         else:
             # 매수가 아닌 경우 해당 거래만 삭제
-            self.trades = [t for t in self.trades if t.id != trade_id]
+            deleted = [trade]
+        self._remove_trades(deleted)
+        deleted_ids = [t.id for t in deleted]
         
-        self.save_trades() 
+        self._commit(deletes=deleted_ids)
 
+    def _remove_trades(self, trades: List[Trade]):
+        """거래 목록과 인덱스에서 거래들을 함께 제거합니다."""
+        removed_ids = {t.id for t in trades}
+        for trade in trades:
+            self._untrack(trade)
+        if self._batch is not None:
+            return  # 목록 정리는 run_batch가 끝날 때 한 번만
+        self.trades = [t for t in self.trades if t.id not in removed_ids]
+
+    @_writes
     def update_trade(self, trade_id: str, date: str, rate: float, krw_amount: float, note: str) -> Trade:
         # 거래 찾기
-        trade = next((t for t in self.trades if t.id == trade_id), None)
+        trade = self.index.get(trade_id)
         if not trade:
             raise ValueError(f"거래를 찾을 수 없습니다: {trade_id}")
         
+        # 실패해도 아무것도 바뀌지 않도록 거래를 고치기 전에 입력과 설정을 확인
+        foreign_amount = round(krw_amount / rate, 4 if trade.currency == "JPY" else 2)
+
         # 매수 거래인 경우
         if trade.type == "매수":
-            # 기존 예정 거래들 삭제
-            self.trades = [t for t in self.trades if t.related_id != trade_id]
-            
-            # 거래 업데이트
-            trade.date = date
-            trade.rate = rate
-            trade.krw_amount = round(krw_amount, 2)
-            trade.foreign_amount = round(krw_amount / rate, 4 if trade.currency == "JPY" else 2)
-            trade.note = note
-            
             # 통화별 설정 가져오기
             settings = self.get_currency_settings(trade.currency)
             if not settings:
                 raise ValueError(f"지원하지 않는 통화입니다: {trade.currency}")
+
+            # 매도예정/손절예정 주문을 수정 후 날짜/환율로 미리 생성
+            planned_trades = build_planned_trades(replace(trade, date=date, rate=rate), krw_amount, settings,
+                                                  include_next_buy=False)
+
+            # 기존 예정 거래들 삭제
+            deleted = self.index.children(trade_id)
+            self._remove_trades(deleted)
+            deleted_ids = [t.id for t in deleted]
             
-            # 매도예정 주문 생성 (30%, 30%, 40% 분할)
-            sell_ratios = [0.3, 0.3, 0.4]
-            sell_planned_trades = []
-            
-            for i, (ratio, rate_inc) in enumerate(zip(sell_ratios, settings.rate_increments), 1):
-                sell_amount = round(krw_amount * ratio, 2)
-                sell_rate = rate + rate_inc
-                foreign_amount = round(sell_amount / sell_rate, 4 if trade.currency == "JPY" else 2)
-                buy_amount = round(foreign_amount * rate, 2)
-                expected_profit = round(sell_amount - buy_amount, 2)
-                
-                sell_planned = Trade(
-                    id=f"매도예정{trade_id[2:]}-{i}",
-                    date=date,
-                    type="매도예정",
-                    currency=trade.currency,
-                    rate=sell_rate,
-                    krw_amount=sell_amount,
-                    foreign_amount=foreign_amount,
-                    profit=expected_profit,
-                    note=f"자동생성 (분할 {i}/3, +{rate_inc}{'엔' if trade.currency == 'JPY' else '원'})",
-                    related_id=trade_id
-                )
-                sell_planned_trades.append(sell_planned)
-            
-            # 손절예정 주문 생성
-            stop_loss_rate = rate - settings.stop_loss_gap
-            stop_loss_amount = krw_amount
-            foreign_amount = round(stop_loss_amount / stop_loss_rate, 4 if trade.currency == "JPY" else 2)
-            expected_loss = round((stop_loss_amount * (stop_loss_rate / rate)) - stop_loss_amount, 2)
-            
-            stop_loss = Trade(
-                id=f"손절예정{trade_id[2:]}",
-                date=date,
-                type="손절예정",
-                currency=trade.currency,
-                rate=stop_loss_rate,
-                krw_amount=stop_loss_amount,
-                foreign_amount=foreign_amount,
-                profit=expected_loss,
-                note=f"자동생성 (-{settings.stop_loss_gap}{'엔' if trade.currency == 'JPY' else '원'})",
-                related_id=trade_id
-            )
+            # 거래 업데이트 (수정 전 금액을 누적 집계에서 빼고 수정 후 다시 더함)
+            self._get_aggregate(trade.currency).apply(trade, -1)
+            trade.date = sys.intern(date)
+            trade.rate = rate
+            trade.krw_amount = round(krw_amount, 2)
+            trade.foreign_amount = foreign_amount
+            trade.note = note
+            self._get_aggregate(trade.currency).apply(trade, 1)
+            self.timeline.update(trade)
             
             # 모든 거래 추가
-            self.trades.extend(sell_planned_trades + [stop_loss])
+            self.trades.extend(planned_trades)
+            for planned in planned_trades:
+                self._track(planned)
+            self._commit(upserts=[trade] + planned_trades, deletes=deleted_ids)
         
         # 매도 거래인 경우
         elif trade.type == "매도":
             # 거래 업데이트
-            trade.date = date
+            self._get_aggregate(trade.currency).apply(trade, -1)
+            trade.date = sys.intern(date)
             trade.rate = rate
             trade.krw_amount = round(krw_amount, 2)
-            trade.foreign_amount = round(krw_amount / rate, 4 if trade.currency == "JPY" else 2)
+            trade.foreign_amount = foreign_amount
             trade.note = note
             
             # 수익 재계산
-            buy_trade = next((t for t in self.trades if t.id == trade.related_id), None)
+            buy_trade = self.index.get(trade.related_id)
             if buy_trade:
-                ratio = krw_amount / buy_trade.krw_amount
-                trade.profit = round(krw_amount - (buy_trade.krw_amount * ratio), 2)
-        
-        self.save_trades()
+                trade.profit = realized_profit(buy_trade, trade.krw_amount, trade.foreign_amount)
+            self._get_aggregate(trade.currency).apply(trade, 1)
+            self.timeline.update(trade)
+
+            self._commit(upserts=[trade])
+
         return trade 
 
+    @_reads
     def calculate_currency_profit(self, currency: str) -> float:
         """특정 통화의 실현 손익을 계산합니다."""
-        return sum(t.profit for t in self.trades if t.currency == currency and t.type in ['매도', '손절']) 
+        return self._get_aggregate(currency).rounded().realized_profit
 
+    @_reads
     def calculate_total_buy_amount(self, currency: str) -> float:
         """특정 통화의 총 매수금액을 계산합니다."""
-        return sum(t.krw_amount for t in self.trades if t.currency == currency and t.type == '매수') 
+        return self._get_aggregate(currency).rounded().buy_krw
 
+    @_reads
     def calculate_holding_amount(self, currency: str) -> dict:
         """특정 통화의 보유금액 정보를 계산합니다."""
-        # 매수 거래 합계
-        total_buy = sum(t.foreign_amount for t in self.trades 
-                       if t.currency == currency and t.type == '매수')
-        
-        # 매도/손절 거래 합계
-        total_sell = sum(t.foreign_amount for t in self.trades 
-                        if t.currency == currency and t.type in ['매도', '손절'])
+        return self._holding_amount_locked(currency)
+
+    def _holding_amount_locked(self, currency: str) -> dict:
+        aggregate = self._get_aggregate(currency).rounded()
         
-        # 보유 외화 수량
-        holding_amount = total_buy - total_sell
+        # 보유 외화 수량 (매수 합계 - 매도/손절 합계)
+        holding_amount = round(aggregate.buy_foreign - aggregate.sold_foreign, 6)
         
-        # 매수 평균 단가 계산
-        buy_trades = [t for t in self.trades if t.currency == currency and t.type == '매수']
-        if buy_trades:
-            avg_rate = sum(t.krw_amount for t in buy_trades) / sum(t.foreign_amount for t in buy_trades)
-        else:
-            avg_rate = 0
+        # 매수 평균 단가
+        avg_rate = aggregate.avg_rate
         
         # 보유 원화 금액 (매수 평균단가 기준)
         holding_krw = holding_amount * avg_rate
@@ -491,6 +1192,17 @@ class TradingSystem:
             'holding_krw': holding_krw        # 보유 원화 금액
         }
 
+    @_reads
+    def get_rate_card(self, currency: str) -> dict:
+        """환율 카드에 표시할 환율, 보유금액, 현재가치를 같은 거래 버전 기준으로 계산합니다."""
+        rate = self.get_current_rate(currency)
+        holding = self._holding_amount_locked(currency)
+        return {
+            'rate': asdict(rate) if rate else None,
+            'holding': holding,
+            'current_value': self.calculate_current_value(currency, rate.current_rate if rate else 0, holding)
+        }
+
     def calculate_current_value(self, currency: str, current_rate: float, holding_info: dict) -> dict:
         """현재 환율 기준 보유 자산의 가치와 손익률을 계산합니다."""
         if holding_info['holding_amount'] == 0 or current_rate == 0: